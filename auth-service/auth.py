@@ -1,7 +1,12 @@
 from passlib.context import CryptContext
 from jose import jwt
+import asyncio
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from metrics import auth_hash_queue_depth, auth_hash_seconds, auth_hash_rejected
 
 SECRET_KEY = os.getenv("JWT_SECRET")
 if not SECRET_KEY:
@@ -9,7 +14,23 @@ if not SECRET_KEY:
 
 ALGORITHM = "HS256"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost; hashes made with a different cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Worker processes doing bcrypt, and how many requests may wait for one.
+# Each web worker has its own pool, so the default splits the CPUs
+# between WEB_CONCURRENCY web workers.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+HASH_WORKERS = int(os.getenv(
+    "HASH_WORKERS", str(max((os.cpu_count() or 1) // WEB_CONCURRENCY, 1))
+))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_WORKERS * 8)))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS
+)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -25,3 +46,72 @@ def create_access_token(user_id: str, role: str):
         "exp": expire
     }
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+# ===============================
+# PROCESS POOL HASHING
+# ===============================
+# bcrypt holds the GIL for its whole run, so hashing inline stalls every
+# other request in the process. These run in worker processes instead.
+
+def _timed_hash(password: str):
+    start = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - start
+
+def _timed_verify_and_update(password: str, password_hash: str):
+    start = time.perf_counter()
+    valid, new_hash = pwd_context.verify_and_update(password, password_hash)
+    return valid, new_hash, time.perf_counter() - start
+
+
+class HasherOverloaded(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs bcrypt on a process pool behind a bounded admission queue.
+
+    At most HASH_WORKERS + HASH_QUEUE_LIMIT calls are admitted at once;
+    beyond that callers get HasherOverloaded immediately rather than
+    queueing without bound.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        # spawn, not fork: forking a threaded server process is unsafe
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._workers = workers
+        self._capacity = workers + queue_limit
+        self._admitted = 0
+
+    async def _run(self, op: str, fn, *args):
+        if self._admitted >= self._capacity:
+            auth_hash_rejected.labels(op).inc()
+            raise HasherOverloaded()
+
+        self._admitted += 1
+        auth_hash_queue_depth.set(max(self._admitted - self._workers, 0))
+        try:
+            loop = asyncio.get_running_loop()
+            *result, elapsed = await loop.run_in_executor(self._pool, fn, *args)
+        finally:
+            self._admitted -= 1
+            auth_hash_queue_depth.set(max(self._admitted - self._workers, 0))
+
+        auth_hash_seconds.labels(op).observe(elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        (password_hash,) = await self._run("hash", _timed_hash, password)
+        return password_hash
+
+    async def verify_and_update(self, password: str, password_hash: str):
+        """Returns (valid, new_hash); new_hash is set when the cost changed."""
+        valid, new_hash = await self._run(
+            "verify", _timed_verify_and_update, password, password_hash
+        )
+        return valid, new_hash
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
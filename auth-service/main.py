@@ -1,12 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from db import Base, engine, get_db, SessionLocal
+from db import engine, get_db
 from models import User
-from auth import hash_password, verify_password, create_access_token
+from auth import (
+    create_access_token,
+    PasswordHasher,
+    HasherOverloaded,
+    HASH_RETRY_AFTER
+)
 from pydantic import BaseModel
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-from fastapi.responses import Response
-import time
+from service_core.http_metrics import PrometheusMiddleware
+from service_core.deadline import DeadlineMiddleware
+from service_core.exposition import metrics_response
+from service_core.health import Readiness, get_readiness
+from service_core.responses import default_response_class
 
 from metrics import (
     auth_requests,
@@ -15,13 +24,34 @@ from metrics import (
     auth_login_success,
     auth_login_failed,
     auth_signup,
-    http_requests_total, 
-    http_request_latency_seconds
 )
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.hasher = PasswordHasher()
+    app.state.readiness = Readiness(engine)
+    app.state.readiness.start()
+    try:
+        yield
+    finally:
+        await app.state.readiness.stop()
+        app.state.hasher.shutdown()
 
-app = FastAPI(title="Auth Service")
+app = FastAPI(
+    title="Auth Service",
+    lifespan=lifespan,
+    default_response_class=default_response_class()
+)
+
+def get_hasher(request: Request) -> PasswordHasher:
+    return request.app.state.hasher
+
+def overloaded():
+    return HTTPException(
+        status_code=503,
+        detail="Too many concurrent logins, retry shortly",
+        headers={"Retry-After": str(HASH_RETRY_AFTER)}
+    )
 
 # ===============================
 # MODELS
@@ -35,67 +65,50 @@ class LoginRequest(BaseModel):
     username: str
     password: str
     
-def create_default_admin():
-    db = SessionLocal()
-    try:
-        admin = db.query(User).filter(User.username == "admin").first()
-        if not admin:
-            admin = User(
-                username="admin",
-                password_hash=hash_password("admin"),
-                role="OWNER"
-            )
-            db.add(admin)
-            db.commit()
-            print("Default admin user created: admin / admin")
-        else:
-            print("Admin user already exists")
-    finally:
-        db.close()
-create_default_admin() 
 
 # ===============================
 # PROMETHEUS MIDDLEWARE
 # ===============================
-@app.middleware("http")
-async def prometheus_middleware(request: Request, call_next):
-    start = time.time()
-    response = await call_next(request)
-    duration = time.time() - start
-
-    http_requests_total.labels(
-        request.method,
-        request.url.path,
-        response.status_code
-    ).inc()
-
-    http_request_latency_seconds.labels(
-        request.url.path
-    ).observe(duration)
-
-    return response
+# Added first so it runs inside the metrics middleware and its 504s are counted
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(PrometheusMiddleware)
 
 
 # ===============================
 # REGISTER
 # ===============================
 @app.post("/api/auth/register")
-def register(data: RegisterRequest, db: Session = Depends(get_db)):
+async def register(
+    data: RegisterRequest,
+    db: Session = Depends(get_db),
+    hasher: PasswordHasher = Depends(get_hasher)
+):
     if data.role not in ["OWNER", "CLIENT"]:
         raise HTTPException(status_code=400, detail="Invalid role")
 
-    if db.query(User).filter(User.username == data.username).first():
+    exists = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == data.username).first()
+    )
+    if exists:
         raise HTTPException(status_code=400, detail="Username already exists")
 
+    try:
+        password_hash = await hasher.hash(data.password)
+    except HasherOverloaded:
+        raise overloaded()
+
     user = User(
         username=data.username,
-        password_hash=hash_password(data.password),
+        password_hash=password_hash,
         role=data.role
     )
 
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    def save_user():
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
+    await run_in_threadpool(save_user)
 
     # Metrics
     auth_signup.inc()
@@ -110,23 +123,46 @@ def register(data: RegisterRequest, db: Session = Depends(get_db)):
 # LOGIN
 # ===============================
 @app.post("/api/auth/login")
-def login(data: LoginRequest, db: Session = Depends(get_db)):
+async def login(
+    data: LoginRequest,
+    db: Session = Depends(get_db),
+    hasher: PasswordHasher = Depends(get_hasher)
+):
     auth_login_attempts.inc()
 
-    user = db.query(User).filter(User.username == data.username).first()
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == data.username).first()
+    )
 
-    if not user or not verify_password(data.password, user.password_hash):
+    if not user:
         auth_login_failed.inc()
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    try:
+        valid, new_hash = await hasher.verify_and_update(data.password, user.password_hash)
+    except HasherOverloaded:
+        raise overloaded()
+
+    if not valid:
+        auth_login_failed.inc()
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Read before any commit expires them, which would reload on the event loop
+    user_id, role = user.id, user.role
+
+    # BCRYPT_ROUNDS changed since this hash was made: upgrade it now
+    if new_hash:
+        user.password_hash = new_hash
+        await run_in_threadpool(db.commit)
+
     auth_login_success.inc()
 
-    token = create_access_token(str(user.id), user.role)
+    token = create_access_token(str(user_id), role)
 
     return {
         "access_token": token,
-        "role": user.role,
-        "user_id": user.id
+        "role": role,
+        "user_id": user_id
     }
 
 
@@ -135,12 +171,20 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
 # ===============================
 @app.get("/api/auth/metrics")
 def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return metrics_response()
 
 
 # ===============================
 # HEALTH
 # ===============================
+@app.get("/api/auth/live")
+def live():
+    return {"status": "alive"}
+
+@app.get("/api/auth/ready")
+async def ready(readiness: Readiness = Depends(get_readiness)):
+    return await readiness.response()
+
 @app.get("/api/auth/health")
 def health():
     return {"status": "auth ok"}
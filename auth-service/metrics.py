@@ -1,15 +1,4 @@
-from prometheus_client import Counter, Histogram
-http_requests_total = Counter(
-    "http_requests_total",
-    "Total HTTP requests",
-    ["method", "endpoint", "status"]
-)
-
-http_request_latency_seconds = Histogram(
-    "http_request_latency_seconds",
-    "HTTP request latency",
-    ["endpoint"]
-)
+from prometheus_client import Counter, Gauge, Histogram
 auth_requests = Counter(
     "auth_requests_total",
     "Total auth API calls",
@@ -44,4 +33,23 @@ auth_signup = Counter(
 auth_password_resets = Counter(
     "auth_password_resets_total",
     "Password reset requests"   
-)
\ No newline at end of file
+)
+
+auth_hash_queue_depth = Gauge(
+    "auth_hash_queue_depth",
+    "Password hash jobs waiting for a worker process",
+    multiprocess_mode="livesum"
+)
+
+auth_hash_seconds = Histogram(
+    "auth_hash_seconds",
+    "bcrypt time per job in the worker process",
+    ["op"],  # hash / verify
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+)
+
+auth_hash_rejected = Counter(
+    "auth_hash_rejected_total",
+    "Password hash jobs rejected because the queue was full",
+    ["op"]
+)
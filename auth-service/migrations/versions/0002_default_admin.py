@@ -0,0 +1,50 @@
+"""default admin user
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+import os
+import uuid
+from passlib.context import CryptContext
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Previously created by main.py on every start. Set DEFAULT_ADMIN_PASSWORD
+# when migrating a real environment.
+ADMIN_USERNAME = "admin"
+
+
+def upgrade():
+    conn = op.get_bind()
+    exists = conn.execute(
+        sa.text("SELECT 1 FROM users WHERE username = :u"), {"u": ADMIN_USERNAME}
+    ).first()
+    if exists:
+        return
+
+    rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password = os.getenv("DEFAULT_ADMIN_PASSWORD", "admin")
+    users = sa.table(
+        "users",
+        sa.column("id", sa.UUID()),
+        sa.column("username", sa.String),
+        sa.column("password_hash", sa.String),
+        sa.column("role", sa.String),
+    )
+    op.bulk_insert(users, [{
+        "id": uuid.uuid4(),
+        "username": ADMIN_USERNAME,
+        "password_hash": CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash(password),
+        "role": "OWNER",
+    }])
+
+
+def downgrade():
+    op.execute(sa.text("DELETE FROM users WHERE username = 'admin' AND role = 'OWNER'"))
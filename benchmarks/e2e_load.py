@@ -0,0 +1,513 @@
+"""End-to-end load test of all four services.
+
+Starts auth, inventory, payment and order services as local uvicorn (or
+gunicorn, with --workers > 1) processes, migrates their databases, seeds
+products and users, then runs a closed-loop async load generator over a
+weighted scenario mix for --duration seconds:
+
+  login      POST /api/auth/login
+  browse     GET the catalog (full and paged) and the user's orders
+  checkout   POST /api/orders/checkout, items skewed towards a few hot SKUs
+  refund     full or partial refund of one of the user's paid orders
+
+The payment service runs its seeded simulator, so gateway latency and
+declines follow the same model on every run. Results go to stdout (or
+--output) as JSON: throughput, per-endpoint p50/p95/p99, per-stage
+checkout saga latency (from order-service's checkout_stage_latency_seconds
+histogram), and the commit measured. With --compare, per-endpoint changes
+against an earlier result are included.
+
+    python benchmarks/e2e_load.py --duration 30 --concurrency 50
+    python benchmarks/e2e_load.py --database-url postgresql://user:pw@localhost/bench \\
+        --workers 4 --output run.json --compare baseline.json
+
+Without --database-url each service gets a throwaway SQLite file. SQLite
+serialises writers, so use Postgres for numbers worth comparing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_PASSWORD = "bench-admin"
+USER_PASSWORD = "bench-pw"
+
+# name, directory, port offset, URL prefix
+SERVICES = [
+    ("auth", "auth-service", 0, "/api/auth"),
+    ("inventory", "inventory-microservice", 1, "/api/inventory"),
+    ("payment", "payment-microservice", 3, "/api/payments"),
+    ("orders", "order-microservice", 2, "/api/orders"),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Postgres URL shared by all services")
+    parser.add_argument("--base-port", type=int, default=18100)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes per service")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of load not recorded")
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual users")
+    parser.add_argument("--mix", default="login=1,browse=5,checkout=3,refund=1",
+                        help="scenario weights")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=1_000_000, help="initial stock per product")
+    parser.add_argument("--hot-skus", type=int, default=5)
+    parser.add_argument("--hot-fraction", type=float, default=0.8,
+                        help="share of checkout lines that pick a hot SKU")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gateway-failure-rate", type=float, default=0.1)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    parser.add_argument("--compare", help="earlier result JSON to diff against")
+    parser.add_argument("--keep", action="store_true", help="keep the temp dir (logs, SQLite files)")
+    return parser.parse_args()
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+# --------------------------------------------------
+# Services
+# --------------------------------------------------
+
+class Stack:
+    def __init__(self, args, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.procs: list[subprocess.Popen] = []
+        self.urls = {
+            name: f"http://127.0.0.1:{args.base_port + offset}"
+            for name, _, offset, _ in SERVICES
+        }
+
+    def env(self, name: str) -> dict[str, str]:
+        env = {
+            **os.environ,
+            "PYTHONPATH": ROOT,
+            "JWT_SECRET": "bench-secret",
+            "DEFAULT_ADMIN_PASSWORD": ADMIN_PASSWORD,
+            "BCRYPT_ROUNDS": str(self.args.bcrypt_rounds),
+            "PAYMENT_GATEWAY": "simulator",
+            "GATEWAY_SEED": str(self.args.seed),
+            "GATEWAY_FAILURE_RATE": str(self.args.gateway_failure_rate),
+            "INVENTORY_URL": self.urls["inventory"],
+            "PAYMENT_URL": self.urls["payment"],
+            "DATABASE_URL": self.args.database_url
+            or "sqlite:///" + os.path.join(self.workdir, f"{name}.db"),
+        }
+        if self.args.workers > 1:
+            env["WEB_CONCURRENCY"] = str(self.args.workers)
+            # One directory per service; the gunicorn default is shared
+            env["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(self.workdir, f"prom_{name}")
+            os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+        return env
+
+    def start(self):
+        for name, directory, offset, _ in SERVICES:
+            cwd = os.path.join(ROOT, directory)
+            env = self.env(name)
+            with open(os.path.join(self.workdir, f"migrate_{name}.log"), "w") as log:
+                migrated = subprocess.run(
+                    [sys.executable, "-m", "alembic", "upgrade", "head"],
+                    cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+                )
+            if migrated.returncode:
+                raise SystemExit(f"{name} migration failed; see {log.name} (use --keep)")
+            port = self.args.base_port + offset
+            if self.args.workers > 1:
+                env["PORT"] = str(port)
+                cmd = [sys.executable, "-m", "gunicorn", "-c", "python:service_core.gunicorn_conf", "main:app"]
+            else:
+                cmd = [sys.executable, "-m", "uvicorn", "main:app",
+                       "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+            log = open(os.path.join(self.workdir, f"{name}.log"), "w")
+            self.procs.append(subprocess.Popen(
+                cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+                start_new_session=True,
+            ))
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        with httpx.Client(timeout=2) as client:
+            for name, _, _, prefix in SERVICES:
+                while True:
+                    try:
+                        if client.get(self.urls[name] + prefix + "/ready").status_code == 200:
+                            break
+                    except httpx.HTTPError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise SystemExit(f"{name} not ready; see logs in {self.workdir}")
+                    time.sleep(0.25)
+
+    def stop(self):
+        for p in self.procs:
+            if p.poll() is None:
+                os.killpg(p.pid, signal.SIGTERM)
+        for p in self.procs:
+            try:
+                p.wait(10)
+            except subprocess.TimeoutExpired:
+                os.killpg(p.pid, signal.SIGKILL)
+
+
+# --------------------------------------------------
+# Seeding
+# --------------------------------------------------
+
+async def seed(client: httpx.AsyncClient, urls: dict, args) -> tuple[list[int], list[dict]]:
+    r = await client.post(urls["auth"] + "/api/auth/login",
+                          json={"username": "admin", "password": ADMIN_PASSWORD})
+    r.raise_for_status()
+    owner = {"Authorization": "Bearer " + r.json()["access_token"]}
+
+    run_id = uuid.uuid4().hex[:8]
+    product_ids = []
+    for start in range(0, args.products, 500):
+        batch = [
+            {"name": f"bench-{run_id}-{i}", "price": round(1 + (i % 50) * 0.5, 2), "stock": args.stock}
+            for i in range(start, min(start + 500, args.products))
+        ]
+        r = await client.post(urls["inventory"] + "/api/inventory/products/bulk", json=batch, headers=owner)
+        r.raise_for_status()
+        product_ids += [p["id"] for p in r.json()]
+
+    async def make_user(i):
+        username = f"bench-{run_id}-u{i}"
+        r = await client.post(urls["auth"] + "/api/auth/register",
+                              json={"username": username, "password": USER_PASSWORD, "role": "CLIENT"})
+        r.raise_for_status()
+        r = await client.post(urls["auth"] + "/api/auth/login",
+                              json={"username": username, "password": USER_PASSWORD})
+        r.raise_for_status()
+        body = r.json()
+        return {
+            "username": username,
+            "user_id": str(body["user_id"]),
+            "headers": {"Authorization": "Bearer " + body["access_token"]},
+            "paid": [],
+        }
+
+    users = []
+    for start in range(0, args.users, 20):
+        users += await asyncio.gather(*(make_user(i) for i in range(start, min(start + 20, args.users))))
+    return product_ids, users
+
+
+# --------------------------------------------------
+# Scenarios
+# --------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.recording = False
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.statuses: dict[str, dict[str, int]] = {}
+        self.scenarios: dict[str, int] = {}
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kwargs)
+            status = str(r.status_code)
+        except httpx.HTTPError as e:
+            r, status = None, type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        if self.recording:
+            self.samples.setdefault(name, []).append(elapsed)
+            counts = self.statuses.setdefault(name, {})
+            counts[status] = counts.get(status, 0) + 1
+            if r is None or r.status_code >= 500:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        return r
+
+
+class Context:
+    def __init__(self, client, urls, rec, rng, user, product_ids, args):
+        self.client = client
+        self.urls = urls
+        self.rec = rec
+        self.rng = rng
+        self.user = user
+        self.product_ids = product_ids
+        self.args = args
+
+
+async def scenario_login(ctx: Context):
+    await ctx.rec.call(ctx.client, "POST /api/auth/login", "POST",
+                       ctx.urls["auth"] + "/api/auth/login",
+                       json={"username": ctx.user["username"], "password": USER_PASSWORD})
+
+
+async def scenario_browse(ctx: Context):
+    inv = ctx.urls["inventory"] + "/api/inventory/products"
+    await ctx.rec.call(ctx.client, "GET /api/inventory/products", "GET", inv)
+    after = ctx.rng.choice(ctx.product_ids) - 1
+    await ctx.rec.call(ctx.client, "GET /api/inventory/products?limit", "GET", inv,
+                       params={"limit": 50, "after": after})
+    await ctx.rec.call(ctx.client, "GET /api/orders/{user_id}", "GET",
+                       ctx.urls["orders"] + f"/api/orders/{ctx.user['user_id']}", params={"limit": 20})
+
+
+def pick_product(ctx: Context) -> int:
+    hot = ctx.product_ids[:ctx.args.hot_skus]
+    if hot and ctx.rng.random() < ctx.args.hot_fraction:
+        return ctx.rng.choice(hot)
+    return ctx.rng.choice(ctx.product_ids)
+
+
+async def scenario_checkout(ctx: Context):
+    lines = {}
+    for _ in range(ctx.rng.randint(1, 3)):
+        lines[pick_product(ctx)] = ctx.rng.randint(1, 2)
+    r = await ctx.rec.call(
+        ctx.client, "POST /api/orders/checkout", "POST",
+        ctx.urls["orders"] + "/api/orders/checkout",
+        json={"user_id": ctx.user["user_id"],
+              "items": [{"product_id": pid, "qty": qty} for pid, qty in lines.items()]},
+        headers={"Idempotency-Key": uuid.uuid4().hex},
+    )
+    if r is not None and r.status_code == 200 and r.json().get("status") == "PAID":
+        ctx.user["paid"].append((r.json()["order_id"], lines))
+
+
+async def scenario_refund(ctx: Context):
+    if not ctx.user["paid"]:
+        return await scenario_checkout(ctx)
+    order_id, lines = ctx.user["paid"].pop(ctx.rng.randrange(len(ctx.user["paid"])))
+    body = None
+    if ctx.rng.random() < 0.5:
+        pid = next(iter(lines))
+        body = {"items": [{"product_id": pid, "qty": 1}]}
+    await ctx.rec.call(ctx.client, "POST /api/orders/refund/{order_id}", "POST",
+                       ctx.urls["orders"] + f"/api/orders/refund/{order_id}",
+                       json=body, headers=ctx.user["headers"])
+
+
+SCENARIOS = {
+    "login": scenario_login,
+    "browse": scenario_browse,
+    "checkout": scenario_checkout,
+    "refund": scenario_refund,
+}
+
+
+async def virtual_user(i, client, urls, rec, users, product_ids, weights, args, stop_at):
+    rng = random.Random(args.seed * 1_000_003 + i)
+    ctx = Context(client, urls, rec, rng, users[i % len(users)], product_ids, args)
+    names, w = list(weights), list(weights.values())
+    while time.monotonic() < stop_at:
+        name = rng.choices(names, w)[0]
+        if rec.recording:
+            rec.scenarios[name] = rec.scenarios.get(name, 0) + 1
+        await SCENARIOS[name](ctx)
+
+
+# --------------------------------------------------
+# Reporting
+# --------------------------------------------------
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    # Nearest rank
+    k = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def summarize(values: list[float], elapsed: float) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "rps": round(len(values) / elapsed, 1),
+        "mean_ms": round(1000 * sum(values) / len(values), 2),
+        "p50_ms": round(1000 * percentile(values, 0.50), 2),
+        "p95_ms": round(1000 * percentile(values, 0.95), 2),
+        "p99_ms": round(1000 * percentile(values, 0.99), 2),
+    }
+
+
+def scrape_histogram(text: str, name: str, label: str) -> dict[str, list[tuple[float, float]]]:
+    """Cumulative (upper bound, count) buckets per label value."""
+    buckets: dict[str, list[tuple[float, float]]] = {}
+    for family in text_string_to_metric_families(text):
+        if family.name != name:
+            continue
+        for s in family.samples:
+            if s.name == name + "_bucket":
+                buckets.setdefault(s.labels[label], []).append((float(s.labels["le"]), s.value))
+    return {k: sorted(v) for k, v in buckets.items()}
+
+
+def histogram_quantile(q: float, buckets: list[tuple[float, float]]) -> float | None:
+    # Same linear interpolation as PromQL's histogram_quantile
+    total = buckets[-1][1]
+    if total <= 0:
+        return None
+    rank = q * total
+    prev_bound, prev_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return prev_bound
+            return prev_bound + (bound - prev_bound) * (rank - prev_count) / max(count - prev_count, 1e-9)
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+def stage_latencies(before: str, after: str) -> dict:
+    name = "checkout_stage_latency_seconds"
+    start, end = scrape_histogram(before, name, "stage"), scrape_histogram(after, name, "stage")
+    stages = {}
+    for stage, buckets in end.items():
+        base = dict(start.get(stage, []))
+        delta = [(le, count - base.get(le, 0.0)) for le, count in buckets]
+        if delta[-1][1] <= 0:
+            continue
+        stages[stage] = {"count": int(delta[-1][1])}
+        for q in (0.50, 0.95, 0.99):
+            stages[stage][f"p{round(q * 100)}_ms"] = round(1000 * histogram_quantile(q, delta), 2)
+    return stages
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    def change(new, old):
+        return None if not old else round(100 * (new - old) / old, 1)
+
+    out = {
+        "baseline_commit": baseline.get("commit"),
+        "throughput_rps_change_pct": change(result["throughput_rps"], baseline.get("throughput_rps")),
+        "endpoints": {},
+    }
+    for name, stats in result["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if old:
+            out["endpoints"][name] = {
+                "rps_change_pct": change(stats["rps"], old["rps"]),
+                "p95_change_pct": change(stats["p95_ms"], old["p95_ms"]),
+                "p99_change_pct": change(stats["p99_ms"], old["p99_ms"]),
+            }
+    return out
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --------------------------------------------------
+# Main
+# --------------------------------------------------
+
+async def drive(urls: dict, args, weights: dict) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        product_ids, users = await seed(client, urls, args)
+        rec = Recorder()
+        metrics_url = urls["orders"] + "/api/orders/metrics"
+
+        start = time.monotonic()
+        stop_at = start + args.warmup + args.duration
+        vus = [
+            asyncio.create_task(virtual_user(i, client, urls, rec, users, product_ids, weights, args, stop_at))
+            for i in range(args.concurrency)
+        ]
+
+        await asyncio.sleep(args.warmup)
+        before = (await client.get(metrics_url)).text
+        rec.recording = True
+        measured_from = time.monotonic()
+
+        await asyncio.gather(*vus)
+        rec.recording = False
+        elapsed = time.monotonic() - measured_from
+        after = (await client.get(metrics_url)).text
+
+    total = sum(len(v) for v in rec.samples.values())
+    return {
+        "commit": git_commit(),
+        "config": {
+            "database": "postgresql" if args.database_url else "sqlite",
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": weights,
+            "users": args.users,
+            "products": args.products,
+            "hot_skus": args.hot_skus,
+            "hot_fraction": args.hot_fraction,
+            "seed": args.seed,
+            "gateway_failure_rate": args.gateway_failure_rate,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(rec.errors.values()),
+        "throughput_rps": round(total / elapsed, 1),
+        "scenarios": rec.scenarios,
+        "endpoints": {
+            name: {**summarize(values, elapsed), "errors": rec.errors.get(name, 0),
+                   "statuses": rec.statuses[name]}
+            for name, values in sorted(rec.samples.items())
+        },
+        "checkout_stages": stage_latencies(before, after),
+    }
+
+
+def main():
+    args = parse_args()
+    weights = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="e2e_load_")
+    stack = Stack(args, workdir)
+    try:
+        stack.start()
+        stack.wait_ready()
+        result = asyncio.run(drive(stack.urls, args, weights))
+    finally:
+        stack.stop()
+        if args.keep:
+            print(f"logs and databases kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            result["comparison"] = compare(result, json.load(f))
+
+    out = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""HTTP metrics middleware overhead benchmark.
+
+Drives a small FastAPI app in-process (no sockets) with requests for
+/items/{item_id} over a range of IDs, under three setups:
+
+  none      no metrics middleware
+  before    @app.middleware("http") labelled with request.url.path,
+            as the services did before
+  after     service_core.http_metrics.PrometheusMiddleware
+
+and prints requests/sec and the number of http_requests_total series each
+setup produced, as JSON.
+
+    python benchmarks/http_middleware.py --requests 20000 --ids 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from fastapi import FastAPI, Request
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from service_core import http_metrics  # noqa: E402
+from service_core.http_metrics import PrometheusMiddleware  # noqa: E402
+
+
+def base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+def app_before():
+    registry = CollectorRegistry()
+    requests_total = Counter(
+        "http_requests_total", "", ["method", "endpoint", "status"], registry=registry
+    )
+    latency = Histogram("http_request_latency_seconds", "", ["endpoint"], registry=registry)
+    app = base_app()
+
+    @app.middleware("http")
+    async def prometheus_middleware(request: Request, call_next):
+        start = time.time()
+        response = await call_next(request)
+        duration = time.time() - start
+        requests_total.labels(request.method, request.url.path, response.status_code).inc()
+        latency.labels(request.url.path).observe(duration)
+        return response
+
+    return app, lambda: series(registry, "http_requests")
+
+
+def app_after():
+    app = base_app()
+    app.add_middleware(PrometheusMiddleware)
+    return app, lambda: len(http_metrics.http_requests_total._metrics)
+
+
+def series(registry, name):
+    return sum(len(m.samples) for m in registry.collect() if m.name == name) // 2  # _total + _created
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    sent_body = False
+    done = asyncio.Event()
+
+    async def receive():
+        # Like a server: the body once, then block until the response is done
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+    done.set()
+
+
+async def drive(app, total: int, ids: int, concurrency: int) -> float:
+    # Warm up the router and lazy middleware stack
+    await call(app, "/items/0")
+
+    per_worker = total // concurrency
+
+    async def worker(w):
+        for i in range(per_worker):
+            await call(app, f"/items/{(w * per_worker + i) % ids}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--ids", type=int, default=1_000, help="distinct item IDs requested")
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {}
+    for name, build in (("none", lambda: (base_app(), lambda: 0)), ("before", app_before), ("after", app_after)):
+        app, count_series = build()
+        elapsed = asyncio.run(drive(app, args.requests, args.ids, args.concurrency))
+        results[name] = {
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_s": round(args.requests / elapsed),
+            "series": count_series(),
+        }
+
+    results["after_vs_before"] = round(
+        results["after"]["requests_per_s"] / results["before"]["requests_per_s"], 2
+    )
+    print(json.dumps({"requests": args.requests, "ids": args.ids, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Cached vs uncached JWT verification microbenchmark.
+
+Verifies a rotating set of tokens (as a pool of active users would send
+them) through TokenVerifier.decode (full signature check every time) and
+TokenVerifier.verify (LRU of verified claims), and prints ops/sec as JSON.
+
+    python benchmarks/jwt_verify.py --users 500 --calls 200000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from service_core.tokens import TokenVerifier  # noqa: E402
+
+SECRET = "bench-secret"
+
+
+def make_tokens(n):
+    exp = datetime.utcnow() + timedelta(hours=1)
+    return [
+        jwt.encode({"sub": f"user-{i}", "role": "CLIENT", "exp": exp}, SECRET, algorithm="HS256")
+        for i in range(n)
+    ]
+
+
+def run(fn, tokens, calls):
+    n = len(tokens)
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(tokens[i % n])
+    elapsed = time.perf_counter() - start
+    return {"calls": calls, "elapsed_s": round(elapsed, 3), "ops_per_s": round(calls / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500, help="distinct tokens in rotation")
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.users)
+    verifier = TokenVerifier(SECRET, max_entries=args.cache_size)
+
+    uncached = run(verifier.decode, tokens, args.calls)
+    cached = run(verifier.verify, tokens, args.calls)
+
+    print(json.dumps({
+        "users": args.users,
+        "cache_size": args.cache_size,
+        "uncached": uncached,
+        "cached": cached,
+        "speedup": round(cached["ops_per_s"] / uncached["ops_per_s"], 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""Hot-path microbenchmarks with a stored baseline.
+
+Times the individual hot paths of each service against SQLite and
+in-memory stand-ins, one subprocess per service (the services share
+module names such as main, db and models):
+
+  inventory  reserve (hold and outright sale) and release through the
+             reservation engine; GET /api/inventory/products at 1k, 10k
+             and 100k products; serializing 10k products
+  auth       password verify, create_access_token, and both together as
+             login does them
+  orders     checkout pricing (catalog.quote) over a 10k-product map;
+             serializing a 10k-order listing, with and without items
+  all        a trivial route with and without the service's middleware
+             stack; the difference is the middleware's cost per request
+
+Each benchmark is calibrated to run for at least --min-time per round;
+the median of --rounds rounds is reported as ns_per_op. Results are
+printed (or written to --output) as JSON. With a baseline file present,
+every benchmark is compared with it and the run fails if one is slower
+by more than --tolerance:
+
+    python benchmarks/micro.py
+    python benchmarks/micro.py --groups inventory --tolerance 0.15
+    python benchmarks/micro.py --update-baseline
+
+The serialization benchmarks time the body of a list response built
+from rows already loaded, both ways: "encoder_json" is the old path
+(jsonable_encoder over the objects, rendered by json) and "model_orjson"
+the route's response_model dump rendered by orjson.
+
+Timings depend on the machine: regenerate the baseline with
+--update-baseline on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+GROUPS = {
+    "inventory": "inventory-microservice",
+    "auth": "auth-service",
+    "orders": "order-microservice",
+    "payment": "payment-microservice",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", default=",".join(GROUPS))
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="catalog sizes for list_products")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output")
+    # Internal: run one group in this process and print its results
+    parser.add_argument("--group", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+# --------------------------------------------------
+# Timing
+# --------------------------------------------------
+
+class Timer:
+    def __init__(self, rounds: int, min_time: float):
+        self.rounds = rounds
+        self.min_time = min_time
+        self.results: dict[str, dict] = {}
+
+    def _report(self, name: str, number: int, times: list[float]):
+        per_op = [t / number * 1e9 for t in times]
+        median = statistics.median(per_op)
+        self.results[name] = {
+            "ns_per_op": round(median),
+            "min_ns": round(min(per_op)),
+            "ops_per_s": round(1e9 / median, 1),
+            "number": number,
+            "rounds": len(times),
+        }
+        return self.results[name]
+
+    def run(self, name: str, fn):
+        # Like timeit.autorange: grow the loop until a round takes min_time
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= self.min_time:
+                break
+            number *= 2
+
+        times = []
+        for _ in range(self.rounds):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append(time.perf_counter() - start)
+        return self._report(name, number, times)
+
+    def run_async(self, name: str, coro_fn):
+        async def rounds():
+            number = 1
+            while True:
+                start = time.perf_counter()
+                for _ in range(number):
+                    await coro_fn()
+                if time.perf_counter() - start >= self.min_time:
+                    break
+                number *= 2
+
+            times = []
+            for _ in range(self.rounds):
+                start = time.perf_counter()
+                for _ in range(number):
+                    await coro_fn()
+                times.append(time.perf_counter() - start)
+            return number, times
+
+        number, times = asyncio.run(rounds())
+        return self._report(name, number, times)
+
+
+async def asgi_get(app, path: str, query: bytes = b""):
+    """One in-process GET, no sockets; the response is built and dropped."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": query, "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80), "app": app,
+    }
+    sent_body = False
+    status = 0
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    if status != 200:
+        raise RuntimeError(f"GET {path} answered {status}")
+
+
+def middleware_overhead(timer: Timer, group: str, app, prefix: str):
+    """Time a trivial route through the app's middleware and without it."""
+    path = f"{prefix}/__bench"
+
+    async def bench_route():
+        return {"ok": True}
+
+    app.add_api_route(path, bench_route, methods=["GET"])
+    # First in line, so no path-parameter route of the service shadows it
+    app.router.routes.insert(0, app.router.routes.pop())
+
+    user_middleware = app.user_middleware
+    app.user_middleware = []
+    bare = app.build_middleware_stack()
+    app.user_middleware = user_middleware
+    full = app.build_middleware_stack()
+
+    bare_stats = timer.run_async(f"{group}.route_bare", lambda: asgi_get(bare, path))
+    full_stats = timer.run_async(f"{group}.route_with_middleware", lambda: asgi_get(full, path))
+    full_stats["overhead_ns"] = full_stats["ns_per_op"] - bare_stats["ns_per_op"]
+
+
+def serialization(timer: Timer, name: str, app, path: str, rows, legacy=None, current=None):
+    """Time a listing body the old way and through the route's response_model.
+
+    legacy and current turn the loaded rows into what the endpoint returned
+    before and returns now; by default both are the ORM objects themselves.
+    """
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    route = next(r for r in app.routes if getattr(r, "path", None) == path)
+    field = route.response_field
+    legacy = legacy or (lambda rows: rows)
+    current = current or (lambda rows: rows)
+
+    def typed():
+        # What FastAPI does with a response_model, then the orjson render
+        value, errors = field.validate(current(rows), {})
+        assert not errors, errors
+        return ORJSONResponse(field.serialize(value))
+
+    before = timer.run(f"{name}.encoder_json", lambda: JSONResponse(jsonable_encoder(legacy(rows))))
+    after = timer.run(f"{name}.model_orjson", typed)
+    after["speedup"] = round(before["ns_per_op"] / after["ns_per_op"], 2)
+
+
+# --------------------------------------------------
+# Groups (each runs in its own process)
+# --------------------------------------------------
+
+def use_service(group: str, workdir: str):
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, f"{group}.db")
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, GROUPS[group]))
+
+
+def bench_inventory(timer: Timer, args):
+    from sqlalchemy import delete, insert
+    from db import Base, engine, SessionLocal
+    from models import CatalogVersion, Product
+    import reservations
+    import main
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add(CatalogVersion(id=1, version=0))
+        db.add(Product(id=1, name="hot", price=9.99, stock=10**9))
+        db.commit()
+
+    def reserve_hold():
+        with SessionLocal() as db:
+            reservations.reserve(db, {1: 1}, hold_id=uuid.uuid4().hex)
+
+    def reserve_sale():
+        with SessionLocal() as db:
+            reservations.reserve(db, {1: 1})
+
+    def release():
+        with SessionLocal() as db:
+            reservations.release(db, {1: 1})
+
+    timer.run("inventory.reserve_hold", reserve_hold)
+    timer.run("inventory.reserve_sale", reserve_sale)
+    timer.run("inventory.release", release)
+
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        with engine.begin() as conn:
+            conn.execute(delete(Product))
+            conn.execute(insert(Product), [
+                {"id": i, "name": f"p{i}", "price": 1 + i % 100, "stock": 1000}
+                for i in range(1, size + 1)
+            ])
+        timer.run_async(
+            f"inventory.list_products[{size}]",
+            lambda: asgi_get(main.app, "/api/inventory/products"),
+        )
+
+    with SessionLocal() as db:
+        products = db.query(Product).order_by(Product.id).limit(10_000).all()
+        serialization(timer, f"inventory.serialize_products[{len(products)}]",
+                      main.app, "/api/inventory/products", products)
+
+    middleware_overhead(timer, "inventory", main.app, "/api/inventory")
+
+
+def bench_auth(timer: Timer, args):
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    import auth
+    import main
+
+    password = "correct horse battery staple"
+    password_hash = auth.hash_password(password)
+
+    def login():
+        valid, _ = auth.pwd_context.verify_and_update(password, password_hash)
+        assert valid
+        auth.create_access_token("42", "CLIENT")
+
+    timer.run("auth.verify_password", lambda: auth.verify_password(password, password_hash))
+    timer.run("auth.create_access_token", lambda: auth.create_access_token("42", "CLIENT"))
+    timer.run("auth.login", login)
+
+    middleware_overhead(timer, "auth", main.app, "/api/auth")
+
+
+def bench_orders(timer: Timer, args):
+    from sqlalchemy import insert
+    from sqlalchemy.orm import selectinload
+    from db import Base, engine, SessionLocal
+    from models import Order, OrderItem
+    from pagination import OrderOut, OrderWithItemsOut
+    import catalog
+    import main
+
+    product_map = {i: {"id": i, "name": f"p{i}", "price": 1.0 + i % 100, "stock": 1000} for i in range(10_000)}
+    small = [main.CheckoutItem(product_id=i * 37 % 10_000, qty=1 + i % 3) for i in range(3)]
+    large = [main.CheckoutItem(product_id=i * 37 % 10_000, qty=1 + i % 3) for i in range(50)]
+
+    timer.run("orders.quote[3]", lambda: catalog.quote(product_map, small))
+    timer.run("orders.quote[50]", lambda: catalog.quote(product_map, large))
+
+    Base.metadata.create_all(engine)
+    n = 10_000
+    with engine.begin() as conn:
+        conn.execute(insert(Order), [
+            {"id": i, "user_id": f"user-{i % 100}", "total": 20.0, "status": "PAID",
+             "created_at": f"2026-01-01T00:00:{i % 60:02d}.{i:06d}"}
+            for i in range(1, n + 1)
+        ])
+        conn.execute(insert(OrderItem), [
+            {"order_id": 1 + i // 2, "product_id": i % 100, "qty": 1, "price": 10.0, "line_total": 10.0}
+            for i in range(2 * n)
+        ])
+
+    def order_dicts(include_items: bool):
+        # The listing before it had response models: a dict per order
+        def legacy(orders):
+            out = []
+            for o in orders:
+                d = {"id": o.id, "user_id": o.user_id, "status": o.status,
+                     "total": o.total, "created_at": o.created_at}
+                if include_items:
+                    d["items"] = [{"product_id": i.product_id, "qty": i.qty,
+                                   "price": i.price, "line_total": i.line_total} for i in o.items]
+                out.append(d)
+            return out
+        return legacy
+
+    def order_models(model):
+        # As pagination.list_orders builds them
+        return lambda orders: [model.model_validate(o) for o in orders]
+
+    with SessionLocal() as db:
+        orders = db.query(Order).options(selectinload(Order.items)).order_by(Order.id).all()
+        for label, model, include_items in (("orders", OrderOut, False),
+                                            ("orders_with_items", OrderWithItemsOut, True)):
+            serialization(
+                timer, f"orders.serialize_{label}[{n}]", main.app, "/api/orders/all", orders,
+                legacy=order_dicts(include_items), current=order_models(model),
+            )
+
+    middleware_overhead(timer, "orders", main.app, "/api/orders")
+
+
+def bench_payment(timer: Timer, args):
+    import main
+
+    middleware_overhead(timer, "payment", main.app, "/api/payments")
+
+
+BENCHES = {
+    "inventory": bench_inventory,
+    "auth": bench_auth,
+    "orders": bench_orders,
+    "payment": bench_payment,
+}
+
+
+def run_group(args):
+    workdir = tempfile.mkdtemp(prefix="micro_")
+    use_service(args.group, workdir)
+    timer = Timer(args.rounds, args.min_time)
+    try:
+        BENCHES[args.group](timer, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(timer.results))
+
+
+# --------------------------------------------------
+# Driver
+# --------------------------------------------------
+
+def compare(results: dict, baseline: dict, tolerance: float) -> tuple[dict, list[str]]:
+    report, regressions = {}, []
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        ratio = stats["ns_per_op"] / old["ns_per_op"]
+        report[name] = {"baseline_ns": old["ns_per_op"], "change_pct": round(100 * (ratio - 1), 1)}
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return report, regressions
+
+
+def main():
+    args = parse_args()
+    if args.group:
+        run_group(args)
+        return
+
+    results = {}
+    for group in (g.strip() for g in args.groups.split(",") if g.strip()):
+        if group not in GROUPS:
+            raise SystemExit(f"unknown group {group!r}; choose from {', '.join(GROUPS)}")
+        cmd = [sys.executable, os.path.abspath(__file__), "--group", group,
+               "--rounds", str(args.rounds), "--min-time", str(args.min_time),
+               "--sizes", args.sizes, "--bcrypt-rounds", str(args.bcrypt_rounds)]
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        if out.returncode:
+            sys.stderr.write(out.stderr)
+            raise SystemExit(f"{group} benchmarks failed")
+        results.update(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    output = {"results": results}
+    regressions = []
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update({name: {"ns_per_op": s["ns_per_op"]} for name, s in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            output["comparison"], regressions = compare(results, json.load(f), args.tolerance)
+        output["tolerance"] = args.tolerance
+        output["regressions"] = regressions
+
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Hot-SKU reservation contention benchmark.
+
+Hammers a single product with concurrent reserve calls and reports
+reservations/sec plus an oversell check, for the atomic reservation engine
+and (for comparison) the old read-check-write pattern.
+
+    python benchmarks/reserve_contention.py
+    python benchmarks/reserve_contention.py --database-url postgresql://user:pw@localhost/bench
+
+Without --database-url a throwaway SQLite file is used. SQLite serialises
+writers, so absolute numbers are only meaningful against Postgres; the
+oversell check is meaningful on both.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "inventory-microservice"))
+# db.py refuses to import without a URL; the benchmark builds its own engine.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import reservations  # noqa: E402
+from db import Base  # noqa: E402
+from models import Product  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--attempts", type=int, default=25,
+                        help="reserve calls per caller")
+    parser.add_argument("--stock", type=int,
+                        help="initial stock (default: half the total attempts)")
+    parser.add_argument("--mode", choices=["atomic", "naive", "both"], default="both")
+    return parser.parse_args()
+
+
+def naive_reserve(db, pid, qty):
+    # The pre-engine implementation: read, check in Python, write back.
+    p = db.get(Product, pid)
+    if not p or p.stock < qty:
+        raise reservations.OutOfStock(pid)
+    p.stock -= qty
+    db.commit()
+
+
+def atomic_reserve(db, pid, qty):
+    reservations.reserve(db, {pid: qty})
+
+
+def run(mode, session_factory, pid, args):
+    stock = args.stock or args.callers * args.attempts // 2
+    with session_factory() as db:
+        db.get(Product, pid).stock = stock
+        db.commit()
+
+    reserve = atomic_reserve if mode == "atomic" else naive_reserve
+    barrier = threading.Barrier(args.callers)
+    lock = threading.Lock()
+    counts = {"reserved": 0, "out_of_stock": 0, "errors": 0}
+
+    def caller():
+        local = {"reserved": 0, "out_of_stock": 0, "errors": 0}
+        barrier.wait()
+        for _ in range(args.attempts):
+            with session_factory() as db:
+                try:
+                    reserve(db, pid, 1)
+                    local["reserved"] += 1
+                except reservations.OutOfStock:
+                    local["out_of_stock"] += 1
+                except Exception:
+                    db.rollback()
+                    local["errors"] += 1
+        with lock:
+            for k, v in local.items():
+                counts[k] += v
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.callers) as pool:
+        for f in [pool.submit(caller) for _ in range(args.callers)]:
+            f.result()
+    elapsed = time.perf_counter() - start
+
+    with session_factory() as db:
+        final = db.get(Product, pid).stock
+
+    decremented = stock - final
+    return {
+        "mode": mode,
+        "callers": args.callers,
+        "attempts": args.callers * args.attempts,
+        "initial_stock": stock,
+        "final_stock": final,
+        **counts,
+        "elapsed_s": round(elapsed, 3),
+        "calls_per_s": round(args.callers * args.attempts / elapsed, 1),
+        "reservations_per_s": round(counts["reserved"] / elapsed, 1),
+        # Units handed out that were never taken off the shelf
+        "oversold": counts["reserved"] - decremented,
+    }
+
+
+def main():
+    args = parse_args()
+    url = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "reserve_bench.db"
+    )
+
+    connect_args = {"timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(
+        url,
+        pool_size=args.callers,
+        max_overflow=0,
+        connect_args=connect_args,
+    )
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    with session_factory() as db:
+        hot = Product(name="hot-sku", price=9.99, stock=0)
+        db.add(hot)
+        db.commit()
+        pid = hot.id
+
+    modes = ["atomic", "naive"] if args.mode == "both" else [args.mode]
+    results = [run(mode, session_factory, pid, args) for mode in modes]
+    print(json.dumps({"database": engine.url.get_backend_name(), "results": results}, indent=2))
+
+    engine.dispose()
+    if any(r["mode"] == "atomic" and r["oversold"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,40 @@
 const API_BASE = '';
 
+export type Page<T> = {
+  data: T;
+  nextCursor: string | null;
+};
+
+export class ApiError extends Error {
+  constructor(public status: number, message: string) {
+    super(message);
+  }
+}
+
 export async function apiFetch<T>(
   path: string,
   options: RequestInit = {}
 ): Promise<T> {
+  const res = await apiRequest(path, options);
+  return res.json();
+}
+
+/* Keyset-paginated list endpoints return the next cursor in a header */
+export async function apiFetchPage<T>(
+  path: string,
+  options: RequestInit = {}
+): Promise<Page<T>> {
+  const res = await apiRequest(path, options);
+  return {
+    data: await res.json(),
+    nextCursor: res.headers.get('X-Next-Cursor')
+  };
+}
+
+async function apiRequest(
+  path: string,
+  options: RequestInit
+): Promise<Response> {
   const token = localStorage.getItem('token');
   const user = JSON.parse(localStorage.getItem('user') || 'null');
 
@@ -20,8 +51,8 @@ export async function apiFetch<T>(
 
   if (!res.ok) {
     const text = await res.text();
-    throw new Error(text || `HTTP ${res.status}`);
+    throw new ApiError(res.status, text || `HTTP ${res.status}`);
   }
 
-  return res.json();
+  return res;
 }
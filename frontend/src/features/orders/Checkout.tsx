@@ -1,9 +1,47 @@
 import { useState } from 'react';
 import { useCart } from '../../hooks/useCart';
 import { useAuth } from '../../auth/useAuth';
-import { apiFetch } from '../../api/client';
+import { apiFetch, ApiError } from '../../api/client';
 import { useNavigate } from 'react-router-dom';
 
+type CheckoutResult = {
+  order_id: number;
+  status: string;
+  total: number;
+};
+
+const POLL_INTERVAL_MS = 1000;
+const POLL_ATTEMPTS = 30;
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+/*
+ * One Idempotency-Key per cart: clicking Pay again for the same items
+ * replays the first order instead of placing (and charging) a second one.
+ * A changed cart is a new request and gets a new key.
+ */
+function checkoutKey(cart: string): string {
+  const stored = JSON.parse(localStorage.getItem('checkoutKey') || 'null');
+  if (stored?.cart === cart) return stored.key;
+
+  const key = crypto.randomUUID();
+  localStorage.setItem('checkoutKey', JSON.stringify({ cart, key }));
+  return key;
+}
+
+function forgetCheckoutKey() {
+  localStorage.removeItem('checkoutKey');
+}
+
+/* A 202 means the order is still being processed; wait for it to settle */
+async function settle(res: CheckoutResult): Promise<CheckoutResult> {
+  for (let i = 0; i < POLL_ATTEMPTS && res.status === 'PENDING'; i++) {
+    await sleep(POLL_INTERVAL_MS);
+    res = await apiFetch<CheckoutResult>(`/api/orders/status/${res.order_id}`);
+  }
+  return res;
+}
+
 export default function Checkout() {
   const { items, total, clear } = useCart();
   const { user } = useAuth();
@@ -18,35 +56,47 @@ export default function Checkout() {
     setLoading(true);
     setError('');
 
+    const payload = {
+      user_id: user.id,
+      items: items.map(i => ({
+        product_id: Number(i.id),
+        qty: i.quantity
+      }))
+    };
+    const key = checkoutKey(JSON.stringify(payload));
+
     try {
-      const payload = {
-        user_id: user.id,
-        items: items.map(i => ({
-          product_id: Number(i.id),
-          qty: i.quantity
-        }))
-      };
-
-      const res = await apiFetch<{
-        order_id: number;
-        status: string;
-        total: number;
-      }>('/api/orders/checkout', {
+      let res = await apiFetch<CheckoutResult>('/api/orders/checkout', {
         method: 'POST',
+        headers: { 'Idempotency-Key': key },
         body: JSON.stringify(payload)
       });
+      res = await settle(res);
+
+      // ⏳ Still processing → keep cart and key; paying again replays this order
+      if (res.status === 'PENDING') {
+        throw new Error(
+          'Your payment is still being processed. Check My Orders before paying again.'
+        );
+      }
 
       // ❌ Payment failed → do NOT clear cart
-      if (!res || res.status !== 'PAID') {
+      if (res.status !== 'PAID') {
+        forgetCheckoutKey();
         throw new Error('Payment failed. No money was charged.');
       }
 
       // ✅ Payment success → clear cart first
+      forgetCheckoutKey();
       clear();
 
       // Then navigate
       navigate(`/receipt/${res.order_id}`);
     } catch (err: any) {
+      // The order failed for good; a new attempt needs a new order
+      if (err instanceof ApiError && err.status === 400) {
+        forgetCheckoutKey();
+      }
       setError(err.message || 'Checkout failed');
     } finally {
       setLoading(false);
@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import { apiFetch } from '../../api/client';
+import { apiFetchPage } from '../../api/client';
 import { useAuth } from '../../auth/useAuth';
 import { useNavigate } from 'react-router-dom';
 
@@ -15,16 +15,24 @@ export default function MyOrders() {
   const navigate = useNavigate();
 
   const [orders, setOrders] = useState<Order[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
+  const loadPage = (userId: string, cursor: string | null) => {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    return apiFetchPage<Order[]>(`/api/orders/${userId}${query}`)
+      .then(page => {
+        setOrders(prev => (cursor ? [...prev, ...page.data] : page.data));
+        setNextCursor(page.nextCursor);
+      })
+      .catch(err => setError(err.message || 'Failed to load orders'));
+  };
+
   useEffect(() => {
     if (!user) return;
 
-    apiFetch<Order[]>(`/api/orders/${user.id}`)
-      .then(setOrders)
-      .catch(err => setError(err.message || 'Failed to load orders'))
-      .finally(() => setLoading(false));
+    loadPage(user.id, null).finally(() => setLoading(false));
   }, [user]);
 
   if (loading) return <p className="text-gray-500">Loading orders…</p>;
@@ -62,6 +70,15 @@ export default function MyOrders() {
           </div>
         </div>
       ))}
+
+      {nextCursor && user && (
+        <button
+          onClick={() => loadPage(user.id, nextCursor)}
+          className="w-full border rounded p-2 text-sm text-gray-600 hover:bg-gray-50"
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 }
@@ -1,39 +1,42 @@
 import { useEffect, useState } from 'react';
-import { apiFetch } from '../../api/client';
-import { Order } from '../../types';
+import { apiFetch, apiFetchPage } from '../../api/client';
+import { Order, RevenueMetrics } from '../../types';
 import { useNavigate } from 'react-router-dom';
 
 export default function AllOrders() {
   const [orders, setOrders] = useState<Order[]>([]);
+  const [summary, setSummary] = useState<RevenueMetrics | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const navigate = useNavigate();
 
+  const loadPage = (cursor: string | null) => {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    return apiFetchPage<Order[]>(`/api/orders/all${query}`)
+      .then(page => {
+        setOrders(prev => (cursor ? [...prev, ...page.data] : page.data));
+        setNextCursor(page.nextCursor);
+      })
+      .catch(err => setError(err.message || 'Failed to load orders'));
+  };
+
   useEffect(() => {
-    apiFetch<Order[]>('/api/orders/all')
-      .then(setOrders)
-      .catch(err => setError(err.message || 'Failed to load orders'))
-      .finally(() => setLoading(false));
+    Promise.all([
+      loadPage(null),
+      apiFetch<RevenueMetrics>('/api/orders/summary')
+        .then(setSummary)
+        .catch(err => setError(err.message || 'Failed to load summary'))
+    ]).finally(() => setLoading(false));
   }, []);
 
   if (loading) return <p className="text-gray-500">Loading orders…</p>;
   if (error) return <p className="text-red-600">{error}</p>;
 
-  const totalRevenue = orders
-    .filter(o => o.status === 'PAID')
-    .reduce((sum, o) => sum + o.total, 0);
-
-  const refundedAmount = orders
-    .filter(o => o.status === 'REFUNDED')
-    .reduce((sum, o) => sum + o.total, 0);
-
-  const netRevenue = totalRevenue - refundedAmount;
-
-  const stats = {
-    paid: orders.filter(o => o.status === 'PAID').length,
-    refunded: orders.filter(o => o.status === 'REFUNDED').length,
-    failed: orders.filter(o => o.status === 'FAILED').length,
-  };
+  const totalRevenue = summary?.total_revenue ?? 0;
+  const refundedAmount = summary?.refunded_amount ?? 0;
+  const netRevenue = summary?.net_revenue ?? 0;
+  const paidOrders = summary?.paid_orders ?? 0;
 
   return (
     <div className="space-y-6">
@@ -42,7 +45,7 @@ export default function AllOrders() {
         <Metric label="Total Revenue" value={`$${totalRevenue.toFixed(2)}`} />
         <Metric label="Refunded" value={`$${refundedAmount.toFixed(2)}`} />
         <Metric label="Net Revenue" value={`$${netRevenue.toFixed(2)}`} />
-        <Metric label="Paid Orders" value={stats.paid} />
+        <Metric label="Paid Orders" value={paidOrders} />
       </div>
 
       {/* ================= INVENTORY HEALTH ================= */}
@@ -87,6 +90,15 @@ export default function AllOrders() {
             </div>
           </div>
         ))}
+
+        {nextCursor && (
+          <button
+            onClick={() => loadPage(nextCursor)}
+            className="w-full border rounded p-2 text-sm text-gray-600 hover:bg-gray-50"
+          >
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
@@ -0,0 +1,73 @@
+import os
+import time
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import CatalogVersion
+
+# --------------------------------------------------
+# Catalog version counter
+#
+# Backs the ETag on /api/inventory/products. Writers bump it inside their
+# own transaction, so a reader never sees new rows with an old version.
+# Reading it is a primary-key lookup, which is what lets an unchanged
+# catalog answer 304 without scanning products.
+#
+# The version covers names, prices and which products are in stock, not
+# the stock counts: every reservation would otherwise queue on the one
+# version row. So the ETag is weak, and it also rolls over every
+# CATALOG_STOCK_STALENESS seconds, which bounds how old the counts behind
+# a 304 can be.
+# --------------------------------------------------
+
+VERSION_ROW = 1
+
+# Seconds a 304 may keep serving unchanged stock counts
+CATALOG_STOCK_STALENESS = float(os.getenv("CATALOG_STOCK_STALENESS", "5"))
+
+
+def ensure_version_row(db: Session):
+    if db.get(CatalogVersion, VERSION_ROW) is None:
+        db.add(CatalogVersion(id=VERSION_ROW, version=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another instance seeded it first
+            db.rollback()
+
+
+def current_version(db: Session) -> int:
+    return db.execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == VERSION_ROW)
+    ).scalar_one()
+
+
+def bump_version(db: Session):
+    """Mark the catalog changed; takes effect when the caller commits."""
+    # Pending product changes go out first, so every writer locks product
+    # rows before the version row (as reservations.reserve does) and two
+    # writers cannot deadlock on the pair
+    db.flush()
+    db.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == VERSION_ROW)
+        .values(version=CatalogVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def etag(version: int) -> str:
+    window = int(time.time() // CATALOG_STOCK_STALENESS)
+    return f'W/"catalog-{version}-{window}"'
+
+
+def etag_matches(if_none_match: str | None, current: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison, as If-None-Match calls for
+    current = current.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == current:
+            return True
+    return False
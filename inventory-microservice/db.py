@@ -1,13 +1,14 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-import os
+from fastapi import Request
+from sqlalchemy.orm import declarative_base
+from service_core.database import create_db_engine, create_session_factory
+from service_core.replicas import ReadRouter, wants_primary
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("CRITICAL ERROR: DATABASE_URL environment variable is not set!")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+# Pool sizing, pre-ping, recycle and statement timeout come from the
+# DB_* environment settings, see service_core/database.py
+engine = create_db_engine()
+SessionLocal = create_session_factory(engine)
+# Replicas from DATABASE_REPLICA_URLS, if any, see service_core/replicas.py
+read_router = ReadRouter(engine)
 
 Base = declarative_base()
 
@@ -17,3 +18,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: a replica when one is configured."""
+    with read_router.session(primary=wants_primary(request)) as db:
+        yield db
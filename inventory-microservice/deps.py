@@ -1,6 +1,6 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer
-from jose import jwt
+from service_core.tokens import TokenVerifier, InvalidToken
 import os
 
 security = HTTPBearer()
@@ -8,14 +8,15 @@ SECRET_KEY = os.getenv("JWT_SECRET")
 if not SECRET_KEY:
     raise ValueError("CRITICAL ERROR: JWT_SECRET environment variable is not set!")
 
+verifier = TokenVerifier(SECRET_KEY)
+
 def get_current_user(token=Depends(security)):
     try:
-        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=["HS256"])
-        return payload
-    except:
+        return verifier.verify(token.credentials)
+    except InvalidToken:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 def owner_required(user=Depends(get_current_user)):
-    if user["role"] != "OWNER":
+    if user.get("role") != "OWNER":
         raise HTTPException(status_code=403, detail="Owner only")
     return user
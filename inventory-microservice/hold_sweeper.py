@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import os
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import sessionmaker
+import reservations
+from metrics import stock_hold_units
+
+# --------------------------------------------------
+# Hold expiry
+#
+# Every worker runs one sweeper. Each pass returns expired holds to stock
+# in batches of HOLD_SWEEP_BATCH lines, oldest first, until none are left.
+# Batches skip rows another sweeper has locked, so workers and pods share
+# the work instead of queueing behind each other.
+# --------------------------------------------------
+
+logger = logging.getLogger("holds")
+
+HOLD_SWEEP_INTERVAL = float(os.getenv("HOLD_SWEEP_INTERVAL", "5"))
+HOLD_SWEEP_BATCH = int(os.getenv("HOLD_SWEEP_BATCH", "500"))
+
+
+class HoldSweeper:
+    def __init__(self, session_factory: sessionmaker):
+        self._session_factory = session_factory
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                while await run_in_threadpool(self.sweep_batch):
+                    pass
+            except Exception:
+                logger.exception("Hold sweep failed")
+            await asyncio.sleep(HOLD_SWEEP_INTERVAL)
+
+    def sweep_batch(self) -> int:
+        """Expire one batch; returns the units given back."""
+        with self._session_factory() as db:
+            qty_by_pid = reservations.expire(db, HOLD_SWEEP_BATCH)
+        units = sum(qty_by_pid.values())
+        if units:
+            stock_hold_units.labels("expired").inc(units)
+        return units
@@ -0,0 +1,219 @@
+import glob
+import heapq
+import json
+import os
+import threading
+import time
+from prometheus_client.core import GaugeMetricFamily
+from service_core.exposition import PROMETHEUS_MULTIPROC_DIR
+
+# --------------------------------------------------
+# Hot products
+#
+# Reservation and release volumes per product are tracked with a
+# space-saving sketch instead of one Prometheus series per product_id.
+# The sketch keeps at most HOT_PRODUCTS_CAPACITY counters however many
+# products exist, and any product whose true volume exceeds
+# total / capacity is guaranteed to be among them.
+# --------------------------------------------------
+
+HOT_PRODUCTS_CAPACITY = int(os.getenv("HOT_PRODUCTS_CAPACITY", "1000"))
+# How many of the tracked products are exported as metric series
+HOT_PRODUCTS_EXPORT_TOP = int(os.getenv("HOT_PRODUCTS_EXPORT_TOP", "20"))
+# Multi-worker mode: how often each worker publishes its sketches
+HOT_PRODUCTS_FLUSH_INTERVAL = float(os.getenv("HOT_PRODUCTS_FLUSH_INTERVAL", "5"))
+
+
+class SpaceSaving:
+    """Weighted space-saving heavy-hitter sketch (Metwally et al.).
+
+    Each tracked item has an estimated count and an error bound;
+    count - error is a lower bound on its true total and count an upper
+    bound. When the sketch is full, a new item replaces the item with the
+    smallest count and inherits that count as its error.
+    """
+
+    def __init__(self, capacity: int = HOT_PRODUCTS_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._capacity = capacity
+        self._counts: dict[int, int] = {}
+        self._errors: dict[int, int] = {}
+        # One (count, item) entry per tracked item. Counts only grow, so a
+        # stale key is a lower bound and is refreshed when it surfaces.
+        self._heap: list[tuple[int, int]] = []
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def add(self, item: int, weight: int = 1):
+        with self._lock:
+            self._total += weight
+            if item in self._counts:
+                self._counts[item] += weight
+                return
+            if len(self._counts) < self._capacity:
+                self._counts[item] = weight
+                self._errors[item] = 0
+                heapq.heappush(self._heap, (weight, item))
+                return
+            floor, victim = self._pop_min()
+            del self._counts[victim]
+            del self._errors[victim]
+            self._counts[item] = floor + weight
+            self._errors[item] = floor
+            heapq.heappush(self._heap, (floor + weight, item))
+
+    def _pop_min(self) -> tuple[int, int]:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            current = self._counts[item]
+            if count == current:
+                return count, item
+            heapq.heappush(self._heap, (current, item))
+
+    def top(self, n: int) -> list[tuple[int, int, int]]:
+        """The n highest estimates as (item, count, error)."""
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+            return [(item, count, self._errors[item]) for item, count in ranked]
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def _floor(self) -> int:
+        # What an untracked item may have had: 0 until the sketch is full
+        if len(self._counts) < self._capacity:
+            return 0
+        return min(self._counts.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total": self._total,
+                "floor": self._floor(),
+                "items": [[item, count, self._errors[item]] for item, count in self._counts.items()],
+            }
+
+    @classmethod
+    def merged(cls, snapshots: list[dict], capacity: int = HOT_PRODUCTS_CAPACITY) -> "SpaceSaving":
+        """Combine sketches from several workers (Agarwal et al. merge).
+
+        An item missing from one sketch is credited that sketch's floor as
+        both count and error, which keeps the bounds valid for the union.
+        """
+        counts: dict[int, int] = {}
+        errors: dict[int, int] = {}
+        floors = sum(snap["floor"] for snap in snapshots)
+        for snap in snapshots:
+            for item, count, error in snap["items"]:
+                counts[item] = counts.get(item, 0) + count - snap["floor"]
+                errors[item] = errors.get(item, 0) + error - snap["floor"]
+
+        out = cls(capacity)
+        ranked = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:capacity]
+        for item, count in ranked:
+            out._counts[item] = count + floors
+            out._errors[item] = errors[item] + floors
+            out._heap.append((count + floors, item))
+        heapq.heapify(out._heap)
+        out._total = sum(snap["total"] for snap in snapshots)
+        return out
+
+
+reserved = SpaceSaving()
+released = SpaceSaving()
+
+SKETCHES = {"reserved": reserved, "released": released}
+
+# --------------------------------------------------
+# Multi-worker mode
+#
+# Each worker only sees the requests it served, so it writes its sketches
+# next to the Prometheus multiprocess files every
+# HOT_PRODUCTS_FLUSH_INTERVAL seconds, and readers merge those with their
+# own live sketch. Files of exited workers are kept, so totals survive
+# worker restarts the same way multiprocess counters do.
+# --------------------------------------------------
+
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _sketch_file(pid: int) -> str:
+    return os.path.join(PROMETHEUS_MULTIPROC_DIR, f"hot_products_{pid}.json")
+
+
+def flush():
+    """Publish this worker's sketches; also called on shutdown."""
+    global _last_flush
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return
+    with _flush_lock:
+        _last_flush = time.monotonic()
+        path = _sketch_file(os.getpid())
+        with open(path + ".tmp", "w") as f:
+            json.dump({kind: sketch.snapshot() for kind, sketch in SKETCHES.items()}, f)
+        os.replace(path + ".tmp", path)
+
+
+def _flush_if_due():
+    if time.monotonic() - _last_flush >= HOT_PRODUCTS_FLUSH_INTERVAL:
+        flush()
+
+
+def record(sketch: SpaceSaving, qty_by_pid: dict[int, int]):
+    for pid, qty in qty_by_pid.items():
+        sketch.add(pid, qty)
+    if PROMETHEUS_MULTIPROC_DIR:
+        _flush_if_due()
+
+
+def view(kind: str) -> SpaceSaving:
+    """The sketch for kind across all workers of this instance."""
+    own = SKETCHES[kind]
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return own
+
+    snapshots = [own.snapshot()]
+    mine = _sketch_file(os.getpid())
+    for path in glob.glob(_sketch_file("*")):
+        if path == mine:
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f)[kind])
+        except (OSError, ValueError, KeyError):
+            continue
+    return SpaceSaving.merged(snapshots)
+
+
+class HotProductsCollector:
+    """Exports the top HOT_PRODUCTS_EXPORT_TOP products of each sketch.
+
+    At most 2 * HOT_PRODUCTS_EXPORT_TOP product_id series exist at any
+    scrape; products that drop out of the top simply stop being reported.
+    """
+
+    def __init__(self, top: int = HOT_PRODUCTS_EXPORT_TOP):
+        self._top = top
+
+    def describe(self):
+        return self._families(with_samples=False)
+
+    def collect(self):
+        return self._families(with_samples=True)
+
+    def _families(self, with_samples: bool):
+        families = []
+        for kind in SKETCHES:
+            family = GaugeMetricFamily(
+                f"stock_{kind}_top_units",
+                f"Estimated units {kind} for the top {self._top} products (upper bound)",
+                labels=["product_id"]
+            )
+            if with_samples:
+                for pid, count, _ in view(kind).top(self._top):
+                    family.add_metric([str(pid)], count)
+            families.append(family)
+        return families
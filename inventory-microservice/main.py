@@ -1,35 +1,67 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Query, Header
 from fastapi.responses import Response
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from db import Base, engine, get_db
+from db import engine, get_db, get_read_db, SessionLocal
 from models import Product
 from deps import owner_required
-from pydantic import BaseModel
+import reservations
+import catalog
+import product_import
+import hot_products
+from hold_sweeper import HoldSweeper
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from metrics import (
     inventory_requests,
     stock_reserved,
     stock_released,
+    stock_hold_units,
     inventory_latency,
-    http_requests_total, 
-    http_request_latency_seconds
 )
-import time
-
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Inventory Service")
+from service_core.http_metrics import PrometheusMiddleware
+from service_core.deadline import DeadlineMiddleware
+from service_core.exposition import metrics_response, register_collector
+from service_core.health import Readiness, get_readiness
+from service_core.responses import default_response_class
+
+register_collector(hot_products.HotProductsCollector())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.readiness = Readiness(engine)
+    app.state.readiness.start()
+    app.state.hold_sweeper = HoldSweeper(SessionLocal)
+    app.state.hold_sweeper.start()
+    try:
+        yield
+    finally:
+        await app.state.hold_sweeper.stop()
+        await app.state.readiness.stop()
+        hot_products.flush()
+
+app = FastAPI(
+    title="Inventory Service",
+    lifespan=lifespan,
+    default_response_class=default_response_class()
+)
 
 class ProductCreate(BaseModel):
     name: str
     price: float
     stock: int
+
 class ProductResponse(BaseModel):
+    # Read straight from Product rows, see response_model below
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     name: str
     price: float
     stock: int
+    reserved: int = 0
 
 class PriceUpdate(BaseModel):
     price: float
@@ -37,42 +69,65 @@ class PriceUpdate(BaseModel):
 class RefillRequest(BaseModel):
     qty: int
 
-class Config:
-    orm_mode = True
-    
-@app.middleware("http")
-async def prometheus_middleware(request: Request, call_next):
-    start = time.time()
-    response = await call_next(request)
-    duration = time.time() - start
-
-    http_requests_total.labels(
-        request.method,
-        request.url.path,
-        response.status_code
-    ).inc()
-
-    http_request_latency_seconds.labels(
-        request.url.path
-    ).observe(duration)
+class StockItem(BaseModel):
+    product_id: int
+    qty: int = Field(..., gt=0)
 
-    return response
+# Added first so it runs inside the metrics middleware and its 504s are counted
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(PrometheusMiddleware)
 
-@app.get("/api/inventory/products")
-def list_products(db: Session = Depends(get_db)):
-    return db.query(Product).all()
+MAX_PAGE_SIZE = 1000
 
-@app.post("/api/inventory/products")
+def parse_ids(ids: str) -> list[int]:
+    try:
+        return [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(400, "ids must be a comma-separated list of integers")
+
+@app.get("/api/inventory/products", response_model=List[ProductResponse])
+def list_products(
+    request: Request,
+    response: Response,
+    ids: str | None = None,
+    after: int | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db)
+):
+    etag = catalog.etag(catalog.current_version(db))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if catalog.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    q = db.query(Product)
+    if ids is not None:
+        q = q.filter(Product.id.in_(parse_ids(ids)))
+    if after is not None:
+        q = q.filter(Product.id > after)
+    q = q.order_by(Product.id)
+    if limit is not None:
+        q = q.limit(limit)
+    products = q.all()
+
+    response.headers.update(headers)
+    if limit is not None and len(products) == limit:
+        # Keyset cursor for the next page
+        response.headers["X-Next-After"] = str(products[-1].id)
+    return products
+
+@app.post("/api/inventory/products", response_model=ProductResponse)
 def add_product(data: ProductCreate,
                 db: Session = Depends(get_db),
                 user=Depends(owner_required)):
     p = Product(name=data.name, price=data.price, stock=data.stock)
     db.add(p)
+    catalog.bump_version(db)
     db.commit()
     db.refresh(p)
     return p
 
-@app.put("/api/inventory/products/{pid}")
+@app.put("/api/inventory/products/{pid}", response_model=ProductResponse)
 def update_price(pid: int,
                  data: PriceUpdate,
                  db: Session = Depends(get_db),
@@ -81,6 +136,7 @@ def update_price(pid: int,
     if not p:
         raise HTTPException(404)
     p.price = data.price
+    catalog.bump_version(db)
     db.commit()
     return p
 
@@ -93,32 +149,50 @@ def add_products_bulk(
     db: Session = Depends(get_db),
     user=Depends(owner_required)
 ):
-    try:
-        db_products = [
-            Product(
-                name=p.name,
-                price=p.price,
-                stock=p.stock
-            )
-            for p in products
-        ]
+    if not products:
+        return []
 
-        db.add_all(db_products)
+    try:
+        # One multi-row INSERT ... RETURNING instead of a refresh per product
+        db_products = db.scalars(
+            insert(Product).returning(Product),
+            [p.model_dump() for p in products]
+        ).all()
+        created = [ProductResponse.model_validate(p) for p in db_products]
+
+        catalog.bump_version(db)
         db.commit()
-
-        # Ensure IDs are loaded
-        for product in db_products:
-            db.refresh(product)
-
-        return db_products
+        return created
 
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/inventory/products/import")
+async def import_products(
+    request: Request,
+    db: Session = Depends(get_db),
+    user=Depends(owner_required)
+):
+    """Create or update products from a CSV (name,price,stock header) or
+    NDJSON upload, streamed in. Rows that fail are listed by line number;
+    the others are imported.
+    """
+    fmt = product_import.upload_format(request.headers.get("content-type"))
+    if not fmt:
+        raise HTTPException(415, "Upload text/csv or application/x-ndjson")
+
+    try:
+        result = await product_import.import_products(db, request.stream(), fmt)
+    except product_import.ImportFormatError as e:
+        # Chunks before the bad part are already committed
+        raise HTTPException(400, str(e))
+
+    return result.as_dict()
 
 
-@app.post("/api/inventory/refill/{pid}")
+
+@app.post("/api/inventory/refill/{pid}", response_model=ProductResponse)
 def refill_stock(pid: int,
                  data: RefillRequest,
                  db: Session = Depends(get_db),
@@ -127,49 +201,191 @@ def refill_stock(pid: int,
     if not p:
         raise HTTPException(404)
     p.stock += data.qty
+    catalog.bump_version(db)
     db.commit()
     return p
 
 @app.post("/api/inventory/reserve/{pid}")
 def reserve_stock(pid: int, qty: int, db: Session = Depends(get_db)):
-    p = db.get(Product, pid)
-
-    if not p or p.stock < qty:
+    # No hold: the units are sold straight away, as this endpoint always did
+    try:
+        prices = reservations.reserve(db, {pid: qty})["prices"]
+    except reservations.OutOfStock:
         return {"status": "out_of_stock"}
 
-    p.stock -= qty
-    db.commit()
-
     # PROMETHEUS
-    stock_reserved.labels(str(pid)).inc(qty)
+    stock_reserved.inc(qty)
+    hot_products.record(hot_products.reserved, {pid: qty})
 
     return {
         "status": "reserved",
-        "price": p.price
+        "price": prices[pid]
     }
 
 
 
 @app.post("/api/inventory/release/{product_id}")
 def release(product_id: int, qty: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    try:
+        reservations.release(db, {product_id: qty})
+    except reservations.UnknownProduct:
         raise HTTPException(404)
 
-    product.stock += qty
-    db.commit()
+    # METRIC
+    stock_released.inc(qty)
+    hot_products.record(hot_products.released, {product_id: qty})
+
+    return {"status": "released"}
+
+
+
+def merge_stock_items(items: List[StockItem]) -> dict[int, int]:
+    # Duplicate lines for one product are applied as a single change
+    qty_by_pid: dict[int, int] = {}
+    for i in items:
+        qty_by_pid[i.product_id] = qty_by_pid.get(i.product_id, 0) + i.qty
+    return qty_by_pid
+
+def reused_key():
+    return HTTPException(422, "Idempotency-Key was already used for a different operation")
+
+@app.post("/api/inventory/reserve")
+def reserve_stock_batch(
+    items: List[StockItem],
+    response: Response,
+    idempotency_key: str | None = Header(None, max_length=255),
+    db: Session = Depends(get_db)
+):
+    """Hold stock for every line or none.
+
+    The hold lasts HOLD_TTL seconds unless confirmed (a sale) or cancelled
+    first; the Idempotency-Key, if given, is the hold id.
+    """
+    qty_by_pid = merge_stock_items(items)
+    hold_id = idempotency_key or uuid.uuid4().hex
+
+    try:
+        result = reservations.reserve(db, qty_by_pid, hold_id=hold_id)
+    except reservations.OutOfStock as e:
+        return {"status": "out_of_stock", "product_id": e.product_id}
+    except reservations.KeyReused:
+        raise reused_key()
+    except reservations.Replayed as r:
+        response.headers["Idempotent-Replayed"] = "true"
+        result = r.result
+    else:
+        # PROMETHEUS
+        stock_reserved.inc(sum(qty_by_pid.values()))
+        hot_products.record(hot_products.reserved, qty_by_pid)
+
+    prices = result["prices"]
+    return {
+        "status": "reserved",
+        "hold_id": hold_id,
+        "expires_at": result["expires_at"],
+        "items": [
+            {"product_id": pid, "qty": qty, "price": prices[pid]}
+            for pid, qty in qty_by_pid.items()
+        ]
+    }
+
+@app.post("/api/inventory/holds/{hold_id}/confirm")
+def confirm_hold(hold_id: str, response: Response, db: Session = Depends(get_db)):
+    try:
+        qty_by_pid = reservations.confirm(db, hold_id)
+    except reservations.UnknownHold:
+        raise HTTPException(404, "Hold not found")
+    except reservations.HoldExpired:
+        raise HTTPException(409, "Hold expired or was cancelled")
+    except reservations.KeyReused:
+        raise reused_key()
+    except reservations.Replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+        return {"status": "confirmed"}
+
+    stock_hold_units.labels("confirmed").inc(sum(qty_by_pid.values()))
+    return {"status": "confirmed"}
+
+@app.post("/api/inventory/holds/{hold_id}/cancel")
+def cancel_hold(hold_id: str, db: Session = Depends(get_db)):
+    # Safe to repeat: a hold that is already gone has nothing to return
+    qty_by_pid = reservations.cancel(db, hold_id)
+    stock_hold_units.labels("cancelled").inc(sum(qty_by_pid.values()))
+    return {"status": "cancelled"}
+
+@app.post("/api/inventory/release")
+def release_batch(
+    items: List[StockItem],
+    response: Response,
+    idempotency_key: str | None = Header(None, max_length=255),
+    db: Session = Depends(get_db)
+):
+    qty_by_pid = merge_stock_items(items)
+
+    try:
+        reservations.release(db, qty_by_pid, key=idempotency_key)
+    except reservations.UnknownProduct as e:
+        raise HTTPException(404, f"Product {e.product_id} not found")
+    except reservations.KeyReused:
+        raise reused_key()
+    except reservations.Replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+        return {"status": "released"}
 
     # METRIC
-    stock_released.labels(str(product_id)).inc(qty)
+    stock_released.inc(sum(qty_by_pid.values()))
+    hot_products.record(hot_products.released, qty_by_pid)
 
     return {"status": "released"}
 
 
 
+@app.get("/api/inventory/hot-products")
+def get_hot_products(
+    kind: str = Query("reserved", pattern="^(reserved|released)$"),
+    limit: int = Query(10, ge=1, le=hot_products.HOT_PRODUCTS_CAPACITY),
+    db: Session = Depends(get_db)
+):
+    """Products with the most units reserved (or released) since start.
+
+    Counts are estimates from this instance's sketch: the true volume lies
+    between count - error and count.
+    """
+    sketch = hot_products.view(kind)
+    top = sketch.top(limit)
+    names = dict(
+        db.query(Product.id, Product.name)
+        .filter(Product.id.in_([pid for pid, _, _ in top]))
+        .all()
+    ) if top else {}
+
+    return {
+        "kind": kind,
+        "total_units": sketch.total,
+        "products": [
+            {
+                "product_id": pid,
+                "name": names.get(pid),
+                "count": count,
+                "error": error,
+            }
+            for pid, count, error in top
+        ]
+    }
+
+
 @app.get("/api/inventory/metrics")
 def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return metrics_response()
+
+
+@app.get("/api/inventory/live")
+def live():
+    return {"status": "alive"}
 
+@app.get("/api/inventory/ready")
+async def ready(readiness: Readiness = Depends(get_readiness)):
+    return await readiness.response()
 
 @app.get("/api/inventory/health")
 def health():
@@ -1,16 +1,4 @@
 from prometheus_client import Counter, Histogram
-http_requests_total = Counter(
-    "http_requests_total",
-    "Total HTTP requests",
-    ["method", "endpoint", "status"]
-)
-
-http_request_latency_seconds = Histogram(
-    "http_request_latency_seconds",
-    "HTTP request latency",
-    ["endpoint"]
-)
-
 inventory_requests = Counter(
     "inventory_requests_total",
     "Inventory API calls",
@@ -19,18 +7,32 @@ inventory_requests = Counter(
 
 stock_reserved = Counter(
     "stock_reserved_total",
-    "Number of items reserved",
-    ["product_id"]
+    "Number of items reserved"
 )
 
 stock_released = Counter(
     "stock_released_total",
-    "Number of items released",
-    ["product_id"]
+    "Number of items released"
 )
 
+# Per-product volumes are exported by hot_products.HotProductsCollector
+
 inventory_latency = Histogram(
     "inventory_request_latency_seconds",
     "Inventory API latency",
     ["endpoint"]
 )
+
+# Units leaving holds, by how: confirmed / cancelled / expired
+stock_hold_units = Counter(
+    "stock_hold_units_total",
+    "Held units settled",
+    ["outcome"]
+)
+
+# Rows of bulk imports, by outcome: upserted / unchanged / failed
+product_import_rows = Counter(
+    "product_import_rows_total",
+    "Rows processed by product imports",
+    ["outcome"]
+)
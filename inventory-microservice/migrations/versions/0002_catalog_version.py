@@ -0,0 +1,29 @@
+"""catalog version counter for product list ETags
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table(
+        "catalog_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # The single row catalog.py bumps
+    op.bulk_insert(catalog_version, [{"id": 1, "version": 0}])
+
+
+def downgrade():
+    op.drop_table("catalog_version")
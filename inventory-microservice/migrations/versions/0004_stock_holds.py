@@ -0,0 +1,38 @@
+"""time-limited stock holds
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.add_column(sa.Column("reserved", sa.Integer(), server_default="0", nullable=False))
+
+    op.create_table(
+        "stock_holds",
+        sa.Column("hold_id", sa.String(length=255), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("qty", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("hold_id", "product_id"),
+    )
+    op.create_index("ix_stock_holds_expires_at", "stock_holds", ["expires_at"])
+
+
+def downgrade():
+    # Outstanding holds go back to available stock
+    op.execute("UPDATE products SET stock = stock + reserved")
+    op.drop_index("ix_stock_holds_expires_at", table_name="stock_holds")
+    op.drop_table("stock_holds")
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("reserved")
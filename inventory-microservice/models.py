@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Index
+from sqlalchemy.sql import func
 from db import Base
 
 class Product(Base):
@@ -7,4 +8,39 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True)
     price = Column(Float)
+    # Available to reserve; units held by unexpired holds are in reserved,
+    # so on-hand stock is stock + reserved
     stock = Column(Integer)
+    reserved = Column(Integer, nullable=False, default=0, server_default="0")
+
+class CatalogVersion(Base):
+    # Single row; bumped whenever the catalog representation changes
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class StockRequest(Base):
+    # Idempotency-Key of an applied batch reserve/release and its result,
+    # so a retried request is answered without moving stock twice
+    __tablename__ = "stock_requests"
+
+    key = Column(String(255), primary_key=True)
+    kind = Column(String(10), nullable=False)  # reserve / release
+    result = Column(Text, nullable=False, default="{}")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class StockHold(Base):
+    # Units taken from Product.stock by a reservation that is neither
+    # confirmed nor cancelled yet; the sweeper hands them back after
+    # expires_at, see hold_sweeper.py
+    __tablename__ = "stock_holds"
+
+    hold_id = Column(String(255), primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    qty = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_stock_holds_expires_at", "expires_at"),
+    )
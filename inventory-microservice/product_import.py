@@ -0,0 +1,269 @@
+import codecs
+import csv
+import json
+import math
+import os
+from typing import AsyncIterator
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from models import Product
+from metrics import product_import_rows
+import catalog
+
+# --------------------------------------------------
+# Bulk product import
+#
+# The upload is read as it arrives, one line per record (CSV with a
+# header line, or NDJSON), and written in chunks of IMPORT_CHUNK_SIZE
+# rows: one multi-row INSERT ... ON CONFLICT (name) DO UPDATE ...
+# RETURNING per chunk, committed on its own. Memory is bounded by the
+# chunk, not the upload.
+#
+# A row that cannot be imported is reported with its line number and
+# skipped; the rest of the upload still goes in. Rows whose price and
+# stock already match are left alone (the DO UPDATE has a WHERE), so
+# re-importing a catalog only writes what changed. Within one chunk the
+# last row for a name wins.
+#
+# An imported stock is the count on hand. Units held by open reservations
+# are already out of Product.stock (see models.Product), so an existing
+# product gets the imported count less its reserved units, never below 0.
+# --------------------------------------------------
+
+# Rows per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Errors listed in the response; failed rows past this are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+COLUMNS = ("name", "price", "stock")
+MAX_STOCK = 2**31 - 1
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class ImportFormatError(Exception):
+    """The upload as a whole cannot be read (bad header or encoding)."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.upserted = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "upserted": self.upserted,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def upload_format(content_type: str | None) -> str | None:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return FORMATS.get(media_type)
+
+
+# --------------------------------------------------
+# Reading
+# --------------------------------------------------
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    """Numbered, non-blank lines of a UTF-8 body, decoded as it streams in."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    line_no = 0
+    try:
+        async for chunk in chunks:
+            lines = (tail + decoder.decode(chunk)).split("\n")
+            tail = lines.pop()
+            for line in lines:
+                line_no += 1
+                if line.strip():
+                    yield line_no, line
+        tail += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"Upload is not valid UTF-8 (after line {line_no})")
+    if tail.strip():
+        yield line_no + 1, tail
+
+
+def _csv_fields(line: str) -> list[str]:
+    return next(csv.reader([line]))
+
+
+def parse_product(record) -> dict:
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+
+    name = record.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("name is required")
+
+    price = record.get("price")
+    try:
+        if isinstance(price, bool):
+            raise ValueError
+        price = float(price)
+    except (TypeError, ValueError):
+        raise ValueError("price must be a number")
+    if not math.isfinite(price) or price < 0:
+        raise ValueError("price must be a non-negative number")
+
+    stock = record.get("stock")
+    try:
+        if isinstance(stock, bool) or (isinstance(stock, float) and not stock.is_integer()):
+            raise ValueError
+        stock = int(stock)
+    except (TypeError, ValueError):
+        raise ValueError("stock must be an integer")
+    if not 0 <= stock <= MAX_STOCK:
+        raise ValueError(f"stock must be between 0 and {MAX_STOCK}")
+
+    return {"name": name.strip(), "price": price, "stock": stock}
+
+
+async def _records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple[int, dict | str]]:
+    """(line, record) pairs; record is an error message if the line is malformed."""
+    header = None
+    async for line_no, line in _lines(chunks):
+        if fmt == "ndjson":
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, "invalid JSON"
+            continue
+
+        fields = _csv_fields(line)
+        if header is None:
+            header = [f.strip().lower() for f in fields]
+            missing = [c for c in COLUMNS if c not in header]
+            if missing:
+                raise ImportFormatError(f"CSV header is missing {', '.join(missing)}")
+            continue
+        if len(fields) != len(header):
+            yield line_no, f"expected {len(header)} fields, got {len(fields)}"
+            continue
+        yield line_no, dict(zip(header, fields))
+
+
+# --------------------------------------------------
+# Writing
+# --------------------------------------------------
+
+def _upsert(db: Session):
+    insert = _INSERTS[db.get_bind().dialect.name]
+    stmt = insert(Product)
+    new = stmt.excluded
+    available = case((new.stock > Product.reserved, new.stock - Product.reserved), else_=0)
+    return stmt.on_conflict_do_update(
+        index_elements=[Product.name],
+        set_={"price": new.price, "stock": available},
+        where=or_(
+            Product.price.is_distinct_from(new.price),
+            Product.stock.is_distinct_from(available),
+        ),
+    ).returning(Product.name)
+
+
+def _execute(db: Session, stmt, rows: list[dict]) -> set[str]:
+    # Executed as executemany: SQLAlchemy sends it as multi-row INSERTs
+    # ("insertmanyvalues") from a compiled statement it caches, about ten
+    # times faster than compiling stmt.values(rows) afresh for each chunk
+    return set(db.connection().execute(stmt, rows).scalars())
+
+
+def _db_error(e: DBAPIError) -> str:
+    return str(e.orig).strip().splitlines()[0]
+
+
+def write_chunk(db: Session, batch: list[tuple[int, dict]], result: ImportResult):
+    """Upsert one chunk in one transaction; row by row if the chunk fails."""
+    # The last row for a name is the one written; earlier ones share its
+    # outcome, as if they had been written one after the other
+    last: dict[str, tuple[int, dict]] = {}
+    count: dict[str, int] = {}
+    for line, row in batch:
+        last[row["name"]] = (line, row)
+        count[row["name"]] = count.get(row["name"], 0) + 1
+
+    stmt = _upsert(db)
+    try:
+        written = _execute(db, stmt, [row for _, row in last.values()])
+        failed = {}
+        if written:
+            catalog.bump_version(db)
+        db.commit()
+    except DBAPIError:
+        db.rollback()
+        written, failed = _write_rows(db, stmt, last.values())
+
+    for name, n in count.items():
+        if name in written:
+            result.upserted += n
+            product_import_rows.labels("upserted").inc(n)
+        elif name in failed:
+            result.error(last[name][0], failed[name])
+            result.failed += n - 1
+            product_import_rows.labels("failed").inc(n)
+        else:
+            result.unchanged += n
+            product_import_rows.labels("unchanged").inc(n)
+
+
+def _write_rows(db: Session, stmt, rows) -> tuple[set[str], dict[str, str]]:
+    """Find the rows the database refuses: each in its own savepoint."""
+    written, failed = set(), {}
+    for _, row in rows:
+        try:
+            with db.begin_nested():
+                written |= _execute(db, stmt, [row])
+        except DBAPIError as e:
+            failed[row["name"]] = _db_error(e)
+    if written:
+        catalog.bump_version(db)
+    db.commit()
+    return written, failed
+
+
+async def import_products(db: Session, chunks: AsyncIterator[bytes], fmt: str) -> ImportResult:
+    result = ImportResult()
+    batch: list[tuple[int, dict]] = []
+
+    async for line, record in _records(chunks, fmt):
+        result.rows += 1
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            batch.append((line, parse_product(record)))
+        except ValueError as e:
+            result.error(line, str(e))
+            product_import_rows.labels("failed").inc()
+            continue
+
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await run_in_threadpool(write_chunk, db, batch, result)
+            batch = []
+
+    if batch:
+        await run_in_threadpool(write_chunk, db, batch, result)
+    return result
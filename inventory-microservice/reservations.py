@@ -0,0 +1,284 @@
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Product, StockHold, StockRequest
+import catalog
+
+# --------------------------------------------------
+# Reservation engine
+#
+# Every stock change is a single conditional UPDATE, so the check and the
+# decrement happen atomically inside the database. No row is read into
+# Python first, which removes the lost-update race and keeps the row lock
+# held only for the duration of the statement.
+#
+# A reservation is a hold: its units move from Product.stock (available)
+# to Product.reserved and a StockHold row records them with an expiry.
+# Confirming the hold turns it into a sale; cancelling it, or letting it
+# expire, moves the units back. A checkout that dies halfway therefore
+# gives its stock back by itself, without a release call.
+# --------------------------------------------------
+
+HOLD_TTL = float(os.getenv("HOLD_TTL", "900"))
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id: int):
+        super().__init__(f"Product {product_id} out of stock")
+        self.product_id = product_id
+
+
+class UnknownProduct(Exception):
+    def __init__(self, product_id: int):
+        super().__init__(f"Product {product_id} not found")
+        self.product_id = product_id
+
+
+class UnknownHold(Exception):
+    """No reservation was ever made with this hold id."""
+
+
+class HoldExpired(Exception):
+    """The hold was cancelled or expired before it was confirmed."""
+
+
+class KeyReused(Exception):
+    """The Idempotency-Key was already used for the other operation."""
+
+
+class Replayed(Exception):
+    """The keyed request was already applied; nothing changed this time."""
+
+    def __init__(self, result: dict):
+        super().__init__("Request already applied")
+        self.result = result
+
+
+def _claim_key(db: Session, key: str, kind: str) -> StockRequest | None:
+    """Record key as the first statement of the transaction.
+
+    Returns the earlier request if the key was already applied, otherwise
+    None. A concurrent request with the same key blocks on the primary key
+    until the first one commits (then sees it) or rolls back (then
+    proceeds).
+    """
+    db.add(StockRequest(key=key, kind=kind))
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        prior = db.get(StockRequest, key)
+        if prior.kind != kind:
+            raise KeyReused()
+        return prior
+    return None
+
+
+def _decrement(db: Session, pid: int, qty: int, hold: bool):
+    values = {"stock": Product.stock - qty}
+    if hold:
+        values["reserved"] = Product.reserved + qty
+    stmt = (
+        update(Product)
+        .where(Product.id == pid, Product.stock >= qty)
+        .values(**values)
+        .returning(Product.price, Product.stock)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).first()
+
+
+def _increment(db: Session, pid: int, qty: int, held: bool = False):
+    values = {"stock": Product.stock + qty}
+    if held:
+        values["reserved"] = Product.reserved - qty
+    stmt = (
+        update(Product)
+        .where(Product.id == pid)
+        .values(**values)
+        .returning(Product.stock)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def _settle(db: Session, pid: int, qty: int):
+    # A confirmed hold: the units leave reserved and are gone
+    db.execute(
+        update(Product)
+        .where(Product.id == pid)
+        .values(reserved=Product.reserved - qty)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _return_held(db: Session, qty_by_pid: dict[int, int]):
+    """Move held units back to available stock; the caller commits."""
+    restocked = False
+    for pid in sorted(qty_by_pid):
+        stock = _increment(db, pid, qty_by_pid[pid], held=True)
+        restocked = restocked or stock == qty_by_pid[pid]
+    if restocked:
+        catalog.bump_version(db)
+
+
+def _prior_reservation(prior: StockRequest) -> dict:
+    result = json.loads(prior.result)
+    return {
+        "prices": {int(pid): price for pid, price in result["prices"].items()},
+        "expires_at": result["expires_at"],
+    }
+
+
+def reserve(
+    db: Session,
+    qty_by_pid: dict[int, int],
+    hold_id: str | None = None,
+    ttl: float = HOLD_TTL,
+) -> dict:
+    """Reserve every line or none.
+
+    Returns {"prices": locked price per product, "expires_at": ...}. With a
+    hold_id the units are held until confirm/cancel or ttl seconds, and a
+    repeat with the same hold_id raises Replayed carrying the original
+    result. Without one the units are sold outright (expires_at is None).
+
+    Rows are updated in product-id order so two overlapping batches always
+    take their row locks in the same order and cannot deadlock.
+    """
+    prior = _claim_key(db, hold_id, "reserve") if hold_id else None
+    if prior:
+        raise Replayed(_prior_reservation(prior))
+
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl) if hold_id else None
+    prices: dict[int, float] = {}
+    sold_out = False
+    try:
+        for pid in sorted(qty_by_pid):
+            row = _decrement(db, pid, qty_by_pid[pid], hold=bool(hold_id))
+            if row is None:
+                raise OutOfStock(pid)
+            prices[pid] = row.price
+            sold_out = sold_out or row.stock == 0
+            if hold_id:
+                db.add(StockHold(
+                    hold_id=hold_id, product_id=pid,
+                    qty=qty_by_pid[pid], expires_at=expires_at
+                ))
+        # Stock counts alone don't move the catalog version, but a product
+        # going out of stock does, so cached catalogs stop offering it.
+        if sold_out:
+            catalog.bump_version(db)
+        result = {
+            "prices": prices,
+            "expires_at": expires_at.isoformat() if expires_at else None,
+        }
+        if hold_id:
+            db.get(StockRequest, hold_id).result = json.dumps(result)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+
+def _lock_hold(db: Session, hold_id: str) -> list[StockHold]:
+    return (
+        db.query(StockHold)
+        .filter(StockHold.hold_id == hold_id)
+        .order_by(StockHold.product_id)
+        .with_for_update()
+        .all()
+    )
+
+
+def confirm(db: Session, hold_id: str) -> dict[int, int]:
+    """Turn a hold into a sale; returns the units confirmed per product.
+
+    Raises HoldExpired if the hold is gone (expired or cancelled), and
+    Replayed if it was already confirmed.
+    """
+    if _claim_key(db, f"{hold_id}:confirm", "confirm"):
+        raise Replayed({})
+
+    try:
+        holds = _lock_hold(db, hold_id)
+        if not holds:
+            reserved = db.get(StockRequest, hold_id)
+            raise HoldExpired() if reserved and reserved.kind == "reserve" else UnknownHold()
+
+        qty_by_pid = {h.product_id: h.qty for h in holds}
+        for h in holds:
+            _settle(db, h.product_id, h.qty)
+            db.delete(h)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return qty_by_pid
+
+
+def cancel(db: Session, hold_id: str) -> dict[int, int]:
+    """Give a hold's units back; returns them per product (empty if the
+    hold was already confirmed, cancelled or expired)."""
+    try:
+        holds = _lock_hold(db, hold_id)
+        qty_by_pid = {h.product_id: h.qty for h in holds}
+        _return_held(db, qty_by_pid)
+        for h in holds:
+            db.delete(h)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return qty_by_pid
+
+
+def expire(db: Session, limit: int) -> dict[int, int]:
+    """Return up to limit expired hold lines to stock; returns units per product.
+
+    Walks the expires_at index oldest first. Rows locked by a concurrent
+    confirm/cancel (or another sweeper) are skipped, not waited on.
+    """
+    try:
+        holds = (
+            db.query(StockHold)
+            .filter(StockHold.expires_at <= datetime.utcnow())
+            .order_by(StockHold.expires_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        qty_by_pid: dict[int, int] = {}
+        for h in holds:
+            qty_by_pid[h.product_id] = qty_by_pid.get(h.product_id, 0) + h.qty
+            db.delete(h)
+        _return_held(db, qty_by_pid)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return qty_by_pid
+
+
+def release(db: Session, qty_by_pid: dict[int, int], key: str | None = None) -> None:
+    """Return sold stock for every line or none; a repeated key raises Replayed."""
+    if key and _claim_key(db, key, "release"):
+        raise Replayed({})
+
+    restocked = False
+    try:
+        for pid in sorted(qty_by_pid):
+            stock = _increment(db, pid, qty_by_pid[pid])
+            if stock is None:
+                raise UnknownProduct(pid)
+            restocked = restocked or stock == qty_by_pid[pid]
+        if restocked:
+            catalog.bump_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,34 @@
+import catalog
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_etag_rolls_over_with_the_staleness_window(monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_STOCK_STALENESS", 5)
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(catalog, "time", clock)
+
+    tag = catalog.etag(3)
+    assert tag.startswith('W/"')
+    clock.now += 4.9
+    assert catalog.etag(3) == tag
+    assert catalog.etag(4) != tag
+
+    # Counts may have moved without a version bump
+    clock.now += 0.1
+    assert catalog.etag(3) != tag
+
+
+def test_etag_matches_weakly():
+    assert catalog.etag_matches('W/"catalog-3-200"', 'W/"catalog-3-200"')
+    assert catalog.etag_matches('"catalog-3-200"', 'W/"catalog-3-200"')
+    assert catalog.etag_matches('"x", W/"catalog-3-200"', 'W/"catalog-3-200"')
+    assert catalog.etag_matches("*", 'W/"catalog-3-200"')
+    assert not catalog.etag_matches('W/"catalog-3-199"', 'W/"catalog-3-200"')
+    assert not catalog.etag_matches(None, 'W/"catalog-3-200"')
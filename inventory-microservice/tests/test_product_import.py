@@ -0,0 +1,65 @@
+import pytest
+import catalog
+import reservations
+from models import Product
+from product_import import import_products
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as db:
+        catalog.ensure_version_row(db)
+        db.add(Product(id=1, name="widget", price=2.5, stock=10, reserved=0))
+        db.commit()
+        yield db
+
+
+async def upload(*lines: str):
+    for line in lines:
+        yield f"{line}\n".encode()
+
+
+async def import_csv(db, *rows: str) -> dict:
+    result = await import_products(db, upload("name,price,stock", *rows), "csv")
+    return result.as_dict()
+
+
+def stock(db) -> tuple[int, int]:
+    db.expire_all()
+    p = db.get(Product, 1)
+    return p.stock, p.reserved
+
+
+@pytest.mark.anyio
+async def test_imported_stock_leaves_out_held_units(db):
+    reservations.reserve(db, {1: 3}, hold_id="h1")
+
+    result = await import_csv(db, "widget,2.5,20")
+    assert result["upserted"] == 1
+    assert stock(db) == (17, 3)
+
+    # The same count on hand again changes nothing
+    result = await import_csv(db, "widget,2.5,20")
+    assert result["unchanged"] == 1
+    assert stock(db) == (17, 3)
+
+    # Cancelling the hold gives the units back on top of the import
+    reservations.cancel(db, "h1")
+    assert stock(db) == (20, 0)
+
+
+@pytest.mark.anyio
+async def test_imported_stock_below_held_units_leaves_none_available(db):
+    reservations.reserve(db, {1: 3}, hold_id="h1")
+
+    await import_csv(db, "widget,2.5,2")
+    assert stock(db) == (0, 3)
+
+
+@pytest.mark.anyio
+async def test_new_product_gets_the_imported_stock(db):
+    result = await import_csv(db, "gadget,4,5")
+
+    assert result["upserted"] == 1
+    db.expire_all()
+    assert db.query(Product).filter(Product.name == "gadget").one().stock == 5
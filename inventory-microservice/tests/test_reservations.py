@@ -0,0 +1,77 @@
+import pytest
+import catalog
+import reservations
+from models import Product
+from reservations import HoldExpired, Replayed, UnknownHold
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as db:
+        catalog.ensure_version_row(db)
+        db.add(Product(id=1, name="widget", price=2.5, stock=10, reserved=0))
+        db.commit()
+        yield db
+
+
+def stock(db) -> tuple[int, int]:
+    db.expire_all()
+    p = db.get(Product, 1)
+    return p.stock, p.reserved
+
+
+def test_reserve_moves_units_into_reserved(db):
+    result = reservations.reserve(db, {1: 3}, hold_id="h1")
+
+    assert result["prices"] == {1: 2.5}
+    assert stock(db) == (7, 3)
+
+
+def test_confirm_after_expiry_finds_the_hold_gone(db):
+    reservations.reserve(db, {1: 3}, hold_id="h1", ttl=0)
+
+    assert reservations.expire(db, limit=10) == {1: 3}
+    assert stock(db) == (10, 0)
+
+    with pytest.raises(HoldExpired):
+        reservations.confirm(db, "h1")
+    assert stock(db) == (10, 0)
+
+
+def test_expiry_after_confirm_returns_nothing(db):
+    reservations.reserve(db, {1: 3}, hold_id="h1", ttl=0)
+
+    assert reservations.confirm(db, "h1") == {1: 3}
+    assert stock(db) == (7, 0)
+
+    assert reservations.expire(db, limit=10) == {}
+    assert stock(db) == (7, 0)
+
+
+def test_confirm_is_applied_once(db):
+    reservations.reserve(db, {1: 3}, hold_id="h1")
+    reservations.confirm(db, "h1")
+
+    with pytest.raises(Replayed):
+        reservations.confirm(db, "h1")
+    assert stock(db) == (7, 0)
+
+
+def test_cancel_after_confirm_gives_nothing_back(db):
+    reservations.reserve(db, {1: 3}, hold_id="h1")
+    reservations.confirm(db, "h1")
+
+    assert reservations.cancel(db, "h1") == {}
+    assert stock(db) == (7, 0)
+
+
+def test_expire_leaves_unexpired_holds(db):
+    reservations.reserve(db, {1: 3}, hold_id="h1")
+
+    assert reservations.expire(db, limit=10) == {}
+    assert stock(db) == (7, 3)
+
+
+def test_confirm_of_a_hold_never_made(db):
+    with pytest.raises(UnknownHold):
+        reservations.confirm(db, "nope")
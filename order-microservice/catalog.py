@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+import httpx
+from fastapi import Request
+from service_core.deadline import DeadlineExceeded
+from service_core.resilience import ResilientClient, CircuitOpen
+from service_core.replicas import PRIMARY_HEADER
+from metrics import (
+    catalog_cache_requests,
+    catalog_cache_refreshes,
+    catalog_cache_refresh_latency,
+    catalog_cache_size,
+)
+
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "10"))
+# How long stale data is served before the next refresh attempt
+CATALOG_ERROR_BACKOFF = float(os.getenv("CATALOG_ERROR_BACKOFF", "2"))
+
+
+class CatalogUnavailable(Exception):
+    pass
+
+
+class UnknownProduct(Exception):
+    def __init__(self, product_id: int):
+        super().__init__(f"Product {product_id} not found")
+        self.product_id = product_id
+
+
+def quote(product_map: dict[int, dict], items) -> float:
+    """Catalog price of a checkout's lines; the hot loop of every checkout."""
+    total = 0
+    for i in items:
+        product = product_map.get(i.product_id)
+        if product is None:
+            raise UnknownProduct(i.product_id)
+        total += product["price"] * i.qty
+    return total
+
+
+class CatalogCache:
+    """In-process copy of the inventory catalog, keyed by product id.
+
+    Entries live for CATALOG_TTL seconds; after that the next caller
+    revalidates with If-None-Match, so an unchanged catalog costs a 304
+    instead of a full download. Concurrent misses share one upstream fetch,
+    and if inventory is down the last good copy keeps being served.
+    """
+
+    def __init__(self, client: ResilientClient, ttl: float = CATALOG_TTL):
+        self._client = client
+        self._ttl = ttl
+        self._products: dict[int, dict] | None = None
+        self._etag: str | None = None
+        self._expires_at = 0.0
+        self._from_primary = False
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._products is not None and time.monotonic() < self._expires_at
+
+    async def get(self) -> dict[int, dict]:
+        if self._fresh():
+            catalog_cache_requests.labels("hit").inc()
+            return self._products
+
+        async with self._lock:
+            # Another request refreshed while we were waiting
+            if self._fresh():
+                catalog_cache_requests.labels("hit").inc()
+                return self._products
+
+            catalog_cache_requests.labels("miss").inc()
+            try:
+                await self._refresh()
+            except (httpx.HTTPError, ValueError, CircuitOpen, DeadlineExceeded):
+                catalog_cache_refreshes.labels("error").inc()
+                if self._products is None:
+                    raise CatalogUnavailable()
+                catalog_cache_requests.labels("stale").inc()
+                self._expires_at = time.monotonic() + CATALOG_ERROR_BACKOFF
+
+            return self._products
+
+    async def _refresh(self):
+        headers = {"If-None-Match": self._etag} if self._etag and self._products is not None else {}
+        if self._from_primary:
+            headers[PRIMARY_HEADER] = "true"
+
+        start = time.perf_counter()
+        # Read-only, so safe to hedge against a slow inventory instance
+        r = await self._client.get("/api/inventory/products", headers=headers, hedge=True)
+        catalog_cache_refresh_latency.observe(time.perf_counter() - start)
+
+        if r.status_code == 304:
+            catalog_cache_refreshes.labels("not_modified").inc()
+        else:
+            r.raise_for_status()
+            self._products = {
+                int(p["id"]): p for p in r.json() if isinstance(p, dict)
+            }
+            self._etag = r.headers.get("etag")
+            catalog_cache_refreshes.labels("updated").inc()
+            catalog_cache_size.set(len(self._products))
+
+        self._expires_at = time.monotonic() + self._ttl
+        self._from_primary = False
+
+    def invalidate(self, from_primary: bool = False):
+        """Refetch on the next get; from_primary skips inventory's read
+        replicas, for a product a lagging replica may not have yet."""
+        self._expires_at = 0.0
+        self._from_primary = self._from_primary or from_primary
+
+
+def get_catalog(request: Request) -> CatalogCache:
+    return request.app.state.catalog
@@ -0,0 +1,47 @@
+import os
+import httpx
+from fastapi import Request
+from service_core.resilience import ResilientClient
+
+INVENTORY_URL = os.getenv("INVENTORY_URL")
+PAYMENT_URL = os.getenv("PAYMENT_URL")
+
+# --------------------------------------------------
+# Pool settings (per upstream host)
+# --------------------------------------------------
+
+# Upper bound per call; the request deadline can make it shorter
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+
+def _pooled_client(name: str, base_url: str | None) -> ResilientClient:
+    # One client (and breaker) per upstream, so the connection limits and
+    # failure counts apply per host.
+    return ResilientClient(name, httpx.AsyncClient(
+        base_url=base_url or "",
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    ), timeout=HTTP_TIMEOUT)
+
+
+class ServiceClients:
+    """Keep-alive HTTP clients for the services order-service talks to."""
+
+    def __init__(self):
+        self.inventory = _pooled_client("inventory", INVENTORY_URL)
+        self.payment = _pooled_client("payment", PAYMENT_URL)
+
+    async def aclose(self):
+        await self.inventory.aclose()
+        await self.payment.aclose()
+
+
+def get_clients(request: Request) -> ServiceClients:
+    return request.app.state.clients
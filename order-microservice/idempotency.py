@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from models import Order
+
+# --------------------------------------------------
+# Idempotent checkout
+#
+# The Idempotency-Key is stored on the order under a unique
+# (user_id, idempotency_key) constraint, so the first request to insert
+# it owns the saga. Duplicates get the stored result; duplicates that
+# arrive while the saga is still running wait for it to finish.
+# --------------------------------------------------
+
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+POLL_INTERVAL_MIN = 0.05
+POLL_INTERVAL_MAX = 0.5
+
+# Sagas running in this process, so local duplicates wake up immediately
+# instead of polling. Duplicates on other workers fall back to polling.
+_in_flight: dict[tuple[str, str], asyncio.Event] = {}
+
+
+def request_hash(user_id: str, items: list) -> str:
+    payload = json.dumps(
+        {"user_id": user_id, "items": sorted((i.product_id, i.qty) for i in items)},
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def find_order(db: Session, user_id: str, key: str) -> Order | None:
+    return (
+        db.query(Order)
+        .filter(Order.user_id == user_id, Order.idempotency_key == key)
+        .first()
+    )
+
+
+@contextmanager
+def in_flight(user_id: str, key: str | None):
+    if not key:
+        yield
+        return
+    event = _in_flight[(user_id, key)] = asyncio.Event()
+    try:
+        yield
+    finally:
+        event.set()
+        _in_flight.pop((user_id, key), None)
+
+
+async def _wait_until_settled(db: Session, order: Order):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + IDEMPOTENCY_WAIT_TIMEOUT
+    interval = POLL_INTERVAL_MIN
+
+    while order.status == "PENDING":
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise HTTPException(
+                409,
+                "Checkout with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"},
+            )
+
+        event = _in_flight.get((order.user_id, order.idempotency_key))
+        if event:
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, POLL_INTERVAL_MAX)
+
+        await run_in_threadpool(db.refresh, order)
+
+
+async def replay(db: Session, order: Order, fingerprint: str) -> dict:
+    """Return the stored outcome of an earlier checkout with the same key."""
+    if order.request_hash != fingerprint:
+        raise HTTPException(422, "Idempotency-Key was already used with a different request")
+
+    await _wait_until_settled(db, order)
+
+    if order.status == "FAILED":
+        raise HTTPException(400, "Checkout failed")
+
+    return {
+        "order_id": order.id,
+        "status": order.status,
+        "total": order.total
+    }
@@ -1,40 +1,73 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Header
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from db import Base, engine, get_db
-from models import Order, OrderItem
-from pydantic import BaseModel
-import requests, os, time
-from datetime import datetime
-from fastapi.responses import Response
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, REGISTRY
-from metrics import (
-    http_requests_total,
-    http_request_latency,
-    orders_created,
-    orders_paid,
-    orders_failed,
-    revenue_total,
-    refund_total,
+from db import engine, get_db, get_read_db, SessionLocal
+from models import Order
+from clients import ServiceClients
+from deps import get_current_user
+from catalog import CatalogCache, CatalogUnavailable, UnknownProduct, get_catalog, quote
+from pagination import OrderListing, OrderListParams, list_orders
+import summary
+import idempotency
+import outbox
+from outbox import OutboxWorker, get_outbox
+from sagas import Sagas, CHECKOUT, PAYMENT_REFUND, INVENTORY_RELEASE
+from pydantic import BaseModel, Field
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from fastapi.responses import Response, JSONResponse
+from service_core.http_metrics import PrometheusMiddleware
+from service_core.deadline import DeadlineMiddleware
+from service_core.exposition import metrics_response, register_collector
+from service_core.health import Readiness, get_readiness, http_check
+from service_core.responses import default_response_class
+from service_core.export import ExportParams, export_response
+from service_core.replicas import read_your_writes
+from metrics import refund_total
+
+register_collector(summary.SalesSummaryCollector(SessionLocal))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.clients = ServiceClients()
+    app.state.catalog = CatalogCache(app.state.clients.inventory)
+    # Liveness of the services checkout cannot work without
+    app.state.readiness = Readiness(engine, {
+        "inventory": http_check(app.state.clients.inventory.client, "/api/inventory/live"),
+        "payment": http_check(app.state.clients.payment.client, "/api/payments/live"),
+    })
+    app.state.readiness.start()
+    sagas = Sagas(SessionLocal, app.state.clients)
+    app.state.outbox = OutboxWorker(SessionLocal, sagas.handlers(), sagas.dead_handlers())
+    if outbox.OUTBOX_WORKER_ENABLED:
+        app.state.outbox.start()
+    try:
+        yield
+    finally:
+        await app.state.outbox.stop()
+        await app.state.readiness.stop()
+        await app.state.clients.aclose()
+
+app = FastAPI(
+    title="Order Service",
+    lifespan=lifespan,
+    default_response_class=default_response_class()
 )
 
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Order Service")
-
-INVENTORY_URL = os.getenv("INVENTORY_URL")
-PAYMENT_URL = os.getenv("PAYMENT_URL")
-
 # --------------------------------------------------
 # Schemas
 # --------------------------------------------------
 
 class CheckoutItem(BaseModel):
     product_id: int
-    qty: int
+    qty: int = Field(gt=0)
 
 class CheckoutRequest(BaseModel):
     user_id: str
-    items: list[CheckoutItem]
+    items: list[CheckoutItem] = Field(min_length=1)
 
 class RefundItem(BaseModel):
     product_id: int
@@ -43,38 +76,13 @@ class RefundItem(BaseModel):
 class RefundRequest(BaseModel):
     items: list[RefundItem] | None = None
     
-def get_current_user(request: Request):
-    user_id = request.headers.get("x-user-id")
-    role = request.headers.get("x-user-role")
-
-    if not user_id or not role:
-        raise HTTPException(401, "Unauthorized")
-
-    return {
-        "user_id": user_id,
-        "role": role
-    }
-
 # --------------------------------------------------
 # Middleware (Prometheus)
 # --------------------------------------------------
 
-@app.middleware("http")
-async def prometheus_middleware(request: Request, call_next):
-    start = time.time()
-    response = await call_next(request)
-    duration = time.time() - start
-
-    path = "/api/orders/*" if request.url.path.startswith("/api/orders/") else request.url.path
-
-    http_requests_total.labels(
-        request.method,
-        path,
-        str(response.status_code)
-    ).inc()
-
-    http_request_latency.labels(path).observe(duration)
-    return response
+# Added first so it runs inside the metrics middleware and its 504s are counted
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(PrometheusMiddleware)
 
 # --------------------------------------------------
 # Health & Metrics
@@ -84,133 +92,169 @@ async def prometheus_middleware(request: Request, call_next):
 def health():
     return {"status": "order ok"}
 
+@app.get("/api/orders/live")
+def live():
+    return {"status": "alive"}
+
+@app.get("/api/orders/ready")
+async def ready(readiness: Readiness = Depends(get_readiness)):
+    return await readiness.response()
+
 @app.get("/api/orders/metrics")
 def metrics():
-    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+    return metrics_response()
 
 # --------------------------------------------------
 # Checkout (Saga)
+#
+# The PENDING order and its checkout event are committed together; the
+# reserve -> pay -> finalize saga then runs as that event (see sagas.py).
+# By default the request delivers the event itself and answers with the
+# outcome. With "Prefer: respond-async" it answers 202 straight away and
+# the outbox worker runs the saga; poll /api/orders/status/{order_id}.
 # --------------------------------------------------
 
+def order_result(order: Order) -> dict:
+    return {
+        "order_id": order.id,
+        "status": order.status,
+        "total": order.total
+    }
+
+def accepted(order: Order) -> JSONResponse:
+    return JSONResponse(
+        order_result(order),
+        status_code=202,
+        headers={"Location": f"/api/orders/status/{order.id}"}
+    )
+
+def wants_async(prefer: str | None) -> bool:
+    return bool(prefer) and "respond-async" in prefer.lower()
+
 @app.post("/api/orders/checkout")
-def checkout(data: CheckoutRequest, db: Session = Depends(get_db)):
+async def checkout(
+    data: CheckoutRequest,
+    response: Response,
+    idempotency_key: str | None = Header(None, max_length=255),
+    prefer: str | None = Header(None),
+    db: Session = Depends(get_db),
+    catalog: CatalogCache = Depends(get_catalog),
+    worker: OutboxWorker = Depends(get_outbox)
+):
+    fingerprint = idempotency.request_hash(data.user_id, data.items)
+    respond_async = wants_async(prefer)
+
+    async def replay(existing: Order):
+        response.headers["Idempotent-Replayed"] = "true"
+        if respond_async and existing.status == "PENDING" and existing.request_hash == fingerprint:
+            return accepted(existing)
+        return await idempotency.replay(db, existing, fingerprint)
+
+    if idempotency_key:
+        existing = await run_in_threadpool(
+            idempotency.find_order, db, data.user_id, idempotency_key
+        )
+        if existing:
+            return await replay(existing)
 
     try:
-        products = requests.get(
-            f"{INVENTORY_URL}/api/inventory/products",
-            timeout=5
-        ).json()
-    except:
+        product_map = await catalog.get()
+        # A product added since the last refresh: revalidate once
+        if any(i.product_id not in product_map for i in data.items):
+            catalog.invalidate(from_primary=True)
+            product_map = await catalog.get()
+    except CatalogUnavailable:
         raise HTTPException(502, "Inventory service unavailable")
 
-    product_map = {int(p["id"]): p for p in products if isinstance(p, dict)}
-
-    total = 0
-    for i in data.items:
-        if i.product_id not in product_map:
-            raise HTTPException(404, f"Product {i.product_id} not found")
-        total += product_map[i.product_id]["price"] * i.qty
+    try:
+        total = quote(product_map, data.items)
+    except UnknownProduct as e:
+        raise HTTPException(404, f"Product {e.product_id} not found")
 
     order = Order(
         user_id=data.user_id,
         total=total,
         status="PENDING",
-        created_at=datetime.utcnow()
+        created_at=datetime.utcnow(),
+        idempotency_key=idempotency_key,
+        request_hash=fingerprint if idempotency_key else None
     )
-    db.add(order)
-    db.commit()
-    db.refresh(order)
-
-    reserved_items: list[CheckoutItem] = []
-
-    try:
-        # 1️⃣ Reserve inventory
-        for i in data.items:
-            r = requests.post(
-                f"{INVENTORY_URL}/api/inventory/reserve/{i.product_id}",
-                params={"qty": i.qty},
-                timeout=5
-            ).json()
-
-            if r.get("status") != "reserved":
-                raise Exception("Inventory reservation failed")
-
-            reserved_items.append(i)
-
-        # 2️⃣ Payment
-        pay = requests.post(
-            f"{PAYMENT_URL}/api/payments/pay",
-            json={
-                "user_id": data.user_id,
-                "order_id": order.id,
-                "amount": total
-            },
-            timeout=5
-        ).json()
 
-        orders_created.inc()
-
-        if pay.get("status") != "success":
-            raise Exception("Payment failed")
-
-        # 3️⃣ Finalize order
-        order.status = "PAID"
-        orders_paid.inc()
-        revenue_total.inc(total)
-
-        for i in data.items:
-            p = product_map[i.product_id]
-            db.add(OrderItem(
+    def create_order():
+        db.add(order)
+        try:
+            db.flush()
+            event = outbox.enqueue(
+                db,
+                CHECKOUT,
+                {
+                    "order_id": order.id,
+                    "user_id": data.user_id,
+                    "items": [i.model_dump() for i in data.items]
+                },
                 order_id=order.id,
-                product_id=i.product_id,
-                qty=i.qty,
-                price=p["price"],
-                line_total=p["price"] * i.qty
-            ))
-
-        db.commit()
-
-        return {
-            "order_id": order.id,
-            "status": "PAID",
-            "total": total
-        }
-
-    except Exception:
-        orders_failed.inc()
-
-        # Rollback inventory
-        for i in reserved_items:
-            requests.post(
-                f"{INVENTORY_URL}/api/inventory/release/{i.product_id}",
-                params={"qty": i.qty},
-                timeout=5
+                inline=not respond_async
             )
-
-        order.status = "FAILED"
-        db.commit()
+            db.commit()
+        except IntegrityError:
+            # Lost the race to a concurrent request with the same key
+            db.rollback()
+            return None, idempotency.find_order(db, data.user_id, idempotency_key)
+        db.refresh(order)
+        return event.id, None
+
+    event_id, existing = await run_in_threadpool(create_order)
+    if existing:
+        return await replay(existing)
+
+    # Replicas may not have the new order yet; this client reads it from
+    # the primary for a few seconds
+    if respond_async:
+        return read_your_writes(accepted(order))
+
+    with idempotency.in_flight(data.user_id, idempotency_key):
+        await worker.deliver(event_id)
+        await run_in_threadpool(db.refresh, order)
+
+    if order.status == "FAILED":
         raise HTTPException(400, "Checkout failed")
+    if order.status == "PENDING":
+        # Transient failure; the outbox keeps retrying
+        return read_your_writes(accepted(order))
+    read_your_writes(response)
+    return order_result(order)
+
+@app.get("/api/orders/status/{order_id}")
+def get_order_status(order_id: int, db: Session = Depends(get_db)):
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if not order:
+        raise HTTPException(404, "Order not found")
+    return order_result(order)
 
 # --------------------------------------------------
 # Refund (Full + Partial)
 # --------------------------------------------------
 
 @app.post("/api/orders/refund/{order_id}")
-def refund(
+async def refund(
     order_id: int,
+    response: Response,
     data: RefundRequest | None = None,
-    request: Request = None,
-    db: Session = Depends(get_db)
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    worker: OutboxWorker = Depends(get_outbox)
 ):
     # -----------------------
     # AUTHORIZATION
     # -----------------------
-    user = get_current_user(request)
-
     if user["role"] == "OWNER":
         raise HTTPException(403, "Owners cannot initiate refunds")
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Locked until the refund commits: a concurrent refund of the same order
+    # waits here and then sees it is no longer PAID
+    order = await run_in_threadpool(
+        lambda: db.query(Order).filter(Order.id == order_id).with_for_update().first()
+    )
 
     if not order:
         raise HTTPException(404, "Order not found")
@@ -223,12 +267,15 @@ def refund(
 
     refund_items: list[tuple[int, int]] = []
     refund_amount = 0.0
+    gross = order.total
 
     # -----------------------
     # FULL REFUND
     # -----------------------
+    items = await run_in_threadpool(lambda: list(order.items))
+
     if not data or not data.items:
-        for item in order.items:
+        for item in items:
             refund_items.append((item.product_id, item.qty))
             refund_amount += item.line_total
             db.delete(item)
@@ -240,7 +287,7 @@ def refund(
     # PARTIAL REFUND
     # -----------------------
     else:
-        item_map = {i.product_id: i for i in order.items}
+        item_map = {i.product_id: i for i in items}
 
         for r in data.items:
             if r.product_id not in item_map:
@@ -265,27 +312,50 @@ def refund(
         order.status = "PARTIALLY_REFUNDED"
 
     # -----------------------
-    # PAYMENT REFUND
+    # PAYMENT REFUND + INVENTORY RESTORE
     # -----------------------
-    requests.post(
-        f"{PAYMENT_URL}/api/payments/refund",
-        json={
-            "user_id": order.user_id,
-            "order_id": order.id,
-            "amount": refund_amount
-        },
-        timeout=5
-    )
-
-    # -----------------------
-    # INVENTORY RESTORE
-    # -----------------------
-    for pid, qty in refund_items:
-        requests.post(
-            f"{INVENTORY_URL}/api/inventory/release/{pid}",
-            params={"qty": qty},
-            timeout=5
+    # Committed with the order change and delivered by the outbox. Only a
+    # PAID order can be refunded, so the order id makes the keys unique.
+    events = [
+        outbox.enqueue(
+            db,
+            PAYMENT_REFUND,
+            {
+                "user_id": order.user_id,
+                "order_id": order.id,
+                "amount": refund_amount,
+                "reference": f"order-{order.id}-refund"
+            },
+            order_id=order.id,
+            inline=True
         )
+    ]
+    if refund_items:
+        events.append(outbox.enqueue(
+            db,
+            INVENTORY_RELEASE,
+            {
+                "items": [{"product_id": pid, "qty": qty} for pid, qty in refund_items],
+                "key": f"order-{order.id}-refund"
+            },
+            order_id=order.id,
+            inline=True
+        ))
+
+    # Read before the commit expires them; reading after would lazy-load
+    # on the event loop
+    result = {
+        "order_id": order.id,
+        "refunded_amount": refund_amount,
+        "status": order.status
+    }
+
+    def commit_refund():
+        summary.record_refund(db, order, gross, refund_amount)
+        db.commit()
+        return [e.id for e in events]
+
+    event_ids = await run_in_threadpool(commit_refund)
 
     # -----------------------
     # METRICS (FIXED)
@@ -293,38 +363,96 @@ def refund(
     # Counters can ONLY increase
     refund_total.inc(refund_amount)
 
-    db.commit()
+    # Best effort now; whatever fails is retried by the worker
+    await asyncio.gather(*(worker.deliver(i) for i in event_ids))
+    read_your_writes(response)
 
-    return {
-        "order_id": order.id,
-        "refunded_amount": refund_amount,
-        "status": order.status
-    }
+    return result
 
 # --------------------------------------------------
 # Queries
 # --------------------------------------------------
 
-@app.get("/api/orders/all")
-def get_all_orders(db: Session = Depends(get_db)):
-    return db.query(Order).all()
+@app.get("/api/orders/summary")
+def get_summary(
+    created_from: date | None = None,
+    created_to: date | None = None,
+    db: Session = Depends(get_db),
+    user: dict = Depends(get_current_user)
+):
+    if user["role"] != "OWNER":
+        raise HTTPException(403, "Owner only")
+
+    by_status = summary.totals_by_status(db, created_from, created_to)
+    gross = sum(r["gross"] for r in by_status.values())
+    refunded = sum(r["refunded"] for r in by_status.values())
+
+    return {
+        "total_revenue": gross,
+        "refunded_amount": refunded,
+        "net_revenue": gross - refunded,
+        "paid_orders": by_status.get("PAID", {}).get("count", 0),
+        "by_status": by_status,
+        "days": summary.daily_rows(db, created_from, created_to)
+    }
 
-@app.get("/api/orders/{user_id}")
-def get_orders(user_id: str, db: Session = Depends(get_db)):
-    return db.query(Order).filter(Order.user_id == user_id).all()
+@app.get("/api/orders/all", response_model=OrderListing)
+def get_all_orders(
+    response: Response,
+    params: OrderListParams = Depends(),
+    db: Session = Depends(get_read_db)
+):
+    return list_orders(db.query(Order), params, response)
+
+@app.get("/api/orders/export")
+def export_orders(
+    params: ExportParams = Depends(),
+    user: dict = Depends(get_current_user)
+):
+    """Every matching order, oldest first, streamed as NDJSON or CSV."""
+    if user["role"] != "OWNER":
+        raise HTTPException(403, "Owner only")
+
+    stmt = select(Order.id, Order.user_id, Order.status, Order.total, Order.created_at)
+    # created_at is an ISO timestamp string, as in pagination.page_orders
+    if params.status:
+        stmt = stmt.where(Order.status == params.status)
+    if params.created_from:
+        stmt = stmt.where(Order.created_at >= params.created_from.isoformat())
+    if params.created_to:
+        stmt = stmt.where(Order.created_at < (params.created_to + timedelta(days=1)).isoformat())
+    stmt = stmt.order_by(Order.created_at, Order.id)
+
+    return export_response(SessionLocal, stmt, "orders", params.format)
+
+@app.get("/api/orders/{user_id}", response_model=OrderListing)
+def get_orders(
+    user_id: str,
+    response: Response,
+    params: OrderListParams = Depends(),
+    db: Session = Depends(get_read_db)
+):
+    return list_orders(db.query(Order).filter(Order.user_id == user_id), params, response)
 
 @app.get("/api/orders/by-id/{order_id}")
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    o = db.query(Order).filter(Order.id == order_id).first()
+async def get_order(
+    order_id: int,
+    db: Session = Depends(get_read_db),
+    catalog: CatalogCache = Depends(get_catalog)
+):
+    o = await run_in_threadpool(
+        lambda: db.query(Order).filter(Order.id == order_id).first()
+    )
     if not o:
         raise HTTPException(404)
 
-    products = requests.get(
-        f"{INVENTORY_URL}/api/inventory/products",
-        timeout=5
-    ).json()
+    items = await run_in_threadpool(lambda: list(o.items))
 
-    name_map = {int(p["id"]): p["name"] for p in products if isinstance(p, dict)}
+    try:
+        product_map = await catalog.get()
+    except CatalogUnavailable:
+        # Names are cosmetic here; fall back to "Product <id>"
+        product_map = {}
 
     return {
         "id": o.id,
@@ -335,11 +463,11 @@ def get_order(order_id: int, db: Session = Depends(get_db)):
         "items": [
             {
                 "product_id": i.product_id,
-                "product_name": name_map.get(i.product_id, f"Product {i.product_id}"),
+                "product_name": product_map.get(i.product_id, {}).get("name", f"Product {i.product_id}"),
                 "qty": i.qty,
                 "price": i.price,
                 "line_total": i.line_total
             }
-            for i in o.items
+            for i in items
         ]
     }
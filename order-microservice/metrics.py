@@ -1,23 +1,51 @@
 from prometheus_client import Counter, Gauge, Histogram
 
-http_requests_total = Counter(
-    "http_requests_total",
-    "Total HTTP requests",
-    ["method", "path", "status"]
-)
-
-http_request_latency = Histogram(
-    "http_request_latency_seconds",
-    "HTTP request latency",
-    ["path"]
-)
-
 orders_created = Counter("orders_created_total", "Orders created")
 orders_paid = Counter("orders_paid_total", "Orders paid")
 orders_failed = Counter("orders_failed_total", "Orders failed")
+# Time per checkout saga step: reserve / pay / confirm / finalize
+checkout_stage_latency = Histogram(
+    "checkout_stage_latency_seconds",
+    "Checkout saga step latency",
+    ["stage"]
+)
 
-# ✅ Revenue can go UP & DOWN
-revenue_total = Gauge("revenue_total", "Current total revenue")
+# revenue_total is exported by summary.SalesSummaryCollector from the
+# order_sales_summary table, so it is shared by all workers.
 
 # ✅ Refund is cumulative
 refund_total = Counter("refund_total", "Total refunded amount")
+
+# Product catalog cache
+catalog_cache_requests = Counter(
+    "catalog_cache_requests_total",
+    "Catalog cache lookups",
+    ["result"]  # hit / miss / stale
+)
+catalog_cache_refreshes = Counter(
+    "catalog_cache_refreshes_total",
+    "Catalog fetches from inventory",
+    ["outcome"]  # updated / not_modified / error
+)
+catalog_cache_refresh_latency = Histogram(
+    "catalog_cache_refresh_latency_seconds",
+    "Catalog fetch latency"
+)
+# Every worker caches the same catalog, so report the largest, not the sum
+catalog_cache_size = Gauge(
+    "catalog_cache_products",
+    "Products held in the catalog cache",
+    multiprocess_mode="livemax"
+)
+
+# Transactional outbox
+outbox_events = Counter(
+    "outbox_events_total",
+    "Outbox delivery attempts",
+    ["kind", "outcome"]  # done / retry / dead
+)
+outbox_delivery_lag = Histogram(
+    "outbox_delivery_lag_seconds",
+    "Time from enqueue to successful delivery",
+    ["kind"]
+)
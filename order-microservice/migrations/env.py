@@ -0,0 +1,10 @@
+from logging.config import fileConfig
+from alembic import context
+from db import Base
+import models  # noqa: F401  registers the tables on Base.metadata
+from service_core.migrations import run_migrations
+
+if context.config.config_file_name:
+    fileConfig(context.config.config_file_name)
+
+run_migrations(Base.metadata, version_table="alembic_version_orders")
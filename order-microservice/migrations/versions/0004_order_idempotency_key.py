@@ -0,0 +1,30 @@
+"""idempotency key on orders
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.add_column(sa.Column("idempotency_key", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("request_hash", sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint(
+            "uq_orders_user_idempotency_key", ["user_id", "idempotency_key"]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_constraint("uq_orders_user_idempotency_key", type_="unique")
+        batch_op.drop_column("request_hash")
+        batch_op.drop_column("idempotency_key")
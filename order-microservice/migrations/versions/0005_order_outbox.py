@@ -0,0 +1,38 @@
+"""transactional outbox
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "order_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("order_id", sa.Integer(), nullable=True),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_order_outbox_order_id", "order_outbox", ["order_id"])
+    op.create_index("ix_order_outbox_status_next_attempt_at", "order_outbox", ["status", "next_attempt_at"])
+
+
+def downgrade():
+    op.drop_index("ix_order_outbox_status_next_attempt_at", table_name="order_outbox")
+    op.drop_index("ix_order_outbox_order_id", table_name="order_outbox")
+    op.drop_table("order_outbox")
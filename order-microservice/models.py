@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from db import Base
 
@@ -9,14 +9,54 @@ class Order(Base):
     total = Column(Float)
     status = Column(String)
     created_at = Column(String)
+    # Client-supplied Idempotency-Key and a hash of the request it came with
+    idempotency_key = Column(String)
+    request_hash = Column(String(64))
     items = relationship("OrderItem", back_populates="order")
 
+    # Keyset listing is ordered by (created_at, id); each filter gets a
+    # composite index whose tail matches that order.
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        UniqueConstraint("user_id", "idempotency_key", name="uq_orders_user_idempotency_key"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer)
     qty = Column(Integer)
     price = Column(Float)
     line_total = Column(Float)
     order = relationship("Order", back_populates="items")
+
+class SalesSummary(Base):
+    # Read model for the owner dashboard, see summary.py
+    __tablename__ = "order_sales_summary"
+    day = Column(String(10), primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    gross = Column(Float, nullable=False, default=0)
+    refunded = Column(Float, nullable=False, default=0)
+
+class OutboxEvent(Base):
+    # Side effects on other services, committed with the order change that
+    # causes them and delivered by outbox.OutboxWorker
+    __tablename__ = "order_outbox"
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, index=True)
+    kind = Column(String(32), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String(10), nullable=False, default="PENDING")  # PENDING / DONE / DEAD
+    attempts = Column(Integer, nullable=False, default=0)
+    # Earliest time a worker may pick the event up; doubles as the lease
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_order_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+from models import OutboxEvent
+from metrics import outbox_events, outbox_delivery_lag
+
+# --------------------------------------------------
+# Transactional outbox
+#
+# Calls to other services are not made inside the order transaction.
+# Instead an event describing the call is inserted in the same transaction
+# as the order change, and OutboxWorker delivers it afterwards, retrying
+# with backoff until the handler succeeds. Handlers must be idempotent:
+# an event can be delivered more than once (a worker dies after the call
+# but before marking it DONE), so every call carries a stable key.
+#
+# Claiming uses SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+# workers across pods share the table without handing out the same row.
+# A claim is a lease: next_attempt_at is pushed OUTBOX_LEASE ahead, and
+# if the worker dies the event becomes due again when it runs out.
+# --------------------------------------------------
+
+logger = logging.getLogger("outbox")
+
+OUTBOX_WORKER_ENABLED = os.getenv("OUTBOX_WORKER_ENABLED", "true").lower() == "true"
+# Events the background loop delivers concurrently per process; inline
+# deliveries from requests are not counted against it
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "30"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "0.5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "60"))
+
+Handler = Callable[[dict], Awaitable[None]]
+# Called in the transaction that marks an event DEAD
+DeadHandler = Callable[[Session, dict], None]
+
+
+def enqueue(db: Session, kind: str, payload: dict, order_id: int | None = None, inline: bool = False) -> OutboxEvent:
+    """Add an event to the caller's transaction; the caller commits.
+
+    With inline=True the event starts out leased, so the request that
+    wrote it can deliver it itself (OutboxWorker.deliver) without the
+    background worker racing it. If the request dies first, the worker
+    picks it up when the lease runs out.
+    """
+    now = datetime.utcnow()
+    event = OutboxEvent(
+        order_id=order_id,
+        kind=kind,
+        payload=json.dumps(payload),
+        status="PENDING",
+        attempts=0,
+        next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE) if inline else now,
+        created_at=now,
+    )
+    db.add(event)
+    return event
+
+
+def backoff(attempts: int) -> float:
+    # Full jitter, so events that failed together do not retry together
+    return random.uniform(0, min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** attempts))
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        handlers: dict[str, Handler],
+        dead_handlers: dict[str, DeadHandler] | None = None,
+    ):
+        self._session_factory = session_factory
+        self._handlers = handlers
+        self._dead_handlers = dead_handlers or {}
+        self._slots = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+        self._task: asyncio.Task | None = None
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                ids = await run_in_threadpool(self._claim)
+            except Exception:
+                logger.exception("Outbox claim failed")
+                ids = []
+
+            if ids:
+                await asyncio.gather(*(self._drain(i) for i in ids))
+            # A full batch means more may be due; go straight back
+            if len(ids) < OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    # ---------- Storage ----------
+
+    def _claim(self) -> list[int]:
+        with self._session_factory() as db:
+            now = datetime.utcnow()
+            events = (
+                db.query(OutboxEvent)
+                .filter(OutboxEvent.status == "PENDING", OutboxEvent.next_attempt_at <= now)
+                .order_by(OutboxEvent.next_attempt_at)
+                .limit(OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            for e in events:
+                e.next_attempt_at = now + timedelta(seconds=OUTBOX_LEASE)
+            db.commit()
+            return [e.id for e in events]
+
+    def _load(self, event_id: int) -> OutboxEvent | None:
+        with self._session_factory() as db:
+            event = db.get(OutboxEvent, event_id)
+            if event is None or event.status != "PENDING":
+                return None
+            db.expunge(event)
+            return event
+
+    def _finish(self, event_id: int, error: str | None):
+        with self._session_factory() as db:
+            event = db.get(OutboxEvent, event_id)
+            if error is None:
+                event.status = "DONE"
+                event.last_error = None
+                outbox_events.labels(event.kind, "done").inc()
+                outbox_delivery_lag.labels(event.kind).observe(
+                    (datetime.utcnow() - event.created_at).total_seconds()
+                )
+            else:
+                event.attempts += 1
+                event.last_error = error[:1000]
+                if event.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    # Left for an operator; a dead handler settles what was
+                    # waiting on it (a checkout fails its order)
+                    event.status = "DEAD"
+                    if event.kind in self._dead_handlers:
+                        self._dead_handlers[event.kind](db, json.loads(event.payload))
+                    outbox_events.labels(event.kind, "dead").inc()
+                    logger.error("Outbox event %s (%s) is dead: %s", event.id, event.kind, error)
+                else:
+                    event.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff(event.attempts))
+                    outbox_events.labels(event.kind, "retry").inc()
+            db.commit()
+
+    # ---------- Delivery ----------
+
+    async def _drain(self, event_id: int) -> bool:
+        async with self._slots:
+            return await self.deliver(event_id)
+
+    async def deliver(self, event_id: int) -> bool:
+        """Run one event's handler now; returns True once it is DONE.
+
+        Requests call this for the events they wrote, so it is bounded
+        only by how many requests the process serves, not by the
+        background loop's OUTBOX_CONCURRENCY.
+        """
+        event = await run_in_threadpool(self._load, event_id)
+        if event is None:
+            return False
+
+        try:
+            await self._handlers[event.kind](json.loads(event.payload))
+        except Exception as e:
+            await run_in_threadpool(self._finish, event_id, f"{type(e).__name__}: {e}")
+            return False
+
+        await run_in_threadpool(self._finish, event_id, None)
+        return True
+
+
+def get_outbox(request: Request) -> OutboxWorker:
+    return request.app.state.outbox
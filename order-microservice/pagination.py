@@ -0,0 +1,111 @@
+import base64
+from datetime import date, timedelta
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query as OrmQuery, selectinload
+from models import Order
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# --------------------------------------------------
+# Shared query parameters for order listings
+# --------------------------------------------------
+
+class OrderListParams:
+    def __init__(
+        self,
+        cursor: str | None = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        status: str | None = None,
+        created_from: date | None = None,
+        created_to: date | None = None,
+        include: str | None = Query(None, pattern="^items$"),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.status = status
+        self.created_from = created_from
+        self.created_to = created_to
+        self.include_items = include == "items"
+
+# --------------------------------------------------
+# Keyset cursors over (created_at, id), newest first
+# --------------------------------------------------
+
+def encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at}|{order.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, order_id = raw.rsplit("|", 1)
+        return created_at, int(order_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+def page_orders(q: OrmQuery, params: OrderListParams) -> tuple[list[Order], str | None]:
+    # created_at is stored as an ISO timestamp string, so date bounds
+    # compare correctly as strings.
+    if params.status:
+        q = q.filter(Order.status == params.status)
+    if params.created_from:
+        q = q.filter(Order.created_at >= params.created_from.isoformat())
+    if params.created_to:
+        q = q.filter(Order.created_at < (params.created_to + timedelta(days=1)).isoformat())
+
+    if params.cursor:
+        created_at, order_id = decode_cursor(params.cursor)
+        q = q.filter(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id),
+        ))
+
+    if params.include_items:
+        # One extra IN query for all items on the page
+        q = q.options(selectinload(Order.items))
+
+    orders = (
+        q.order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(params.limit)
+        .all()
+    )
+    next_cursor = encode_cursor(orders[-1]) if len(orders) == params.limit else None
+    return orders, next_cursor
+
+# --------------------------------------------------
+# Response models, read straight from the ORM rows
+# --------------------------------------------------
+
+class OrderItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    product_id: int
+    qty: int
+    price: float
+    line_total: float
+
+class OrderOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: str
+    status: str
+    total: float
+    created_at: str
+
+class OrderWithItemsOut(OrderOut):
+    items: list[OrderItemOut]
+
+# Listings carry items only with ?include=items; OrderOut never touches
+# Order.items, so a plain listing does not lazy-load them per row.
+OrderListing = list[OrderWithItemsOut | OrderOut]
+
+def list_orders(q: OrmQuery, params: OrderListParams, response: Response) -> list[OrderOut]:
+    orders, next_cursor = page_orders(q, params)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    model = OrderWithItemsOut if params.include_items else OrderOut
+    return [model.model_validate(o) for o in orders]
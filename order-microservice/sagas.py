@@ -0,0 +1,212 @@
+import httpx
+from service_core.deadline import DeadlineExceeded
+from service_core.resilience import CircuitOpen
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+from models import Order, OrderItem
+import outbox
+from clients import ServiceClients
+import summary
+from metrics import orders_created, orders_paid, orders_failed, checkout_stage_latency
+
+# --------------------------------------------------
+# Outbox handlers
+#
+# Each handler may run more than once for the same event, so every remote
+# call carries a key derived from the order: inventory replays a keyed
+# reserve/release and payment replays a pay/refund with a known reference.
+# A network error, a 5xx or a 409 (in progress) raises, and the outbox
+# retries; any other 4xx will not get better on retry and fails the order.
+# A checkout event that runs out of attempts fails its order too, and
+# voids the charge in case it went through.
+#
+# Inventory holds reserved stock for HOLD_TTL and hands it back by itself
+# unless the hold is confirmed, so a checkout that is abandoned halfway
+# needs no release call to undo its reservation.
+# --------------------------------------------------
+
+CHECKOUT = "checkout"
+PAYMENT_REFUND = "payment_refund"
+INVENTORY_RELEASE = "inventory_release"
+PAYMENT_VOID = "payment_void"
+
+
+def rejected(r: httpx.Response) -> bool:
+    """A 4xx that retrying will not change (409 means try again later)."""
+    return 400 <= r.status_code < 500 and r.status_code != 409
+
+
+class Sagas:
+    def __init__(self, session_factory: sessionmaker, clients: ServiceClients):
+        self._session_factory = session_factory
+        self._clients = clients
+
+    def handlers(self) -> dict:
+        return {
+            CHECKOUT: self.checkout,
+            PAYMENT_REFUND: self.payment_refund,
+            INVENTORY_RELEASE: self.inventory_release,
+            PAYMENT_VOID: self.payment_void,
+        }
+
+    def dead_handlers(self) -> dict:
+        return {CHECKOUT: self.checkout_dead}
+
+    # ---------- Checkout ----------
+
+    async def checkout(self, payload: dict):
+        order_id = payload["order_id"]
+        items = payload["items"]
+
+        status = await run_in_threadpool(self._order_status, order_id)
+        if status != "PENDING":
+            return
+
+        # 1️⃣ Hold inventory (all lines, one transaction)
+        with checkout_stage_latency.labels("reserve").time():
+            r = await self._clients.inventory.post(
+                "/api/inventory/reserve",
+                json=items,
+                headers={"Idempotency-Key": f"order-{order_id}-reserve"}
+            )
+        if rejected(r):
+            await run_in_threadpool(self._fail, order_id)
+            return
+        r.raise_for_status()
+        reserved = r.json()
+
+        if reserved.get("status") != "reserved":
+            await run_in_threadpool(self._fail, order_id)
+            return
+
+        hold_id = reserved["hold_id"]
+        # Charge the prices inventory locked, not the catalog snapshot
+        locked_price = {int(i["product_id"]): i["price"] for i in reserved["items"]}
+        total = sum(locked_price[int(i["product_id"])] * i["qty"] for i in items)
+
+        # 2️⃣ Payment
+        with checkout_stage_latency.labels("pay").time():
+            pay = await self._clients.payment.post(
+                "/api/payments/pay",
+                json={
+                    "user_id": payload["user_id"],
+                    "order_id": order_id,
+                    "amount": total,
+                    "reference": f"order-{order_id}"
+                }
+            )
+        declined = rejected(pay)
+        if not declined:
+            pay.raise_for_status()
+            declined = pay.json().get("status") != "success"
+
+        if declined:
+            # Hand the stock back early; if this fails the hold expires
+            await self._cancel_hold(hold_id)
+            await run_in_threadpool(self._fail, order_id)
+            orders_created.inc()
+            return
+
+        # 3️⃣ Turn the hold into a sale
+        with checkout_stage_latency.labels("confirm").time():
+            confirm = await self._clients.inventory.post(f"/api/inventory/holds/{hold_id}/confirm")
+        if confirm.status_code == 409:
+            # The hold expired while payment was retried: the stock may be
+            # gone, so give the money back and fail the order
+            await self.payment_refund({
+                "user_id": payload["user_id"],
+                "order_id": order_id,
+                "amount": total,
+                "reference": f"order-{order_id}-void"
+            })
+            await run_in_threadpool(self._fail, order_id)
+            return
+        confirm.raise_for_status()
+
+        # 4️⃣ Finalize order
+        with checkout_stage_latency.labels("finalize").time():
+            await run_in_threadpool(self._finalize, order_id, items, locked_price, total)
+
+    async def _cancel_hold(self, hold_id: str):
+        try:
+            await self._clients.inventory.post(f"/api/inventory/holds/{hold_id}/cancel")
+        except (httpx.HTTPError, CircuitOpen, DeadlineExceeded):
+            pass
+
+    def _order_status(self, order_id: int) -> str | None:
+        with self._session_factory() as db:
+            order = db.get(Order, order_id)
+            return order.status if order else None
+
+    def _fail(self, order_id: int):
+        with self._session_factory() as db:
+            order = db.get(Order, order_id)
+            if order.status != "PENDING":
+                return
+            order.status = "FAILED"
+            summary.record_checkout(db, order)
+            db.commit()
+        orders_failed.inc()
+
+    def checkout_dead(self, db: Session, payload: dict):
+        """The checkout will not be retried again; runs in the outbox's transaction."""
+        order = db.query(Order).filter(Order.id == payload["order_id"]).with_for_update().first()
+        if order is None or order.status != "PENDING":
+            return
+        order.status = "FAILED"
+        summary.record_checkout(db, order)
+        # The hold expires by itself, but the step that kept failing may
+        # have come after the charge
+        outbox.enqueue(db, PAYMENT_VOID, {"reference": f"order-{order.id}"}, order_id=order.id)
+        orders_failed.inc()
+
+    def _finalize(self, order_id: int, items: list[dict], locked_price: dict[int, float], total: float):
+        with self._session_factory() as db:
+            order = db.query(Order).filter(Order.id == order_id).with_for_update().one()
+            if order.status != "PENDING":
+                return
+
+            order.total = total
+            order.status = "PAID"
+            for i in items:
+                price = locked_price[int(i["product_id"])]
+                db.add(OrderItem(
+                    order_id=order.id,
+                    product_id=i["product_id"],
+                    qty=i["qty"],
+                    price=price,
+                    line_total=price * i["qty"]
+                ))
+            summary.record_checkout(db, order)
+            db.commit()
+        orders_created.inc()
+        orders_paid.inc()
+
+    # ---------- Compensations ----------
+
+    async def payment_refund(self, payload: dict):
+        r = await self._clients.payment.post(
+            "/api/payments/refund",
+            json={
+                "user_id": payload["user_id"],
+                "order_id": payload["order_id"],
+                "amount": payload["amount"],
+                "reference": payload["reference"]
+            }
+        )
+        r.raise_for_status()
+
+    async def inventory_release(self, payload: dict):
+        r = await self._clients.inventory.post(
+            "/api/inventory/release",
+            json=payload["items"],
+            headers={"Idempotency-Key": payload["key"]}
+        )
+        r.raise_for_status()
+
+    async def payment_void(self, payload: dict):
+        r = await self._clients.payment.post(
+            "/api/payments/void",
+            json={"reference": payload["reference"]}
+        )
+        r.raise_for_status()
@@ -0,0 +1,143 @@
+import os
+import time
+import threading
+from datetime import date
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from prometheus_client.core import GaugeMetricFamily
+from models import Order, SalesSummary
+
+# --------------------------------------------------
+# Sales summary read model
+#
+# One row per (order day, status). Every order that reached a terminal
+# state counts in exactly one row: count 1, gross = amount charged at
+# checkout, refunded = amount refunded since. Rows are updated with
+# additive upserts in the same transaction as the order itself, so they
+# are correct across workers and survive restarts.
+# --------------------------------------------------
+
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "15"))
+
+
+def _upsert(db: Session, day: str, status: str, count: int, gross: float, refunded: float):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Sales summary upsert not supported on {dialect}")
+
+    stmt = insert(SalesSummary).values(
+        day=day, status=status, count=count, gross=gross, refunded=refunded
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SalesSummary.day, SalesSummary.status],
+        set_={
+            "count": SalesSummary.count + stmt.excluded.count,
+            "gross": SalesSummary.gross + stmt.excluded.gross,
+            "refunded": SalesSummary.refunded + stmt.excluded.refunded,
+        },
+    )
+    db.execute(stmt)
+
+
+def _order_day(order: Order) -> str:
+    return str(order.created_at)[:10]
+
+
+def record_checkout(db: Session, order: Order):
+    """Count a PAID or FAILED checkout; the caller commits."""
+    gross = order.total if order.status == "PAID" else 0
+    _upsert(db, _order_day(order), order.status, 1, gross, 0)
+
+
+def record_refund(db: Session, order: Order, gross: float, refunded: float):
+    """Move a PAID order to its refunded status; the caller commits."""
+    day = _order_day(order)
+    # Refunds are only allowed from PAID, so nothing was refunded before
+    _upsert(db, day, "PAID", -1, -gross, 0)
+    _upsert(db, day, order.status, 1, gross, refunded)
+
+
+def _in_range(q, created_from: date | None, created_to: date | None):
+    if created_from:
+        q = q.filter(SalesSummary.day >= created_from.isoformat())
+    if created_to:
+        q = q.filter(SalesSummary.day <= created_to.isoformat())
+    return q
+
+
+def daily_rows(db: Session, created_from: date | None = None, created_to: date | None = None):
+    q = _in_range(db.query(SalesSummary), created_from, created_to)
+    return [
+        {"day": r.day, "status": r.status, "count": r.count, "gross": r.gross, "refunded": r.refunded}
+        for r in q.order_by(SalesSummary.day, SalesSummary.status)
+        if r.count
+    ]
+
+
+def totals_by_status(db: Session, created_from: date | None = None, created_to: date | None = None):
+    q = db.query(
+        SalesSummary.status,
+        func.sum(SalesSummary.count),
+        func.sum(SalesSummary.gross),
+        func.sum(SalesSummary.refunded),
+    )
+    q = _in_range(q, created_from, created_to)
+    return {
+        status: {"count": count or 0, "gross": gross or 0.0, "refunded": refunded or 0.0}
+        for status, count, gross, refunded in q.group_by(SalesSummary.status)
+    }
+
+
+class SalesSummaryCollector:
+    """Prometheus collector backed by the summary table.
+
+    Results are cached for SUMMARY_CACHE_TTL seconds, so scrapes cost at
+    most one small GROUP BY per TTL and never touch the orders table.
+    """
+
+    def __init__(self, session_factory, ttl: float = SUMMARY_CACHE_TTL):
+        self._session_factory = session_factory
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._cached = None
+        self._expires_at = 0.0
+
+    def _totals(self):
+        with self._lock:
+            if self._cached is None or time.monotonic() >= self._expires_at:
+                with self._session_factory() as db:
+                    self._cached = totals_by_status(db)
+                self._expires_at = time.monotonic() + self._ttl
+            return self._cached
+
+    def describe(self):
+        # Lets the registry learn the metric names without a DB query
+        return self._families({})
+
+    def collect(self):
+        try:
+            totals = self._totals()
+        except Exception:
+            # A DB outage must not break the rest of /metrics
+            return []
+        return self._families(totals)
+
+    def _families(self, totals):
+        count = GaugeMetricFamily("orders_summary_count", "Orders by status", labels=["status"])
+        gross = GaugeMetricFamily("orders_summary_gross", "Gross order amount by status", labels=["status"])
+        refunded = GaugeMetricFamily("orders_summary_refunded", "Refunded amount by status", labels=["status"])
+        for status, row in totals.items():
+            count.add_metric([status], row["count"])
+            gross.add_metric([status], row["gross"])
+            refunded.add_metric([status], row["refunded"])
+
+        revenue = GaugeMetricFamily(
+            "revenue_total",
+            "Current total revenue (gross minus refunds)",
+            value=sum(r["gross"] - r["refunded"] for r in totals.values()),
+        )
+        return [count, gross, refunded, revenue]
@@ -0,0 +1,93 @@
+from datetime import datetime
+import pytest
+import outbox
+from models import OutboxEvent
+from outbox import OutboxWorker
+
+
+class Handler:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls: list[dict] = []
+
+    async def __call__(self, payload: dict):
+        self.calls.append(payload)
+        if len(self.calls) <= self.failures:
+            raise RuntimeError("upstream down")
+
+
+def add_event(session_factory, inline: bool = False) -> int:
+    with session_factory() as db:
+        event = outbox.enqueue(db, "test", {"n": 1}, order_id=1, inline=inline)
+        db.commit()
+        return event.id
+
+
+def load(session_factory, event_id: int) -> OutboxEvent:
+    with session_factory() as db:
+        return db.get(OutboxEvent, event_id)
+
+
+@pytest.mark.anyio
+async def test_failed_delivery_is_scheduled_for_retry(session_factory):
+    handler = Handler(failures=1)
+    worker = OutboxWorker(session_factory, {"test": handler})
+    event_id = add_event(session_factory)
+
+    before = datetime.utcnow()
+    assert await worker.deliver(event_id) is False
+
+    event = load(session_factory, event_id)
+    assert event.status == "PENDING"
+    assert event.attempts == 1
+    assert event.last_error == "RuntimeError: upstream down"
+    assert event.next_attempt_at >= before
+    assert handler.calls == [{"n": 1}]
+
+
+@pytest.mark.anyio
+async def test_retry_that_succeeds_marks_the_event_done(session_factory):
+    handler = Handler(failures=1)
+    worker = OutboxWorker(session_factory, {"test": handler})
+    event_id = add_event(session_factory)
+
+    assert await worker.deliver(event_id) is False
+    assert await worker.deliver(event_id) is True
+
+    event = load(session_factory, event_id)
+    assert event.status == "DONE"
+    assert event.attempts == 1
+    assert event.last_error is None
+
+    # A DONE event is never handed to the handler again
+    assert await worker.deliver(event_id) is False
+    assert len(handler.calls) == 2
+
+
+@pytest.mark.anyio
+async def test_event_is_dead_after_max_attempts(session_factory, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 3)
+    handler = Handler(failures=10)
+    worker = OutboxWorker(session_factory, {"test": handler})
+    event_id = add_event(session_factory)
+
+    for _ in range(3):
+        assert await worker.deliver(event_id) is False
+
+    event = load(session_factory, event_id)
+    assert event.status == "DEAD"
+    assert event.attempts == 3
+
+    assert await worker.deliver(event_id) is False
+    assert len(handler.calls) == 3
+
+
+def test_claim_leases_due_events_and_skips_inline_ones(session_factory):
+    worker = OutboxWorker(session_factory, {})
+    inline_id = add_event(session_factory, inline=True)
+    due_id = add_event(session_factory)
+
+    assert worker._claim() == [due_id]
+    # Leased by the first claim, so not handed out twice
+    assert worker._claim() == []
+    assert load(session_factory, inline_id).status == "PENDING"
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+import httpx
+import pytest
+import outbox
+from models import Order, OutboxEvent
+from outbox import OutboxWorker
+from sagas import CHECKOUT, PAYMENT_VOID, Sagas
+from service_core.resilience import ResilientClient
+
+ITEMS = [{"product_id": 1, "qty": 2}]
+
+
+class Upstream:
+    """Answers each path with a canned response and records the calls."""
+
+    def __init__(self, name: str, answers: dict[str, httpx.Response]):
+        self.calls: list[str] = []
+        self._answers = answers
+        self.client = ResilientClient(
+            name,
+            httpx.AsyncClient(transport=httpx.MockTransport(self._handle), base_url=f"http://{name}"),
+            timeout=5,
+        )
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request.url.path)
+        return self._answers[request.url.path]
+
+
+def reserved() -> httpx.Response:
+    return httpx.Response(200, json={
+        "status": "reserved",
+        "hold_id": "order-1-reserve",
+        "items": [{"product_id": 1, "qty": 2, "price": 2.5}],
+    })
+
+
+def sagas_with(session_factory, inventory: dict, payment: dict) -> tuple[Sagas, Upstream, Upstream]:
+    inv = Upstream("inventory", inventory)
+    pay = Upstream("payment", payment)
+    clients = SimpleNamespace(inventory=inv.client, payment=pay.client)
+    return Sagas(session_factory, clients), inv, pay
+
+
+def add_order(session_factory) -> int:
+    with session_factory() as db:
+        order = Order(user_id="u1", total=0, status="PENDING", created_at="2026-10-17 12:00:00")
+        db.add(order)
+        db.commit()
+        return order.id
+
+
+def order_status(session_factory, order_id: int) -> str:
+    with session_factory() as db:
+        return db.get(Order, order_id).status
+
+
+@pytest.mark.anyio
+async def test_rejected_reservation_fails_the_order(session_factory):
+    sagas, inv, pay = sagas_with(
+        session_factory,
+        {"/api/inventory/reserve": httpx.Response(422, json={"detail": "bad qty"})},
+        {},
+    )
+    order_id = add_order(session_factory)
+
+    await sagas.checkout({"order_id": order_id, "user_id": "u1", "items": ITEMS})
+
+    assert order_status(session_factory, order_id) == "FAILED"
+    assert pay.calls == []
+
+
+@pytest.mark.anyio
+async def test_rejected_payment_cancels_the_hold_and_fails_the_order(session_factory):
+    sagas, inv, pay = sagas_with(
+        session_factory,
+        {
+            "/api/inventory/reserve": reserved(),
+            "/api/inventory/holds/order-1-reserve/cancel": httpx.Response(200, json={"status": "cancelled"}),
+        },
+        {"/api/payments/pay": httpx.Response(422, json={"detail": "bad amount"})},
+    )
+    order_id = add_order(session_factory)
+
+    await sagas.checkout({"order_id": order_id, "user_id": "u1", "items": ITEMS})
+
+    assert order_status(session_factory, order_id) == "FAILED"
+    assert inv.calls[-1] == "/api/inventory/holds/order-1-reserve/cancel"
+
+
+@pytest.mark.anyio
+async def test_payment_in_progress_is_retried(session_factory):
+    sagas, inv, pay = sagas_with(
+        session_factory,
+        {"/api/inventory/reserve": reserved()},
+        {"/api/payments/pay": httpx.Response(409, json={"detail": "in progress"})},
+    )
+    order_id = add_order(session_factory)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await sagas.checkout({"order_id": order_id, "user_id": "u1", "items": ITEMS})
+    assert order_status(session_factory, order_id) == "PENDING"
+
+
+@pytest.mark.anyio
+async def test_dead_checkout_fails_the_order_and_voids_the_charge(session_factory, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 1)
+    sagas, inv, pay = sagas_with(
+        session_factory,
+        {"/api/inventory/reserve": httpx.Response(503)},
+        {},
+    )
+    worker = OutboxWorker(session_factory, sagas.handlers(), sagas.dead_handlers())
+    order_id = add_order(session_factory)
+    with session_factory() as db:
+        event = outbox.enqueue(db, CHECKOUT, {"order_id": order_id, "user_id": "u1", "items": ITEMS})
+        db.commit()
+        event_id = event.id
+
+    assert await worker.deliver(event_id) is False
+
+    assert order_status(session_factory, order_id) == "FAILED"
+    with session_factory() as db:
+        assert db.get(OutboxEvent, event_id).status == "DEAD"
+        void = db.query(OutboxEvent).filter(OutboxEvent.kind == PAYMENT_VOID).one()
+        assert void.order_id == order_id
+        assert void.status == "PENDING"
@@ -1,11 +1,10 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-import os
+from sqlalchemy.orm import declarative_base
+from service_core.database import create_db_engine, create_session_factory
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+# Pool sizing, pre-ping, recycle and statement timeout come from the
+# DB_* environment settings, see service_core/database.py
+engine = create_db_engine()
+SessionLocal = create_session_factory(engine)
 
 Base = declarative_base()
 
@@ -0,0 +1,22 @@
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer
+from service_core.tokens import TokenVerifier, InvalidToken
+import os
+
+security = HTTPBearer()
+SECRET_KEY = os.getenv("JWT_SECRET")
+if not SECRET_KEY:
+    raise ValueError("CRITICAL ERROR: JWT_SECRET environment variable is not set!")
+
+verifier = TokenVerifier(SECRET_KEY)
+
+def get_current_user(token=Depends(security)):
+    try:
+        return verifier.verify(token.credentials)
+    except InvalidToken:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def owner_required(user=Depends(get_current_user)):
+    if user.get("role") != "OWNER":
+        raise HTTPException(status_code=403, detail="Owner only")
+    return user
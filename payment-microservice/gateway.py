@@ -0,0 +1,236 @@
+import abc
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+import httpx
+from fastapi import Request
+from service_core import deadline
+from metrics import payment_gateway_inflight, payment_gateway_timeouts
+
+# -------------------------------------------------
+# Settings
+# -------------------------------------------------
+
+GATEWAY = os.getenv("PAYMENT_GATEWAY", "simulator")  # simulator / http
+GATEWAY_URL = os.getenv("GATEWAY_URL")
+GATEWAY_MAX_CONCURRENCY = int(os.getenv("GATEWAY_MAX_CONCURRENCY", "200"))
+GATEWAY_TIMEOUT = float(os.getenv("GATEWAY_TIMEOUT", "2"))
+
+# Simulator latency/failure model
+GATEWAY_SEED = os.getenv("GATEWAY_SEED")
+GATEWAY_LATENCY_DIST = os.getenv("GATEWAY_LATENCY_DIST", "uniform")  # uniform / lognormal
+GATEWAY_LATENCY_MIN = float(os.getenv("GATEWAY_LATENCY_MIN", "0.05"))
+GATEWAY_LATENCY_MAX = float(os.getenv("GATEWAY_LATENCY_MAX", "0.3"))
+GATEWAY_LATENCY_MEDIAN = float(os.getenv("GATEWAY_LATENCY_MEDIAN", "0.1"))
+GATEWAY_LATENCY_SIGMA = float(os.getenv("GATEWAY_LATENCY_SIGMA", "0.5"))
+GATEWAY_FAILURE_RATE = float(os.getenv("GATEWAY_FAILURE_RATE", "0.2"))
+
+
+@dataclass
+class ChargeResult:
+    success: bool
+    latency: float
+    reason: str | None = None
+    # The charge may have gone through: the gateway was called but did not
+    # answer (timeout, dropped connection, 5xx). Not a decline.
+    unknown: bool = False
+    # The charge never reached the gateway (deadline already spent, no free
+    # slot in time, connection refused). Not a decline either; safe to retry.
+    unsent: bool = False
+
+
+# -------------------------------------------------
+# Adapters
+# -------------------------------------------------
+
+class PaymentGateway(abc.ABC):
+    """Interface every gateway adapter implements."""
+
+    @abc.abstractmethod
+    async def charge(
+        self, order_id: int, user_id: str, amount: float, reference: str | None = None
+    ) -> ChargeResult:
+        """Charge amount; a gateway that dedupes on reference charges it at most once."""
+
+    async def aclose(self):
+        pass
+
+
+class SimulatedGateway(PaymentGateway):
+    """In-process gateway with a seeded latency and failure model.
+
+    With a fixed seed the sequence of latencies and outcomes is the same
+    on every run, which makes load tests reproducible.
+    """
+
+    def __init__(
+        self,
+        seed: int | None = None,
+        latency_dist: str = "uniform",
+        latency_min: float = 0.05,
+        latency_max: float = 0.3,
+        latency_median: float = 0.1,
+        latency_sigma: float = 0.5,
+        failure_rate: float = 0.2,
+    ):
+        if latency_dist not in ("uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency_dist}")
+        self._rng = random.Random(seed)
+        self._dist = latency_dist
+        self._min = latency_min
+        self._max = latency_max
+        self._median = latency_median
+        self._sigma = latency_sigma
+        self._failure_rate = failure_rate
+
+    def _latency(self) -> float:
+        if self._dist == "uniform":
+            return self._rng.uniform(self._min, self._max)
+        # Long-tailed, clipped to [min, max]
+        sample = self._median * self._rng.lognormvariate(0, self._sigma)
+        return min(max(sample, self._min), self._max)
+
+    async def charge(self, order_id, user_id, amount, reference=None):
+        # Draw both values up front so concurrency cannot reorder them
+        latency = self._latency()
+        success = self._rng.random() >= self._failure_rate
+        await asyncio.sleep(latency)
+        return ChargeResult(success=success, latency=latency, reason=None if success else "declined")
+
+
+class HttpGateway(PaymentGateway):
+    """Adapter for an HTTP gateway, e.g. a local stand-in during load tests.
+
+    Expects POST /charge to answer {"status": "success" | "failed"}, and
+    to charge a repeated Idempotency-Key only once.
+    """
+
+    def __init__(self, base_url: str):
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=GATEWAY_MAX_CONCURRENCY),
+        )
+
+    async def charge(self, order_id, user_id, amount, reference=None):
+        start = time.perf_counter()
+        r = await self._client.post(
+            "/charge",
+            json={"order_id": order_id, "user_id": user_id, "amount": amount},
+            headers={"Idempotency-Key": reference} if reference else None,
+        )
+        r.raise_for_status()
+        latency = time.perf_counter() - start
+        try:
+            body = r.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            # Answered, but not with a result we can read: it may have charged
+            return ChargeResult(success=False, latency=latency, reason="gateway_error", unknown=True)
+        success = body.get("status") == "success"
+        return ChargeResult(
+            success=success,
+            latency=latency,
+            reason=None if success else "declined",
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class BoundedGateway(PaymentGateway):
+    """Caps in-flight calls to the wrapped gateway and enforces a timeout.
+
+    The timeout covers waiting for a slot as well as the call itself, so it
+    bounds what the caller actually waits. It is cut down to what is left
+    of the request deadline, so a charge the caller has already given up on
+    is not started.
+
+    Failures after the charge was sent come back with unknown=True: the
+    customer may have been charged, so they must not be treated as a decline.
+    Charges that were never sent come back with unsent=True.
+    """
+
+    def __init__(self, inner: PaymentGateway, max_concurrency: int, timeout: float):
+        self._inner = inner
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._timeout = timeout
+
+    async def charge(self, order_id, user_id, amount, reference=None):
+        start = time.perf_counter()
+        try:
+            timeout = deadline.timeout(self._timeout)
+        except deadline.DeadlineExceeded:
+            return ChargeResult(success=False, latency=0.0, reason="deadline", unsent=True)
+
+        sent = False
+
+        async def call():
+            nonlocal sent
+            async with self._slots:
+                payment_gateway_inflight.inc()
+                sent = True
+                try:
+                    return await self._inner.charge(order_id, user_id, amount, reference)
+                finally:
+                    payment_gateway_inflight.dec()
+
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError:
+            payment_gateway_timeouts.inc()
+            # Unless it was still waiting for a slot, the gateway may have charged
+            return ChargeResult(
+                success=False,
+                latency=time.perf_counter() - start,
+                reason="timeout",
+                unknown=sent,
+                unsent=not sent,
+            )
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            return ChargeResult(
+                success=False, latency=time.perf_counter() - start, reason="gateway_error", unsent=True
+            )
+        except httpx.HTTPStatusError as e:
+            # A 4xx is the gateway refusing the request; a 5xx says nothing
+            # about whether it charged
+            return ChargeResult(
+                success=False,
+                latency=time.perf_counter() - start,
+                reason="gateway_error",
+                unknown=e.response.status_code >= 500,
+            )
+        except httpx.HTTPError:
+            return ChargeResult(
+                success=False, latency=time.perf_counter() - start, reason="gateway_error", unknown=True
+            )
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+def build_gateway() -> PaymentGateway:
+    if GATEWAY == "simulator":
+        inner = SimulatedGateway(
+            seed=int(GATEWAY_SEED) if GATEWAY_SEED else None,
+            latency_dist=GATEWAY_LATENCY_DIST,
+            latency_min=GATEWAY_LATENCY_MIN,
+            latency_max=GATEWAY_LATENCY_MAX,
+            latency_median=GATEWAY_LATENCY_MEDIAN,
+            latency_sigma=GATEWAY_LATENCY_SIGMA,
+            failure_rate=GATEWAY_FAILURE_RATE,
+        )
+    elif GATEWAY == "http":
+        if not GATEWAY_URL:
+            raise ValueError("CRITICAL ERROR: GATEWAY_URL is required when PAYMENT_GATEWAY=http")
+        inner = HttpGateway(GATEWAY_URL)
+    else:
+        raise ValueError(f"CRITICAL ERROR: unknown PAYMENT_GATEWAY {GATEWAY!r}")
+
+    return BoundedGateway(inner, GATEWAY_MAX_CONCURRENCY, GATEWAY_TIMEOUT)
+
+
+def get_gateway(request: Request) -> PaymentGateway:
+    return request.app.state.gateway
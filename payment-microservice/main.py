@@ -1,53 +1,66 @@
-from fastapi import FastAPI, Request, Depends
-from fastapi.responses import Response
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, time, timedelta
+from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-import random
-import time
 
-from db import Base, engine, get_db
+from db import engine, get_db, SessionLocal
 from models import Payment
+from deps import owner_required
+from gateway import ChargeResult, PaymentGateway, build_gateway, get_gateway
 
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from metrics import (
     payments_total,
     payments_success,
     payments_failed,
+    payments_unknown,
     payment_amount,
     payment_latency,
-    http_requests_total,
-    http_request_latency_seconds
+    refunds_total,
+    refund_amount,
 )
+from service_core.http_metrics import PrometheusMiddleware
+from service_core.deadline import DeadlineMiddleware
+from service_core.exposition import metrics_response
+from service_core.health import Readiness, get_readiness
+from service_core.responses import default_response_class
+from service_core.export import ExportParams, export_response
+
+logger = logging.getLogger("payment")
 
 # -------------------------------------------------
-# App & DB Init
+# App Init
 # -------------------------------------------------
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.gateway = build_gateway()
+    app.state.readiness = Readiness(engine)
+    app.state.readiness.start()
+    try:
+        yield
+    finally:
+        await app.state.readiness.stop()
+        await app.state.gateway.aclose()
 
-app = FastAPI(title="Payment Service")
+app = FastAPI(
+    title="Payment Service",
+    lifespan=lifespan,
+    default_response_class=default_response_class()
+)
 
 # -------------------------------------------------
 # Middleware (HTTP Metrics)
 # -------------------------------------------------
 
-@app.middleware("http")
-async def prometheus_middleware(request: Request, call_next):
-    start = time.time()
-    response = await call_next(request)
-    duration = time.time() - start
-
-    http_requests_total.labels(
-        request.method,
-        request.url.path,
-        str(response.status_code)
-    ).inc()
-
-    http_request_latency_seconds.labels(
-        request.url.path
-    ).observe(duration)
-
-    return response
+# Added first so it runs inside the metrics middleware and its 504s are counted
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(PrometheusMiddleware)
 
 # -------------------------------------------------
 # Models
@@ -57,6 +70,8 @@ class PaymentRequest(BaseModel):
     user_id: str = Field(..., example="1ee45954-1461-475c-a0da-aee69b3ddbf2")
     order_id: int = Field(..., example=101)
     amount: float = Field(..., gt=0, example=120.50)
+    # Makes retries safe: the same reference is never charged twice
+    reference: str | None = Field(None, max_length=255, example="order-101-pay")
 
 class PaymentResponse(BaseModel):
     status: str
@@ -70,44 +85,157 @@ class PaymentResponse(BaseModel):
 def health():
     return {"status": "payment ok"}
 
+@app.get("/api/payments/live")
+def live():
+    return {"status": "alive"}
+
+@app.get("/api/payments/ready")
+async def ready(readiness: Readiness = Depends(get_readiness)):
+    return await readiness.response()
+
 # -------------------------------------------------
 # Pay
 # -------------------------------------------------
 
+# Seconds a PENDING claim on a reference is held before a retry may take
+# it over; well above GATEWAY_TIMEOUT, so a live request keeps its claim
+PAYMENT_CLAIM_LEASE = float(os.getenv("PAYMENT_CLAIM_LEASE", "30"))
+
+def find_by_reference(db: Session, reference: str) -> Payment | None:
+    return db.query(Payment).filter(Payment.reference == reference).first()
+
+def claim_reference(db: Session, payment: Payment) -> tuple[Payment, bool]:
+    """Insert payment as the claim on its reference.
+
+    Returns the row holding the reference and whether this request owns
+    it. A PENDING row whose lease has run out belonged to a request that
+    died between claiming and recording the outcome; it is taken over.
+    """
+    payment.claimed_at = datetime.utcnow()
+    db.add(payment)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = find_by_reference(db, payment.reference)
+        if existing.status != "PENDING" or not take_over(db, existing):
+            return existing, False
+        payment = existing
+    # Loaded here, in the threadpool, not lazily on first access
+    db.refresh(payment)
+    return payment, True
+
+def take_over(db: Session, existing: Payment) -> bool:
+    now = datetime.utcnow()
+    # Conditional, so of several retries after the lease only one wins
+    taken = db.execute(
+        update(Payment)
+        .where(
+            Payment.id == existing.id,
+            Payment.status == "PENDING",
+            or_(
+                Payment.claimed_at.is_(None),
+                Payment.claimed_at < now - timedelta(seconds=PAYMENT_CLAIM_LEASE),
+            ),
+        )
+        .values(claimed_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return taken == 1
+
+def release_claim(db: Session, payment: Payment):
+    """Give the reference up without an outcome; the next retry takes it over at once."""
+    payment.claimed_at = None
+    db.commit()
+
+def replay(existing: Payment):
+    if existing.status == "PENDING":
+        raise HTTPException(
+            409, "Payment with this reference is in progress", headers={"Retry-After": "1"}
+        )
+    return {
+        "status": existing.status.lower(),
+        "amount": abs(existing.amount)
+    }
+
 @app.post("/api/payments/pay", response_model=PaymentResponse)
-def pay(data: PaymentRequest, db: Session = Depends(get_db)):
+async def pay(
+    data: PaymentRequest,
+    db: Session = Depends(get_db),
+    gateway: PaymentGateway = Depends(get_gateway)
+):
+    payment = Payment(
+        order_id=data.order_id,
+        user_id=data.user_id,
+        amount=data.amount,
+        status="PENDING",
+        reference=data.reference
+    )
+
+    if data.reference:
+        # Claim the reference before charging, so concurrent retries of the
+        # same payment cannot both reach the gateway
+        payment, owned = await run_in_threadpool(claim_reference, db, payment)
+        if not owned:
+            return replay(payment)
+
     payments_total.inc()
 
-    start = time.time()
-    time.sleep(random.uniform(0.05, 0.3))  # simulate gateway latency
-    success = random.random() > 0.2
-    latency = time.time() - start
+    try:
+        result = await gateway.charge(
+            payment.order_id, payment.user_id, payment.amount, payment.reference
+        )
+    except Exception:
+        # Whatever went wrong, the claim must not be left PENDING
+        logger.exception("Charge for order %s raised", payment.order_id)
+        result = ChargeResult(success=False, latency=0.0, reason="error")
+    latency = result.latency
 
     payment_latency.observe(latency)
 
-    if success:
+    if result.unsent:
+        # Nothing reached the gateway, so there is nothing to record and
+        # the order is not failed: a retry charges afresh
+        if data.reference:
+            await run_in_threadpool(release_claim, db, payment)
+        raise HTTPException(
+            503, "Payment gateway unavailable, retry later", headers={"Retry-After": "1"}
+        )
+
+    if result.unknown:
+        # The customer may have been charged. The row stays PENDING: a retry
+        # takes the claim over once its lease runs out and charges again
+        # with the same reference, which the gateway dedupes.
+        payments_unknown.inc()
+        payment.gateway_latency = latency
+        db.add(payment)
+        await run_in_threadpool(db.commit)
+        raise HTTPException(
+            503,
+            "Payment outcome unknown, retry later",
+            headers={"Retry-After": str(int(PAYMENT_CLAIM_LEASE))}
+        )
+
+    if result.success:
         status = "SUCCESS"
         payments_success.inc()
-        payment_amount.inc(data.amount)
+        payment_amount.inc(payment.amount)
     else:
         status = "FAILED"
         payments_failed.inc()
 
     # Persist payment
-    payment = Payment(
-        order_id=data.order_id,
-        user_id=data.user_id,
-        amount=data.amount,
-        status=status,
-        gateway_latency=latency
-    )
+    payment.status = status
+    payment.gateway_latency = latency
+    amount = payment.amount
 
     db.add(payment)
-    db.commit()
+    await run_in_threadpool(db.commit)
 
     return {
         "status": status.lower(),
-        "amount": data.amount
+        "amount": amount
     }
 
 # -------------------------------------------------
@@ -116,29 +244,100 @@ def pay(data: PaymentRequest, db: Session = Depends(get_db)):
 
 @app.post("/api/payments/refund", response_model=PaymentResponse)
 def refund(data: PaymentRequest, db: Session = Depends(get_db)):
-    payments_failed.inc()
-    payment_amount.inc(-data.amount)
-
     refund_tx = Payment(
         order_id=data.order_id,
         user_id=data.user_id,
         amount=-data.amount,
         status="REFUNDED",
-        gateway_latency=0
+        gateway_latency=0,
+        reference=data.reference
     )
 
-    db.add(refund_tx)
-    db.commit()
+    refund_tx, owned = claim_reference(db, refund_tx)
+    if not owned:
+        return replay(refund_tx)
+
+    # Counters only go up, so refunds have their own
+    refunds_total.inc()
+    refund_amount.inc(data.amount)
 
     return {
         "status": "refunded",
         "amount": data.amount
     }
 
+class VoidRequest(BaseModel):
+    # Reference of the charge to undo
+    reference: str = Field(..., max_length=250, example="order-101")
+
+@app.post("/api/payments/void", response_model=PaymentResponse)
+def void(data: VoidRequest, db: Session = Depends(get_db)):
+    """Refund the charge made under reference, if there was one.
+
+    For callers that gave up without knowing whether their charge went
+    through. Safe to repeat: the refund is keyed "<reference>-void".
+    """
+    charge = find_by_reference(db, data.reference)
+    if charge is None or charge.status == "FAILED":
+        return {"status": "not_charged", "amount": 0}
+    if charge.status == "PENDING":
+        raise HTTPException(
+            409, "Payment with this reference is in progress", headers={"Retry-After": "1"}
+        )
+
+    amount = charge.amount
+    refund_tx, owned = claim_reference(db, Payment(
+        order_id=charge.order_id,
+        user_id=charge.user_id,
+        amount=-amount,
+        status="REFUNDED",
+        gateway_latency=0,
+        reference=f"{data.reference}-void"
+    ))
+    if not owned:
+        return replay(refund_tx)
+
+    refunds_total.inc()
+    refund_amount.inc(amount)
+
+    return {
+        "status": "refunded",
+        "amount": amount
+    }
+
 # -------------------------------------------------
-# Metrics
+# Export
 # -------------------------------------------------
 
+@app.get("/api/payments/export")
+def export_payments(
+    params: ExportParams = Depends(),
+    user=Depends(owner_required)
+):
+    """Every matching payment and refund row, oldest first, as NDJSON or CSV."""
+    stmt = select(
+        Payment.id,
+        Payment.order_id,
+        Payment.user_id,
+        Payment.amount,
+        Payment.status,
+        Payment.gateway_latency,
+        Payment.created_at,
+        Payment.reference
+    )
+    if params.status:
+        stmt = stmt.where(Payment.status == params.status)
+    if params.created_from:
+        stmt = stmt.where(Payment.created_at >= datetime.combine(params.created_from, time.min))
+    if params.created_to:
+        stmt = stmt.where(
+            Payment.created_at < datetime.combine(params.created_to + timedelta(days=1), time.min)
+        )
+    # Ids follow insertion order, and the primary key index serves it
+    stmt = stmt.order_by(Payment.id)
+
+    return export_response(SessionLocal, stmt, "payments", params.format)
+
 @app.get("/api/payments/metrics")
 def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return metrics_response()
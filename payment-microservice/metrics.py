@@ -1,16 +1,4 @@
-from prometheus_client import Counter, Histogram
-http_requests_total = Counter(
-    "http_requests_total",
-    "Total HTTP requests",
-    ["method", "endpoint", "status"]
-)
-
-http_request_latency_seconds = Histogram(
-    "http_request_latency_seconds",
-    "HTTP request latency",
-    ["endpoint"]
-)
-
+from prometheus_client import Counter, Gauge, Histogram
 payments_total = Counter(
     "payments_total",
     "Total payment attempts"
@@ -26,6 +14,11 @@ payments_failed = Counter(
     "Failed payments"
 )
 
+payments_unknown = Counter(
+    "payments_unknown_total",
+    "Payments left pending because the gateway did not report an outcome"
+)
+
 payment_amount = Counter(
     "payment_amount_total",
     "Total processed payment amount"
@@ -38,4 +31,19 @@ payment_latency = Histogram(
 refunds_total = Counter(
     "refunds_total",
     "Total refund attempts"
-)
\ No newline at end of file
+)
+
+refund_amount = Counter(
+    "payment_refunded_amount_total",
+    "Total refunded amount"
+)
+
+payment_gateway_inflight = Gauge(
+    "payment_gateway_inflight",
+    "Payment gateway calls in flight",
+    multiprocess_mode="livesum"
+)
+payment_gateway_timeouts = Counter(
+    "payment_gateway_timeouts_total",
+    "Payment gateway calls that hit the timeout"
+)
@@ -0,0 +1,26 @@
+"""caller reference for idempotent pay/refund
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("payments") as batch_op:
+        batch_op.add_column(sa.Column("reference", sa.String(length=255), nullable=True))
+        batch_op.create_unique_constraint("uq_payments_reference", ["reference"])
+
+
+def downgrade():
+    with op.batch_alter_table("payments") as batch_op:
+        batch_op.drop_constraint("uq_payments_reference", type_="unique")
+        batch_op.drop_column("reference")
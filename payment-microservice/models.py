@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
 from sqlalchemy.sql import func
 from db import Base
 
@@ -9,6 +9,16 @@ class Payment(Base):
     order_id = Column(Integer, nullable=False)
     user_id = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
-    status = Column(String, nullable=False)  # SUCCESS / FAILED / REFUNDED
+    status = Column(String, nullable=False)  # PENDING / SUCCESS / FAILED / REFUNDED
     gateway_latency = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Caller-chosen key; a repeated pay/refund with it is answered from
+    # this row instead of charging or refunding again
+    reference = Column(String(255))
+    # When the current holder claimed a PENDING row; a claim older than
+    # PAYMENT_CLAIM_LEASE may be taken over by a retry
+    claimed_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint("reference", name="uq_payments_reference"),
+    )
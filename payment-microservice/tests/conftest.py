@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(SERVICE_DIR))
+
+from service_core.testing import use_service  # noqa: E402
+
+# db.py builds its engine at import; tests use their own (see session_factory)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# deps.py refuses to import without one; main.py is imported for its handlers
+os.environ.setdefault("JWT_SECRET", "test")
+use_service(SERVICE_DIR)
+
+from db import Base  # noqa: E402
+import models  # noqa: E402,F401  registers the tables
+
+
+def pytest_pycollect_makemodule(module_path, parent):
+    # Another service's conftest may have swapped its modules in since
+    use_service(SERVICE_DIR)
+
+
+@pytest.fixture
+def anyio_backend():
+    # The code under test uses asyncio directly
+    return "asyncio"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file, not :memory:, so threadpool sessions see the same database
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    engine.dispose()
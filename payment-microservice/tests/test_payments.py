@@ -0,0 +1,109 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from gateway import BoundedGateway, ChargeResult, PaymentGateway
+from main import PaymentRequest, pay
+from models import Payment
+
+
+class FakeGateway(PaymentGateway):
+    """Answers each charge with the next of results; an exception is raised."""
+
+    def __init__(self, *results):
+        self._results = list(results)
+        self.calls = 0
+
+    async def charge(self, order_id, user_id, amount, reference=None):
+        self.calls += 1
+        result = self._results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class SlowGateway(PaymentGateway):
+    async def charge(self, order_id, user_id, amount, reference=None):
+        await asyncio.sleep(10)
+
+
+def bounded(inner: PaymentGateway, **kwargs) -> BoundedGateway:
+    return BoundedGateway(inner, **{"max_concurrency": 1, "timeout": 0.05, **kwargs})
+
+
+def request(reference: str | None = "order-1") -> PaymentRequest:
+    return PaymentRequest(user_id="u1", order_id=1, amount=5, reference=reference)
+
+
+# --------------------------------------------------
+# BoundedGateway
+# --------------------------------------------------
+
+@pytest.mark.anyio
+async def test_refused_connection_is_unsent():
+    refused = httpx.ConnectError("refused", request=httpx.Request("POST", "http://gateway/charge"))
+    result = await bounded(FakeGateway(refused)).charge(1, "u1", 5)
+
+    assert result.unsent and not result.unknown
+
+
+@pytest.mark.anyio
+async def test_timeout_waiting_for_a_slot_is_unsent():
+    gateway = bounded(SlowGateway())
+    first = asyncio.create_task(gateway.charge(1, "u1", 5))
+    await asyncio.sleep(0)
+
+    second = await gateway.charge(2, "u1", 5)
+    assert second.unsent and not second.unknown
+
+    # The one holding the slot timed out after sending
+    first = await first
+    assert first.unknown and not first.unsent
+
+
+# --------------------------------------------------
+# /api/payments/pay
+# --------------------------------------------------
+
+@pytest.mark.anyio
+async def test_unsent_charge_releases_the_reference(session_factory):
+    gateway = FakeGateway(
+        ChargeResult(success=False, latency=0.0, reason="gateway_error", unsent=True),
+        ChargeResult(success=True, latency=0.1),
+    )
+    with session_factory() as db:
+        with pytest.raises(HTTPException) as e:
+            await pay(request(), db, gateway)
+        assert e.value.status_code == 503
+
+    with session_factory() as db:
+        claim = db.query(Payment).one()
+        assert (claim.status, claim.claimed_at) == ("PENDING", None)
+
+    # The retry does not wait out the lease, and charges
+    with session_factory() as db:
+        assert await pay(request(), db, gateway) == {"status": "success", "amount": 5}
+    assert gateway.calls == 2
+
+
+@pytest.mark.anyio
+async def test_unsent_charge_without_a_reference_is_not_stored(session_factory):
+    gateway = FakeGateway(ChargeResult(success=False, latency=0.0, reason="deadline", unsent=True))
+    with session_factory() as db:
+        with pytest.raises(HTTPException) as e:
+            await pay(request(reference=None), db, gateway)
+        assert e.value.status_code == 503
+        assert db.query(Payment).count() == 0
+
+
+@pytest.mark.anyio
+async def test_decline_is_stored_as_failed(session_factory):
+    gateway = FakeGateway(ChargeResult(success=False, latency=0.1, reason="declined"))
+    with session_factory() as db:
+        assert await pay(request(), db, gateway) == {"status": "failed", "amount": 5}
+
+    with session_factory() as db:
+        assert db.query(Payment).one().status == "FAILED"
+        # Replayed, not charged again
+        assert await pay(request(), db, gateway) == {"status": "failed", "amount": 5}
+    assert gateway.calls == 1
@@ -0,0 +1,5 @@
+"""Code shared by the FastAPI services.
+
+Each service imports it as ``service_core`` with the repository root on
+PYTHONPATH; the Docker images copy it next to the service code.
+"""
@@ -0,0 +1,133 @@
+import os
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from prometheus_client import Gauge, Histogram
+
+# --------------------------------------------------
+# Pool settings
+#
+# Size pools so that (pool_size + max_overflow) * processes * replicas
+# stays under Postgres max_connections.
+# --------------------------------------------------
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Postgres only; 0 disables it
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled DB connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+def database_url(env_var: str = "DATABASE_URL") -> str:
+    url = os.getenv(env_var)
+    if not url:
+        raise ValueError(f"CRITICAL ERROR: {env_var} environment variable is not set!")
+    return url
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    pool_label = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait_seconds.labels(self.pool_label).observe(time.perf_counter() - start)
+
+
+def _pool_class(pool_name: str) -> type[InstrumentedQueuePool]:
+    # A subclass per pool keeps the label across engine.dispose(), which
+    # rebuilds the pool from its class.
+    return type("InstrumentedQueuePool", (InstrumentedQueuePool,), {"pool_label": pool_name})
+
+
+# Occupancy gauges are refreshed on every checkout/checkin. livesum adds up
+# the values of the live workers when several share a multiprocess dir.
+db_pool_size = Gauge("db_pool_size", "Configured pool size", ["pool"], multiprocess_mode="livesum")
+db_pool_checked_out = Gauge("db_pool_checked_out", "Connections in use", ["pool"], multiprocess_mode="livesum")
+db_pool_checked_in = Gauge("db_pool_checked_in", "Idle pooled connections", ["pool"], multiprocess_mode="livesum")
+db_pool_overflow = Gauge(
+    "db_pool_overflow", "Connections open beyond pool_size", ["pool"], multiprocess_mode="livesum"
+)
+
+# Every engine created here, for dispose_after_fork
+_engines: list[Engine] = []
+
+
+def _track_pool(engine: Engine, pool_name: str):
+    def update(*_):
+        pool = engine.pool
+        db_pool_size.labels(pool_name).set(pool.size())
+        db_pool_checked_out.labels(pool_name).set(pool.checkedout())
+        db_pool_checked_in.labels(pool_name).set(pool.checkedin())
+        db_pool_overflow.labels(pool_name).set(max(pool.overflow(), 0))
+
+    event.listen(engine, "checkout", update)
+    event.listen(engine, "checkin", update)
+    update()
+
+
+def dispose_after_fork():
+    """Drop connections inherited from the parent process without closing
+    them, so a forked worker opens its own and the parent's stay usable."""
+    for engine in _engines:
+        engine.dispose(close=False)
+
+
+def create_db_engine(
+    url: str | None = None,
+    pool_name: str = "primary",
+    connect_timeout: int | None = None,
+    **overrides
+) -> Engine:
+    """Engine configured from the DB_* environment settings.
+
+    connect_timeout (seconds, Postgres only) bounds opening a connection.
+    Keyword overrides win over the environment.
+    """
+    url = url or database_url()
+    kwargs: dict = {}
+
+    # SQLite is only a local stand-in and keeps SQLAlchemy's default pool
+    if not url.startswith("sqlite"):
+        kwargs.update(
+            poolclass=_pool_class(pool_name),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+        connect_args: dict = {}
+        if url.startswith("postgresql"):
+            if DB_STATEMENT_TIMEOUT_MS:
+                connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+            if connect_timeout:
+                connect_args["connect_timeout"] = connect_timeout
+        if connect_args:
+            kwargs["connect_args"] = connect_args
+
+    kwargs.update(overrides)
+    engine = create_engine(url, **kwargs)
+    _engines.append(engine)
+    if isinstance(engine.pool, QueuePool):
+        _track_pool(engine, pool_name)
+    return engine
+
+
+def create_session_factory(engine: Engine) -> sessionmaker:
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
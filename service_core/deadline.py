@@ -0,0 +1,103 @@
+import os
+import time
+from contextvars import ContextVar
+from prometheus_client import Counter
+
+# --------------------------------------------------
+# Request deadlines
+#
+# Every inbound request gets a time budget: the caller's, from the
+# X-Deadline-Ms header (milliseconds left when it sent the request), capped
+# at REQUEST_DEADLINE. Outbound calls made while handling it use
+# timeout() and headers(), so each hop waits at most what is left of the
+# budget and tells the next service how much that is. A request that
+# arrives with nothing left is answered 504 without doing any work.
+#
+# Handlers are not cancelled when the budget runs out mid-request; work in
+# progress (a DB transaction, a gateway charge) finishes or fails on its
+# own, bounded by the same timeouts.
+# --------------------------------------------------
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "10"))
+
+_HEADER_KEY = DEADLINE_HEADER.lower().encode()
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+deadline_exceeded = Counter(
+    "deadline_exceeded_total",
+    "Work skipped because the request deadline had passed",
+    ["where"]  # inbound / outbound
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining() -> float | None:
+    """Seconds left for the current request; None outside a request."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout(default: float) -> float:
+    """Timeout for an outbound call: default, or less if the budget is lower."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        deadline_exceeded.labels("outbound").inc()
+        raise DeadlineExceeded()
+    return min(default, left)
+
+
+def headers() -> dict[str, str]:
+    left = remaining()
+    if left is None:
+        return {}
+    return {DEADLINE_HEADER: str(max(int(left * 1000), 0))}
+
+
+def _parse(raw: bytes) -> float | None:
+    try:
+        return float(raw) / 1000
+    except ValueError:
+        return None
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware that sets the budget for each request."""
+
+    def __init__(self, app, default: float = REQUEST_DEADLINE):
+        self.app = app
+        self._default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self._default
+        for name, value in scope["headers"]:
+            if name == _HEADER_KEY:
+                sent = _parse(value)
+                if sent is not None:
+                    budget = min(budget, sent)
+                break
+
+        if budget <= 0:
+            deadline_exceeded.labels("inbound").inc()
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Deadline exceeded"}'})
+            return
+
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
@@ -0,0 +1,42 @@
+import os
+from fastapi.responses import Response
+from prometheus_client import CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# --------------------------------------------------
+# /metrics exposition
+#
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn_conf), every worker
+# writes its samples to files in that directory and a scrape, answered by
+# whichever worker gets it, aggregates the files of all workers.
+# prometheus_client reads the variable when it is first imported, so it
+# has to be in the environment before the app is loaded.
+# --------------------------------------------------
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Custom collectors that are already whole-service views (they read the
+# database or merge per-worker state), so they are safe to report from
+# whichever worker answers the scrape.
+_shared_collectors = []
+
+
+def multiprocess_enabled() -> bool:
+    return bool(PROMETHEUS_MULTIPROC_DIR)
+
+
+def register_collector(collector):
+    _shared_collectors.append(collector)
+    if not multiprocess_enabled():
+        REGISTRY.register(collector)
+
+
+def metrics_response() -> Response:
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        for collector in _shared_collectors:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,66 @@
+"""Gunicorn settings shared by the services.
+
+    gunicorn -c python:service_core.gunicorn_conf main:app
+
+WEB_CONCURRENCY uvicorn workers are started; with more than one,
+prometheus_client runs in multiprocess mode so /metrics covers every
+worker. WEB_CONCURRENCY=1 behaves like a single uvicorn process.
+"""
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once in the master and fork workers from it: the imported
+# modules and settings are shared copy-on-write, and workers start without
+# importing again. Schema changes are Alembic's (run before the app starts),
+# and the lifespan (clients, background tasks) still runs in every worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# SIGHUP / SIGTERM give in-flight requests this long to finish
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Recycle workers after this many requests (0 = never), with jitter so
+# they do not all restart together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+accesslog = None
+errorlog = "-"
+
+# Must be set, and the directory exist, before prometheus_client is
+# imported, i.e. before the app is preloaded
+if workers > 1:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+_metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+# Clear samples from a previous run, but only on first load: a SIGHUP
+# reload re-reads this file while workers still hold their files open
+if _metrics_dir and not os.environ.get("_METRICS_DIR_CLEARED"):
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+    os.environ["_METRICS_DIR_CLEARED"] = "1"
+
+
+def when_ready(server):
+    # The preloaded master serves no requests; drop the live gauges it set
+    # during import so they are not added to the workers'
+    if _metrics_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def post_fork(server, worker):
+    # Connections opened by the preloaded app belong to the master; each
+    # worker must open its own
+    from service_core.database import dispose_after_fork
+    dispose_after_fork()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# --------------------------------------------------
+# Liveness and readiness
+#
+# /live only says the process is serving; it never touches the database,
+# so a slow database cannot get pods restarted. /ready says the pod can
+# serve traffic: its pool holds warm connections and its dependencies
+# answer. The result is cached for READY_CACHE_TTL so frequent probes do
+# not turn into load.
+# --------------------------------------------------
+
+READY_CACHE_TTL = float(os.getenv("READY_CACHE_TTL", "5"))
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "2"))
+# Connections opened at startup before the pod reports ready
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))
+WARM_RETRY_INTERVAL = 1.0
+
+Check = Callable[[], Awaitable[None]]
+
+
+def http_check(client, path: str) -> Check:
+    """Dependency check that GETs path on an httpx.AsyncClient."""
+    async def check():
+        r = await client.get(path, timeout=READY_CHECK_TIMEOUT)
+        r.raise_for_status()
+    return check
+
+
+class Readiness:
+    def __init__(self, engine: Engine, checks: dict[str, Check] | None = None, warm: int = DB_POOL_WARM):
+        self._engine = engine
+        self._checks = {"database": self._ping_db, **(checks or {})}
+        self._warm = warm
+        self._warmed = False
+        self._warm_task: asyncio.Task | None = None
+        self._cached: tuple[float, bool, dict] | None = None
+        self._lock = asyncio.Lock()
+
+    # ---------- Startup ----------
+
+    def start(self):
+        """Warm the pool in the background; startup never waits on the DB."""
+        self._warm_task = asyncio.create_task(self._warm_pool())
+
+    async def stop(self):
+        if self._warm_task:
+            self._warm_task.cancel()
+
+    async def _warm_pool(self):
+        while True:
+            try:
+                await run_in_threadpool(self._open_connections)
+                self._warmed = True
+                return
+            except Exception:
+                await asyncio.sleep(WARM_RETRY_INTERVAL)
+
+    def _open_connections(self):
+        conns = []
+        try:
+            for _ in range(max(self._warm, 1)):
+                conn = self._engine.connect()
+                conns.append(conn)
+                conn.execute(text("SELECT 1"))
+        finally:
+            for conn in conns:
+                conn.close()
+
+    # ---------- Checks ----------
+
+    async def _ping_db(self):
+        def ping():
+            with self._engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        await run_in_threadpool(ping)
+
+    async def _run(self, check: Check) -> str:
+        try:
+            await asyncio.wait_for(check(), READY_CHECK_TIMEOUT)
+            return "ok"
+        except asyncio.TimeoutError:
+            return "timeout"
+        except Exception as e:
+            return f"error: {type(e).__name__}"
+
+    async def status(self) -> tuple[bool, dict]:
+        if not self._warmed:
+            return False, {"database": "warming"}
+
+        if self._cached and time.monotonic() - self._cached[0] < READY_CACHE_TTL:
+            return self._cached[1], self._cached[2]
+
+        async with self._lock:
+            # Another probe may have refreshed it while we waited
+            if self._cached and time.monotonic() - self._cached[0] < READY_CACHE_TTL:
+                return self._cached[1], self._cached[2]
+
+            names = list(self._checks)
+            results = await asyncio.gather(*(self._run(self._checks[n]) for n in names))
+            checks = dict(zip(names, results))
+            ready = all(r == "ok" for r in results)
+
+            self._cached = (time.monotonic(), ready, checks)
+            return ready, checks
+
+    async def response(self) -> JSONResponse:
+        ready, checks = await self.status()
+        return JSONResponse(
+            {"status": "ready" if ready else "not ready", "checks": checks},
+            status_code=200 if ready else 503,
+        )
+
+
+def get_readiness(request: Request) -> Readiness:
+    return request.app.state.readiness
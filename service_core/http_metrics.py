@@ -0,0 +1,93 @@
+import os
+import time
+from prometheus_client import Counter, Histogram
+
+# --------------------------------------------------
+# Settings
+# --------------------------------------------------
+
+DEFAULT_BUCKETS = "0.005,0.01,0.025,0.05,0.075,0.1,0.25,0.5,0.75,1,2.5,5,10"
+HTTP_LATENCY_BUCKETS = tuple(
+    float(b) for b in os.getenv("HTTP_LATENCY_BUCKETS", DEFAULT_BUCKETS).split(",") if b.strip()
+)
+# Hard cap on (method, endpoint, status) combinations; anything past it is
+# folded into endpoint="__other__"
+HTTP_METRICS_MAX_SERIES = int(os.getenv("HTTP_METRICS_MAX_SERIES", "500"))
+
+SKIP_SUFFIXES = ("/health", "/live", "/ready", "/metrics")
+KNOWN_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+UNMATCHED = "__unmatched__"
+OVERFLOW = "__other__"
+
+http_requests_total = Counter(
+    "http_requests_total",
+    "Total HTTP requests",
+    ["method", "endpoint", "status"]
+)
+
+http_request_latency_seconds = Histogram(
+    "http_request_latency_seconds",
+    "HTTP request latency",
+    ["endpoint"],
+    buckets=HTTP_LATENCY_BUCKETS
+)
+
+
+class PrometheusMiddleware:
+    """Pure ASGI request metrics, labelled by route template.
+
+    The endpoint label is the matched route's path ("/api/orders/{user_id}"),
+    never the raw URL, so IDs in the path do not create new series.
+    Requests that match no route share one label. Unlike
+    @app.middleware("http") this does not wrap the request and response in
+    BaseHTTPMiddleware's extra task and stream.
+    """
+
+    def __init__(
+        self,
+        app,
+        skip_suffixes: tuple[str, ...] = SKIP_SUFFIXES,
+        max_series: int = HTTP_METRICS_MAX_SERIES,
+    ):
+        self.app = app
+        self._skip = skip_suffixes
+        self._max_series = max_series
+        self._series: set[tuple[str, str, str]] = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].endswith(self._skip):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._observe(scope, status, time.perf_counter() - start)
+
+    def _observe(self, scope, status: int, duration: float):
+        # The router stores the matched route in the shared scope dict
+        route = scope.get("route")
+        endpoint = getattr(route, "path", None) or UNMATCHED
+        method = scope["method"]
+        if method not in KNOWN_METHODS:
+            method = "OTHER"
+
+        key = (method, endpoint, str(status))
+        if key not in self._series:
+            if len(self._series) >= self._max_series:
+                key = (method, OVERFLOW, key[2])
+                endpoint = OVERFLOW
+            else:
+                self._series.add(key)
+
+        http_requests_total.labels(*key).inc()
+        http_request_latency_seconds.labels(endpoint).observe(duration)
@@ -0,0 +1,54 @@
+import zlib
+from alembic import context
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from service_core.database import database_url
+
+# --------------------------------------------------
+# Alembic env shared by the services
+#
+# Each service keeps its own migrations/ and alembic version table, so
+# services sharing one database do not clash. Run before rolling out:
+#
+#     alembic upgrade head        (from the service directory)
+#
+# On Postgres, runs are serialised with an advisory lock, so it is safe for
+# every replica's init container to run it at once.
+# --------------------------------------------------
+
+
+def run_migrations(target_metadata, version_table: str):
+    url = database_url()
+
+    if context.is_offline_mode():
+        context.configure(
+            url=url,
+            target_metadata=target_metadata,
+            version_table=version_table,
+            literal_binds=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(url, poolclass=NullPool)
+    with engine.connect() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        lock_key = zlib.crc32(version_table.encode())
+        if postgres:
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": lock_key})
+            conn.commit()
+        try:
+            context.configure(
+                connection=conn,
+                target_metadata=target_metadata,
+                version_table=version_table,
+                # SQLite cannot ALTER most things in place
+                render_as_batch=conn.dialect.name == "sqlite",
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": lock_key})
+                conn.commit()
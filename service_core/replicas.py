@@ -0,0 +1,128 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from fastapi import Request, Response
+from prometheus_client import Counter
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+from service_core.database import create_db_engine
+
+# --------------------------------------------------
+# Read replicas
+#
+# With DATABASE_REPLICA_URLS set (comma-separated), read-only endpoints
+# take their session from ReadRouter: replicas in round-robin, skipping
+# one for REPLICA_RETRY_INTERVAL after it fails to hand out a connection
+# within REPLICA_CONNECT_TIMEOUT, and the primary when none is left.
+# Without it every read goes to the primary, as before. Writes always use
+# the primary (get_db).
+#
+# Replicas lag the primary. A client that must see its own write asks
+# for the primary with "X-Read-Primary: true"; write endpoints also set a
+# short-lived cookie that does the same for READ_YOUR_WRITES_WINDOW
+# seconds, so a browser reading its order history right after checkout
+# gets the order it just placed.
+# --------------------------------------------------
+
+REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_RETRY_INTERVAL = float(os.getenv("REPLICA_RETRY_INTERVAL", "10"))
+# Seconds to wait for a replica connection before falling back (Postgres)
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+READ_YOUR_WRITES_WINDOW = int(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+PRIMARY_HEADER = "x-read-primary"
+PRIMARY_COOKIE = "read_primary_until"
+
+db_reads = Counter(
+    "db_reads_routed_total",
+    "Read-only sessions handed out, by pool",
+    ["pool"]
+)
+db_replica_failovers = Counter(
+    "db_replica_failovers_total",
+    "Replicas skipped because they could not hand out a connection",
+    ["pool"]
+)
+
+
+class _Replica:
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.down_until = 0.0
+
+
+class ReadRouter:
+    def __init__(self, primary: Engine, replica_urls: list[str] | None = None):
+        urls = REPLICA_URLS if replica_urls is None else replica_urls
+        self._primary = primary
+        self._replicas = [
+            _Replica(
+                f"replica{i}",
+                create_db_engine(url, pool_name=f"replica{i}", connect_timeout=REPLICA_CONNECT_TIMEOUT)
+            )
+            for i, url in enumerate(urls)
+        ]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._sessions = sessionmaker(autocommit=False, autoflush=False)
+
+    def _order(self) -> list[_Replica]:
+        if not self._replicas:
+            return []
+        with self._lock:
+            start = next(self._next) % len(self._replicas)
+        return self._replicas[start:] + self._replicas[:start]
+
+    def _connect(self) -> tuple[str, Connection | None]:
+        now = time.monotonic()
+        for replica in self._order():
+            if replica.down_until > now:
+                continue
+            try:
+                # Checked out here, not on first query, so a dead replica
+                # is skipped before the endpoint runs
+                return replica.name, replica.engine.connect()
+            except SQLAlchemyError:
+                # Refused, unreachable, or its pool is exhausted (TimeoutError)
+                replica.down_until = time.monotonic() + REPLICA_RETRY_INTERVAL
+                db_replica_failovers.labels(replica.name).inc()
+        return "primary", None
+
+    @contextmanager
+    def session(self, primary: bool = False) -> Iterator[Session]:
+        name, conn = ("primary", None) if primary else self._connect()
+        db_reads.labels(name).inc()
+        db = self._sessions(bind=conn or self._primary)
+        try:
+            yield db
+        finally:
+            db.close()
+            if conn is not None:
+                conn.close()
+
+
+def wants_primary(request: Request) -> bool:
+    if request.headers.get(PRIMARY_HEADER, "").lower() in ("1", "true"):
+        return True
+    until = request.cookies.get(PRIMARY_COOKIE)
+    try:
+        return until is not None and float(until) > time.time()
+    except ValueError:
+        return False
+
+
+def read_your_writes(response: Response) -> Response:
+    """Send this client's reads to the primary for READ_YOUR_WRITES_WINDOW."""
+    response.set_cookie(
+        PRIMARY_COOKIE,
+        str(int(time.time()) + READ_YOUR_WRITES_WINDOW),
+        max_age=READ_YOUR_WRITES_WINDOW,
+        httponly=True,
+        samesite="lax",
+    )
+    return response
@@ -0,0 +1,205 @@
+import asyncio
+import os
+import time
+import httpx
+from prometheus_client import Counter, Gauge
+from service_core import deadline
+from service_core.deadline import DeadlineExceeded
+
+# --------------------------------------------------
+# Calls to other services
+#
+# ResilientClient wraps one upstream's httpx.AsyncClient with:
+#   - the request deadline (service_core.deadline) as the per-call timeout
+#     and the X-Deadline-Ms header;
+#   - a circuit breaker: after CB_FAILURE_THRESHOLD consecutive failures
+#     (transport errors, timeouts, 5xx) calls fail fast with CircuitOpen
+#     for CB_RESET_TIMEOUT seconds, then CB_HALF_OPEN_MAX_CALLS probe calls
+#     decide whether to close it again or stay open;
+#   - optional hedging for idempotent GETs: if the first attempt has not
+#     answered after HEDGE_DELAY seconds a second one is sent and the first
+#     good answer wins. HEDGE_DELAY=0 turns hedging off.
+# --------------------------------------------------
+
+CB_FAILURE_THRESHOLD = int(os.getenv("CB_FAILURE_THRESHOLD", "5"))
+CB_RESET_TIMEOUT = float(os.getenv("CB_RESET_TIMEOUT", "10"))
+CB_HALF_OPEN_MAX_CALLS = int(os.getenv("CB_HALF_OPEN_MAX_CALLS", "1"))
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "0"))
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half_open", OPEN: "open"}
+
+# Workers keep their own breakers; report the most open one
+circuit_breaker_state = Gauge(
+    "circuit_breaker_state",
+    "Breaker state (0 closed, 1 half-open, 2 open)",
+    ["upstream"],
+    multiprocess_mode="livemax"
+)
+circuit_breaker_transitions = Counter(
+    "circuit_breaker_transitions_total",
+    "Breaker state changes",
+    ["upstream", "state"]
+)
+circuit_breaker_rejections = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls failed fast by an open breaker",
+    ["upstream"]
+)
+hedged_requests = Counter(
+    "hedged_requests_total",
+    "GETs that sent a second attempt, by which attempt answered",
+    ["upstream", "winner"]  # primary / hedge / none
+)
+
+
+class CircuitOpen(Exception):
+    def __init__(self, upstream: str):
+        super().__init__(f"Circuit for {upstream} is open")
+        self.upstream = upstream
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CB_FAILURE_THRESHOLD,
+        reset_timeout: float = CB_RESET_TIMEOUT,
+        half_open_max_calls: int = CB_HALF_OPEN_MAX_CALLS,
+    ):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        circuit_breaker_state.labels(name).set(CLOSED)
+
+    def _transition(self, state: int):
+        self._state = state
+        self._failures = 0
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        circuit_breaker_state.labels(self.name).set(state)
+        circuit_breaker_transitions.labels(self.name, STATE_NAMES[state]).inc()
+
+    @property
+    def state(self) -> int:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._reset_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def allow(self):
+        """Take a call slot or raise CircuitOpen; pair with record/release."""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes >= self._half_open_max_calls):
+            circuit_breaker_rejections.labels(self.name).inc()
+            raise CircuitOpen(self.name)
+        if state == HALF_OPEN:
+            self._probes += 1
+
+    def record(self, ok: bool):
+        if ok:
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+            self._failures = 0
+        elif self._state == HALF_OPEN:
+            self._transition(OPEN)
+        elif self._state == CLOSED:
+            self._failures += 1
+            if self._failures >= self._failure_threshold:
+                self._transition(OPEN)
+
+    def release(self):
+        """The call ended without saying anything about the upstream."""
+        if self._state == HALF_OPEN and self._probes:
+            self._probes -= 1
+
+
+class ResilientClient:
+    def __init__(self, name: str, client: httpx.AsyncClient, timeout: float, hedge_delay: float = HEDGE_DELAY):
+        self.name = name
+        # The bare client, for health checks that must not trip the breaker
+        self.client = client
+        self.breaker = CircuitBreaker(name)
+        self._timeout = timeout
+        self._hedge_delay = hedge_delay
+
+    async def get(self, url: str, hedge: bool = False, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, hedge=hedge, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, hedge: bool = False, **kwargs) -> httpx.Response:
+        default = kwargs.pop("timeout", self._timeout)
+        timeout = deadline.timeout(default)
+        kwargs["timeout"] = timeout
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), **deadline.headers()}
+        # A timeout cut short by our own budget says nothing about the upstream
+        budget_bound = timeout < default
+
+        if hedge and self._hedge_delay > 0 and method == "GET":
+            return await self._hedged(method, url, budget_bound, kwargs)
+        return await self._send(method, url, budget_bound, kwargs)
+
+    async def _send(self, method: str, url: str, budget_bound: bool, kwargs: dict) -> httpx.Response:
+        self.breaker.allow()
+        try:
+            r = await self.client.request(method, url, **kwargs)
+        except httpx.TimeoutException:
+            if budget_bound:
+                deadline.deadline_exceeded.labels("outbound").inc()
+                self.breaker.release()
+                raise DeadlineExceeded()
+            self.breaker.record(False)
+            raise
+        except httpx.HTTPError:
+            self.breaker.record(False)
+            raise
+        except BaseException:
+            # Cancelled, e.g. the losing attempt of a hedged GET
+            self.breaker.release()
+            raise
+        self.breaker.record(r.status_code < 500)
+        return r
+
+    async def _hedged(self, method: str, url: str, budget_bound: bool, kwargs: dict) -> httpx.Response:
+        primary = asyncio.create_task(self._send(method, url, budget_bound, kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.create_task(self._send(method, url, budget_bound, kwargs))
+        attempts = {primary: "primary", hedge: "hedge"}
+        pending = set(attempts)
+        fallback: httpx.Response | None = None
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        # The hedge being refused by the breaker is not news
+                        if not (task is hedge and isinstance(task.exception(), CircuitOpen)):
+                            error = task.exception()
+                        continue
+                    r = task.result()
+                    if r.status_code < 500:
+                        hedged_requests.labels(self.name, attempts[task]).inc()
+                        return r
+                    fallback = r
+        finally:
+            for task in pending:
+                task.cancel()
+
+        hedged_requests.labels(self.name, "none").inc()
+        if fallback is not None:
+            return fallback
+        raise error
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,32 @@
+import os
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+# --------------------------------------------------
+# JSON response classes
+#
+# ORJSONResponse renders with orjson, several times faster than the
+# standard json module for large bodies. Routes can pick a class with
+# response_class=...; the app default comes from JSON_RENDERER ("orjson",
+# or "json" to go back to starlette's JSONResponse).
+#
+# The class only renders. The work before that is removed by declaring a
+# response_model: FastAPI then validates the return value with pydantic
+# (from_attributes reads ORM objects directly) and dumps it in one pass
+# instead of walking every object with jsonable_encoder.
+# --------------------------------------------------
+
+JSON_RENDERER = os.getenv("JSON_RENDERER", "orjson")
+
+RENDERERS: dict[str, type[JSONResponse]] = {
+    "orjson": ORJSONResponse,
+    "json": JSONResponse,
+}
+
+
+def default_response_class() -> type[JSONResponse]:
+    try:
+        return RENDERERS[JSON_RENDERER]
+    except KeyError:
+        raise RuntimeError(
+            f"JSON_RENDERER must be one of {', '.join(RENDERERS)}, not {JSON_RENDERER!r}"
+        )
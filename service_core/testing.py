@@ -0,0 +1,42 @@
+import os
+import sys
+from types import ModuleType
+
+# --------------------------------------------------
+# Test helpers
+#
+# The services import each other's module names (db, models, metrics) as
+# top-level modules, so one pytest run over several services has to swap
+# them: before a service's tests are imported, use_service puts that
+# service's modules in sys.modules and its directory first on sys.path.
+# Swapped-out modules are kept and put back later rather than imported
+# again, which would register their Prometheus metrics a second time.
+# --------------------------------------------------
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_swapped_out: dict[str, dict[str, ModuleType]] = {}
+
+
+def _service_dir(module: ModuleType) -> str | None:
+    """The service directory a top-level module was loaded from, if any."""
+    path = getattr(module, "__file__", None)
+    if not path or "." in module.__name__:
+        return None
+    directory = os.path.dirname(os.path.abspath(path))
+    return directory if os.path.dirname(directory) == ROOT else None
+
+
+def use_service(service_dir: str):
+    service_dir = os.path.abspath(service_dir)
+    for name, module in list(sys.modules.items()):
+        owner = _service_dir(module)
+        if owner and owner != service_dir:
+            _swapped_out.setdefault(owner, {})[name] = module
+            del sys.modules[name]
+    sys.modules.update(_swapped_out.pop(service_dir, {}))
+
+    for path in (ROOT, service_dir):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
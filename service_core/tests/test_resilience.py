@@ -0,0 +1,236 @@
+import asyncio
+import time
+import httpx
+import pytest
+from service_core import deadline, resilience
+from service_core.deadline import DeadlineExceeded
+from service_core.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, ResilientClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the breaker's view of time; the event loop keeps the real clock
+    fake = FakeClock()
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
+
+
+def open_breaker(clock: FakeClock, **kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10, **kwargs)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def half_open_breaker(clock: FakeClock, **kwargs) -> CircuitBreaker:
+    breaker = open_breaker(clock, **kwargs)
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+def client(handler, breaker: CircuitBreaker, hedge_delay: float = 0) -> ResilientClient:
+    c = ResilientClient(
+        "test",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://upstream"),
+        timeout=5,
+        hedge_delay=hedge_delay,
+    )
+    c.breaker = breaker
+    return c
+
+
+# --------------------------------------------------
+# CircuitBreaker
+# --------------------------------------------------
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+    breaker.record(False)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == CLOSED
+
+    breaker.record(False)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_half_open_admits_only_the_probe_budget(clock):
+    breaker = half_open_breaker(clock, half_open_max_calls=2)
+    breaker.allow()
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    breaker.allow()
+
+
+def test_failed_probe_reopens_for_a_full_reset_timeout(clock):
+    breaker = half_open_breaker(clock)
+    breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+
+    clock.now += 9.9
+    assert breaker.state == OPEN
+    clock.now += 0.1
+    assert breaker.state == HALF_OPEN
+
+
+def test_release_gives_the_probe_slot_back(clock):
+    breaker = half_open_breaker(clock)
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    breaker.allow()
+
+
+def test_release_without_a_probe_does_not_add_slots(clock):
+    breaker = half_open_breaker(clock)
+    breaker.release()
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+# --------------------------------------------------
+# ResilientClient
+# --------------------------------------------------
+
+@pytest.mark.anyio
+async def test_timeout_within_our_own_budget_does_not_count(clock):
+    def handler(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    c = client(handler, breaker)
+    # Less budget left than the client's own 5s timeout
+    token = deadline._deadline.set(time.monotonic() + 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await c.get("/")
+    finally:
+        deadline._deadline.reset(token)
+    assert breaker.state == CLOSED
+
+    # The same timeout without a deadline is the upstream's fault
+    with pytest.raises(httpx.ReadTimeout):
+        await c.get("/")
+    assert breaker.state == OPEN
+    await c.aclose()
+
+
+@pytest.mark.anyio
+async def test_exhausted_budget_releases_the_probe(clock):
+    def handler(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    breaker = half_open_breaker(clock)
+    c = client(handler, breaker)
+    token = deadline._deadline.set(time.monotonic() + 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await c.get("/")
+    finally:
+        deadline._deadline.reset(token)
+
+    assert breaker.state == HALF_OPEN
+    breaker.allow()
+    await c.aclose()
+
+
+@pytest.mark.anyio
+async def test_cancelled_call_releases_the_probe(clock):
+    started = asyncio.Event()
+
+    async def handler(request):
+        started.set()
+        await asyncio.sleep(10)
+
+    breaker = half_open_breaker(clock)
+    c = client(handler, breaker)
+    task = asyncio.create_task(c.get("/"))
+    await started.wait()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker.state == HALF_OPEN
+    breaker.allow()
+    await c.aclose()
+
+
+@pytest.mark.anyio
+async def test_hedge_wins_and_the_slow_attempt_is_cancelled(clock):
+    calls = 0
+    cancelled = asyncio.Event()
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return httpx.Response(200, json={"attempt": calls})
+
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    c = client(handler, breaker, hedge_delay=0.01)
+    r = await c.get("/", hedge=True)
+
+    assert r.json() == {"attempt": 2}
+    await asyncio.wait_for(cancelled.wait(), 1)
+    # Losing the race is not a failure
+    assert breaker.state == CLOSED
+    await c.aclose()
+
+
+@pytest.mark.anyio
+async def test_hedge_refused_by_half_open_breaker_is_ignored(clock):
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200)
+
+    breaker = half_open_breaker(clock)
+    c = client(handler, breaker, hedge_delay=0.01)
+    r = await c.get("/", hedge=True)
+
+    assert r.status_code == 200
+    assert breaker.state == CLOSED
+    await c.aclose()
+
+
+@pytest.mark.anyio
+async def test_hedged_get_returns_a_5xx_when_no_attempt_does_better(clock):
+    async def handler(request):
+        await asyncio.sleep(0.02)
+        return httpx.Response(503)
+
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=10)
+    c = client(handler, breaker, hedge_delay=0.01)
+    r = await c.get("/", hedge=True)
+
+    assert r.status_code == 503
+    await c.aclose()
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from jose import jwt, JWTError
+from prometheus_client import Counter, Gauge
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Upper bound for tokens that carry no exp claim
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))
+
+token_cache_requests = Counter(
+    "token_cache_requests_total",
+    "Verified-token cache lookups",
+    ["result"]  # hit / miss / expired
+)
+token_cache_entries = Gauge(
+    "token_cache_entries",
+    "Verified tokens held in the cache",
+    multiprocess_mode="livesum"
+)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class TokenVerifier:
+    """JWT verification with a bounded LRU of already-verified claims.
+
+    Entries are keyed by a SHA-256 of the token, so raw tokens are never
+    kept in memory, and each entry is dropped once the token's exp passes.
+    Only successfully verified tokens are cached.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        algorithms: list[str] | None = None,
+        max_entries: int = TOKEN_CACHE_SIZE,
+    ):
+        self._secret = secret
+        self._algorithms = algorithms or ["HS256"]
+        self._max_entries = max_entries
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, token: str) -> dict:
+        """Full signature check, bypassing the cache."""
+        try:
+            return jwt.decode(token, self._secret, algorithms=self._algorithms)
+        except JWTError as e:
+            raise InvalidToken(str(e))
+
+    def verify(self, token: str) -> dict:
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    token_cache_requests.labels("hit").inc()
+                    return claims
+                del self._entries[key]
+                token_cache_requests.labels("expired").inc()
+            else:
+                token_cache_requests.labels("miss").inc()
+
+        claims = self.decode(token)
+        expires_at = claims.get("exp", now + TOKEN_CACHE_MAX_TTL)
+
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            token_cache_entries.set(len(self._entries))
+
+        return claims